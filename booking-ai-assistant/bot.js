@@ -415,6 +415,17 @@ Type "skip" if you prefer not to share.`);
     try {
       const whatsappPhone = message.from;
       const phoneNumber = whatsappPhone.replace("@c.us", "");
+      const phoneE164 = this.whatsappPhoneE164(whatsappPhone);
+
+      // The number may already belong to a website account (phone_e164 is
+      // unique), in which case link that account instead of creating one
+      const existingUser = await this.db
+        .collection("users")
+        .findOne({ phone_e164: phoneE164 });
+      if (existingUser) {
+        await this.linkExistingAccountByEmail(message, session, existingUser.email);
+        return;
+      }
 
       // Hash the password properly with bcrypt
       const hashedPassword = await bcrypt.hash(
@@ -428,6 +439,7 @@ Type "skip" if you prefer not to share.`);
         full_name: session.profileData.full_name,
         user_type: "tourist",
         phone: "+" + phoneNumber,
+        phone_e164: phoneE164,
         address: session.profileData.address,
         created_at: new Date(),
         is_verified: false,
@@ -441,7 +453,19 @@ Type "skip" if you prefer not to share.`);
         password_set_via: "whatsapp",
       };
 
-      const result = await this.db.collection("users").insertOne(newUser);
+      try {
+        await this.db.collection("users").insertOne(newUser);
+      } catch (error) {
+        // Registered on the website in the meantime
+        if (error.code === 11000 && error.keyPattern?.phone_e164) {
+          const user = await this.db
+            .collection("users")
+            .findOne({ phone_e164: phoneE164 });
+          await this.linkExistingAccountByEmail(message, session, user.email);
+          return;
+        }
+        throw error;
+      }
 
       const successMessage = `🎉 *Account Created Successfully!*
 
@@ -1408,33 +1432,20 @@ Safe travels and enjoy your authentic rural experience! 🌟`;
     }
   }
 
+  // WhatsApp ids are full international numbers, so E.164 is just "+" + digits
+  whatsappPhoneE164(whatsappPhone) {
+    return "+" + whatsappPhone.replace("@c.us", "").replace(/\D/g, "");
+  }
+
   async getUserDetailsByWhatsApp(whatsappPhone) {
     try {
-      const phoneNumber = whatsappPhone.replace("@c.us", "");
-
-      // Search for user by phone number (try different formats)
-      const phoneSearchPatterns = [
-        phoneNumber,
-        "+" + phoneNumber,
-        phoneNumber.substring(2),
-        "+91" + phoneNumber.substring(2),
-      ];
-
-      for (const pattern of phoneSearchPatterns) {
-        const user = await this.db.collection("users").findOne({
-          $or: [
-            { phone: pattern },
-            { whatsapp_phone: whatsappPhone },
-            { phone: { $regex: pattern.replace("+", "\\+"), $options: "i" } },
-          ],
-        });
-
-        if (user) {
-          return user;
-        }
-      }
-
-      return null;
+      // One indexed lookup on the canonical phone (or an explicitly linked WhatsApp id)
+      return await this.db.collection("users").findOne({
+        $or: [
+          { phone_e164: this.whatsappPhoneE164(whatsappPhone) },
+          { whatsapp_phone: whatsappPhone },
+        ],
+      });
     } catch (error) {
       console.error("Error getting user details:", error);
       return null;
@@ -0,0 +1,176 @@
+# availability.py
+#
+# Night reservations for voice bookings, on the same `listing_availability`
+# documents as the backend (mirrors utils/availability_utils there). A
+# booking holds its nights with a compare-and-swap on the document's
+# `version` before it is inserted, so a voice booking and a website booking
+# for the same nights can never both succeed.
+#
+# Voice bookings are created confirmed, so their nights carry no
+# `held_until`. Conflicting nights whose pending hold has lapsed, whose
+# booking is cancelled or expired, or whose booking was never inserted, are
+# reclaimed exactly as the backend does, on the backend's own Config.
+
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+from backend_shared import Config
+
+MAX_RESERVATION_ATTEMPTS = 5
+
+ACTIVE_BOOKING_STATUSES = ["pending", "confirmed"]
+
+class AvailabilityConflictError(Exception):
+    """Raised when concurrent writers keep winning the availability CAS"""
+
+def to_night(value):
+    return datetime.combine(value.date(), datetime.min.time())
+
+def _hold_lapsed(interval, now):
+    return bool(interval.get('held_until')) and interval['held_until'] <= now
+
+def _orphaned(interval, now):
+    reserved_at = interval.get('reserved_at')
+    return reserved_at is None or reserved_at + timedelta(minutes=Config.ORPHANED_RESERVATION_MINUTES) <= now
+
+def _overlapping(intervals, start, end):
+    """Intervals of a sorted, non-overlapping list that intersect [start, end)"""
+    index = bisect_left([interval['start'] for interval in intervals], end)
+    found = []
+    while index > 0 and intervals[index - 1]['end'] > start:
+        index -= 1
+        found.append(intervals[index])
+    return found
+
+async def _build_availability_doc(db, listing_id):
+    today = to_night(datetime.utcnow())
+    listing = await db.listings.find_one({"_id": listing_id}, {"availability_calendar": 1})
+
+    bookings = await db.bookings.find(
+        {
+            "listing_id": listing_id,
+            "listing_type": {"$ne": "experience"},
+            "status": {"$in": ACTIVE_BOOKING_STATUSES},
+            "check_out": {"$gt": today}
+        },
+        {"check_in": 1, "check_out": 1, "status": 1, "created_at": 1}
+    ).sort("check_in", 1).to_list(length=None)
+
+    reservations = []
+    for booking in bookings:
+        interval = {
+            "start": to_night(booking['check_in']),
+            "end": to_night(booking['check_out']),
+            "booking_id": booking['_id']
+        }
+        if reservations and reservations[-1]['end'] > interval['start']:
+            print(f"⚠️ Booking {booking['_id']} overlaps an earlier booking on listing {listing_id}")
+            continue
+        if booking['status'] == 'pending' and booking.get('created_at'):
+            interval['held_until'] = booking['created_at'] + timedelta(minutes=Config.PENDING_BOOKING_HOLD_MINUTES)
+        reservations.append(interval)
+
+    blocked = []
+    calendar = (listing or {}).get('availability_calendar') or {}
+    for day in sorted(datetime.strptime(day, '%Y-%m-%d') for day, available in calendar.items() if available is False):
+        if blocked and blocked[-1]['end'] == day:
+            blocked[-1]['end'] = day + timedelta(days=1)
+        else:
+            blocked.append({"start": day, "end": day + timedelta(days=1)})
+
+    return {
+        "_id": listing_id,
+        "reservations": reservations,
+        "blocked": [interval for interval in blocked if interval['end'] > today],
+        "version": 0,
+        "updated_at": datetime.utcnow()
+    }
+
+async def _get_availability_doc(db, listing_id):
+    doc = await db.listing_availability.find_one({"_id": listing_id})
+    if doc:
+        return doc
+
+    doc = await _build_availability_doc(db, listing_id)
+    try:
+        await db.listing_availability.insert_one(doc)
+    except DuplicateKeyError:
+        doc = await db.listing_availability.find_one({"_id": listing_id})
+    return doc
+
+async def _compare_and_swap(db, doc, reservations):
+    result = await db.listing_availability.update_one(
+        {"_id": doc['_id'], "version": doc['version']},
+        {"$set": {"reservations": reservations, "updated_at": datetime.utcnow()}, "$inc": {"version": 1}}
+    )
+    return result.modified_count == 1
+
+async def _reclaim(db, conflicts, now):
+    """True if every conflicting interval belongs to a lapsed or inactive booking"""
+    booking_ids = [interval['booking_id'] for interval in conflicts]
+    statuses = {
+        booking['_id']: booking['status']
+        for booking in await db.bookings.find({"_id": {"$in": booking_ids}}, {"status": 1}).to_list(length=None)
+    }
+
+    for interval in conflicts:
+        status = statuses.get(interval['booking_id'])
+        if status == 'confirmed':
+            return False
+        if status == 'pending' and not _hold_lapsed(interval, now):
+            return False
+        if status is None and not (_hold_lapsed(interval, now) or _orphaned(interval, now)):
+            return False
+        if status == 'pending':
+            expired = await db.bookings.update_one(
+                {"_id": interval['booking_id'], "status": "pending"},
+                {"$set": {"status": "expired", "expired_at": now, "updated_at": now}}
+            )
+            if not expired.modified_count:
+                return False
+            print(f"⌛ Expired unpaid booking {interval['booking_id']}")
+
+    return True
+
+async def reserve_nights(db, listing_id, check_in, check_out, booking_id):
+    """Hold [check_in, check_out) for a confirmed booking; False if taken or blocked"""
+    start, end = to_night(check_in), to_night(check_out)
+
+    for _ in range(MAX_RESERVATION_ATTEMPTS):
+        doc = await _get_availability_doc(db, listing_id)
+        now = datetime.utcnow()
+
+        if _overlapping(doc.get('blocked') or [], start, end):
+            return False
+
+        reservations = [interval for interval in doc.get('reservations') or [] if interval['end'] > to_night(now)]
+        conflicts = _overlapping(reservations, start, end)
+        if conflicts:
+            if not await _reclaim(db, conflicts, now):
+                return False
+            reclaimed = {interval['booking_id'] for interval in conflicts}
+            reservations = [interval for interval in reservations if interval['booking_id'] not in reclaimed]
+
+        reservations.append({"start": start, "end": end, "booking_id": booking_id, "reserved_at": now})
+        reservations.sort(key=lambda interval: interval['start'])
+
+        if await _compare_and_swap(db, doc, reservations):
+            return True
+
+    raise AvailabilityConflictError("Could not reserve dates due to concurrent bookings")
+
+async def release_nights(db, listing_id, booking_id):
+    """Free the nights held by a booking whose insert failed"""
+    for _ in range(MAX_RESERVATION_ATTEMPTS):
+        doc = await db.listing_availability.find_one({"_id": listing_id})
+        if not doc:
+            return False
+
+        reservations = [interval for interval in doc.get('reservations') or [] if interval.get('booking_id') != booking_id]
+        if len(reservations) == len(doc.get('reservations') or []):
+            return False
+
+        if await _compare_and_swap(db, doc, reservations):
+            return True
+
+    raise AvailabilityConflictError("Could not release dates due to concurrent bookings")
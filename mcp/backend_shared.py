@@ -0,0 +1,24 @@
+# backend_shared.py
+#
+# Settings and pure helpers shared with villagestay-backend. They are
+# imported from the backend checkout instead of being copied here, so the
+# voice agent and the website can't drift apart: booking hold lengths, the
+# canonical keys that bookings are grouped by, and the E.164 form callers
+# are matched on (register/profile store phone_e164 with the same function,
+# including Config.DEFAULT_PHONE_COUNTRY_CODE).
+#
+# The backend is expected next to this directory; set VILLAGESTAY_BACKEND_DIR
+# when the MCP server is deployed elsewhere.
+
+import os
+import sys
+
+BACKEND_DIR = os.environ.get('VILLAGESTAY_BACKEND_DIR') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), os.pardir, 'villagestay-backend'
+)
+if os.path.abspath(BACKEND_DIR) not in sys.path:
+    sys.path.append(os.path.abspath(BACKEND_DIR))
+
+from config import Config
+from utils.location_utils import canonical_location_key
+from utils.phone_utils import normalize_phone_e164
@@ -0,0 +1,235 @@
+# listing_search.py
+#
+# In-memory search index for the voice booking agent. Active listings are
+# tokenized once (location, title, description) into an inverted index, so a
+# voice turn is a few dict lookups instead of a regex scan over Atlas.
+#
+# Queries go through a small gazetteer first, so a region ("Kerala") also
+# finds listings that only name a place in it ("Munnar"). Unknown words are
+# snapped to the closest indexed word, so "Kerela" or "Munar" still match.
+#
+# An index is immutable once built; ListingSearchIndex.updated() derives the
+# next one from a few changed listings, reusing every other listing's tokens.
+
+import difflib
+import re
+import unicodedata
+from collections import defaultdict
+
+# canonical place -> places/spellings that should also match it
+LOCATION_GAZETTEER = {
+    "goa": ["goan", "goanese", "panaji", "calangute", "anjuna", "candolim", "margao"],
+    "kerala": ["kochi", "cochin", "munnar", "alleppey", "alappuzha", "wayanad", "kumarakom", "thekkady", "varkala"],
+    "rajasthan": ["rajasthani", "jaipur", "udaipur", "jodhpur", "jaisalmer", "pushkar", "bikaner"],
+    "himachal pradesh": ["himachal", "manali", "shimla", "dharamshala", "kasol", "spiti", "kullu"],
+    "uttarakhand": ["rishikesh", "nainital", "mussoorie", "auli", "almora"],
+    "karnataka": ["coorg", "kodagu", "hampi", "chikmagalur", "mysore", "mysuru"],
+    "tamil nadu": ["ooty", "kodaikanal", "madurai", "pondicherry", "puducherry"],
+    "west bengal": ["darjeeling", "kalimpong", "sundarbans"],
+    "sikkim": ["gangtok", "pelling"],
+    "meghalaya": ["shillong", "cherrapunji", "mawlynnong"],
+    "gujarat": ["kutch", "bhuj", "rann of kutch"],
+    "maharashtra": ["lonavala", "mahabaleshwar", "konkan"],
+    "ladakh": ["leh", "nubra"],
+}
+
+# Weight of a match by field: a hit in the location beats one in the title,
+# which beats a passing mention in the description
+FIELD_WEIGHTS = {"location": 3, "title": 2, "description": 1}
+
+MIN_TOKEN_LENGTH = 3
+FUZZY_CUTOFF = 0.8
+DESCRIPTION_SNIPPET = 200
+
+STOPWORDS = {"the", "and", "with", "for", "near", "from", "village", "stay", "homestay", "india"}
+
+def tokenize(text):
+    """Lowercase, accent-free word tokens worth indexing"""
+    if not text:
+        return []
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    return [
+        token for token in re.findall(r'\w+', text)
+        if len(token) >= MIN_TOKEN_LENGTH and token not in STOPWORDS
+    ]
+
+def _phrase(text):
+    return " ".join(tokenize(text))
+
+# alias or canonical name -> canonical region
+_PLACE_LOOKUP = {}
+for _region, _aliases in LOCATION_GAZETTEER.items():
+    _PLACE_LOOKUP[_phrase(_region)] = _region
+    for _alias in _aliases:
+        _PLACE_LOOKUP.setdefault(_phrase(_alias), _region)
+
+def expand_location(query):
+    """Phrases to search for a spoken location
+
+    A region expands to all of its places; a place or unknown name is
+    searched as-is. Misspelled gazetteer names are corrected first.
+    """
+    phrase = _phrase(query)
+    if not phrase:
+        return []
+
+    if phrase not in _PLACE_LOOKUP:
+        close = difflib.get_close_matches(phrase, list(_PLACE_LOOKUP), n=1, cutoff=FUZZY_CUTOFF)
+        if close:
+            phrase = close[0]
+
+    region = _PLACE_LOOKUP.get(phrase)
+    if region and _phrase(region) == phrase:
+        return [phrase] + [_phrase(alias) for alias in LOCATION_GAZETTEER[region]]
+    return [phrase]
+
+class _TokenIndex:
+    """token -> {listing_id: weight}, plus a typo-tolerant vocabulary"""
+
+    def __init__(self):
+        self.postings = defaultdict(dict)
+        self.vocabulary_by_initial = defaultdict(list)
+
+    def add(self, token, listing_id, weight):
+        postings = self.postings[token]
+        postings[listing_id] = max(postings.get(listing_id, 0), weight)
+
+    def freeze(self):
+        for token in self.postings:
+            self.vocabulary_by_initial[token[0]].append(token)
+
+    def correct(self, token, fuzzy=True):
+        """The indexed word for a query token, allowing for small typos"""
+        if token in self.postings:
+            return token
+        if not fuzzy:
+            return None
+        # Typos rarely hit the first letter, so only compare against words
+        # sharing it; keeps fuzzy matching cheap on a large vocabulary
+        close = difflib.get_close_matches(token, self.vocabulary_by_initial.get(token[0], []), n=1, cutoff=FUZZY_CUTOFF)
+        return close[0] if close else None
+
+    def score_phrase(self, phrase, fuzzy=True):
+        """Listing id -> score for listings containing every word of a phrase"""
+        scores = None
+        for token in phrase.split():
+            indexed = self.correct(token, fuzzy)
+            if not indexed:
+                return {}
+
+            postings = self.postings[indexed]
+            if scores is None:
+                scores = dict(postings)
+            else:
+                scores = {
+                    listing_id: score + postings[listing_id]
+                    for listing_id, score in scores.items() if listing_id in postings
+                }
+            if not scores:
+                return {}
+        return scores or {}
+
+    def score_any(self, phrase, min_matches):
+        """Listing id -> score for listings containing at least min_matches words"""
+        scores = defaultdict(int)
+        matches = defaultdict(int)
+        for token in set(phrase.split()):
+            indexed = self.correct(token)
+            if not indexed:
+                continue
+            for listing_id, weight in self.postings[indexed].items():
+                scores[listing_id] += weight
+                matches[listing_id] += 1
+        return {listing_id: score for listing_id, score in scores.items() if matches[listing_id] >= min_matches}
+
+class ListingSearchIndex:
+    """Inverted indexes over a snapshot of active listings"""
+
+    def __init__(self, listings=()):
+        self.listings = {}
+        # listing id -> ({field: tokens}, title tokens), kept for updated()
+        self.tokens = {}
+        self.all_fields = _TokenIndex()
+        self.titles = _TokenIndex()
+
+        for listing in listings:
+            self._add(listing)
+
+        self._freeze()
+
+    def _freeze(self):
+        self.all_fields.freeze()
+        self.titles.freeze()
+
+    def _add(self, listing):
+        entry = {
+            "_id": listing['_id'],
+            "title": listing.get('title') or "",
+            "location": listing.get('location') or "",
+            "price_per_night": listing.get('price_per_night', 0),
+            "max_guests": listing.get('max_guests', 2),
+            "description": (listing.get('description') or "")[:DESCRIPTION_SNIPPET],
+            "updated_at": listing.get('updated_at'),
+        }
+        field_tokens = {field: tokenize(listing.get(field)) for field in FIELD_WEIGHTS}
+        self._add_tokens(entry, (field_tokens, field_tokens['title']))
+
+    def _add_tokens(self, entry, tokens):
+        listing_id = entry['_id']
+        self.listings[listing_id] = entry
+        self.tokens[listing_id] = tokens
+
+        field_tokens, title_tokens = tokens
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in field_tokens[field]:
+                self.all_fields.add(token, listing_id, weight)
+        for token in title_tokens:
+            self.titles.add(token, listing_id, 1)
+
+    def updated(self, changed=(), removed_ids=()):
+        """A new index with listings added, replaced or removed
+
+        Unchanged listings are carried over without re-tokenizing them, so an
+        update costs about as much as the changes plus a copy of the postings.
+        """
+        changed = list(changed)
+        dropped = set(removed_ids) | {listing['_id'] for listing in changed}
+
+        index = ListingSearchIndex()
+        for listing_id, entry in self.listings.items():
+            if listing_id not in dropped:
+                index._add_tokens(entry, self.tokens[listing_id])
+        for listing in changed:
+            index._add(listing)
+
+        index._freeze()
+        return index
+
+    def __len__(self):
+        return len(self.listings)
+
+    def search_location(self, location, limit=5):
+        """Best listings for a spoken location (region, place or free text)"""
+        totals = defaultdict(int)
+        phrases = expand_location(location)
+        for position, phrase in enumerate(phrases):
+            # Only the spoken phrase is typo-corrected; gazetteer places are exact
+            for listing_id, score in self.all_fields.score_phrase(phrase, fuzzy=position == 0).items():
+                totals[listing_id] = max(totals[listing_id], score)
+
+        ranked = sorted(totals, key=lambda listing_id: -totals[listing_id])
+        return [self.listings[listing_id] for listing_id in ranked[:limit]]
+
+    def search_title(self, title, limit=1):
+        """Listings whose title matches a (possibly misheard) name"""
+        phrase = _phrase(title)
+        scores = self.titles.score_phrase(phrase)
+
+        if not scores:
+            # Misheard or partial names: accept titles sharing most of the words
+            words = len(set(phrase.split()))
+            scores = self.titles.score_any(phrase, min_matches=max(1, (words + 1) // 2))
+
+        ranked = sorted(scores, key=lambda listing_id: -scores[listing_id])
+        return [self.listings[listing_id] for listing_id in ranked[:limit]]
@@ -1,33 +1,226 @@
 # mcp_server_auto_caller_detection.py
 import asyncio
 import json
+import os
 import ssl
-from datetime import datetime
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
 import random
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
 from bson import ObjectId
 from starlette.applications import Starlette
 from starlette.responses import Response, JSONResponse
 from starlette.routing import Route
 from starlette.requests import Request
 import uvicorn
+from listing_search import ListingSearchIndex
+from availability import reserve_nights, release_nights, AvailabilityConflictError
+from backend_shared import canonical_location_key, normalize_phone_e164
 
 # Configuration
 MONGO_URL = "mongodb+srv://bobby:<db_password>@cluster0.nvavp.mongodb.net/?retryWrites=true&w=majority&appName=Cluster0"
 DB_NAME = "villagestay"
 
-# Store current call session info
-current_call_session = {}
+# Connection pool per server process; size it for the number of concurrent
+# voice calls (each tool call holds a connection only while its query runs)
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE') or 50)
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE') or 5)
+MONGO_TIMEOUT_MS = int(os.environ.get('MONGO_TIMEOUT_MS') or 5000)
 
-# MongoDB connection
-try:
-    client = MongoClient(MONGO_URL, tls=True, tlsAllowInvalidCertificates=True)
-    db = client[DB_NAME]
-    count = db.listings.count_documents({})
-    print(f"✅ MongoDB connected: {count} listings")
-except Exception as e:
-    print(f"❌ MongoDB error: {e}")
-    db = None
+# Call sessions: how long an idle call keeps its context, and how many
+# concurrent calls are remembered before the least recently used is dropped
+CALL_SESSION_TTL = int(os.environ.get('CALL_SESSION_TTL') or 1800)
+CALL_SESSION_MAX = int(os.environ.get('CALL_SESSION_MAX') or 1000)
+
+# Seconds before the in-memory listing search index picks up listings
+# changed since its last refresh, and before it is rebuilt from scratch
+# (which also drops listings deleted outright)
+LISTING_INDEX_TTL = int(os.environ.get('LISTING_INDEX_TTL') or 60)
+LISTING_INDEX_FULL_REBUILD = int(os.environ.get('LISTING_INDEX_FULL_REBUILD') or 3600)
+
+# MongoDB connection (Motor, so tool handlers never block the event loop)
+client = AsyncIOMotorClient(
+    MONGO_URL,
+    tls=True,
+    tlsAllowInvalidCertificates=True,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    serverSelectionTimeoutMS=MONGO_TIMEOUT_MS
+)
+db = client[DB_NAME]
+
+async def check_mongo_connection():
+    """Verify the cluster is reachable and warm the listing index"""
+    try:
+        count = await db.listings.count_documents({})
+        print(f"✅ MongoDB connected: {count} listings (pool {MONGO_MIN_POOL_SIZE}-{MONGO_MAX_POOL_SIZE})")
+        await get_listing_index()
+    except Exception as e:
+        print(f"❌ MongoDB error: {e}")
+
+class CallSessionStore:
+    """Per-call caller context with sliding TTL and LRU eviction
+
+    All access happens on the event loop thread, so no locking is needed.
+    """
+
+    def __init__(self, ttl=CALL_SESSION_TTL, max_sessions=CALL_SESSION_MAX):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()
+
+    def _evict_expired(self, now):
+        # Sessions are kept in last-used order, so expired ones are at the front
+        while self.sessions:
+            call_id, session = next(iter(self.sessions.items()))
+            if now - session['last_seen'] < self.ttl:
+                break
+            del self.sessions[call_id]
+
+    def get(self, call_id):
+        now = time.monotonic()
+        self._evict_expired(now)
+
+        session = self.sessions.get(call_id)
+        if session:
+            session['last_seen'] = now
+            self.sessions.move_to_end(call_id)
+        return session
+
+    def update(self, call_id, **fields):
+        now = time.monotonic()
+        self._evict_expired(now)
+
+        session = self.sessions.get(call_id) or {}
+        session.update(fields, last_seen=now)
+        self.sessions[call_id] = session
+        self.sessions.move_to_end(call_id)
+
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+
+        return session
+
+    def __len__(self):
+        return len(self.sessions)
+
+call_sessions = CallSessionStore()
+
+def resolve_call_id(request, message):
+    """Identify the call a request belongs to (tool argument, then headers)
+
+    Returns None when the request names no call; caller-scoped tools then
+    refuse rather than share one anonymous session between callers. See
+    store_call_context for the contract.
+    """
+    params = message.get("params") or {}
+    arguments = params.get("arguments") or {}
+
+    call_id = (
+        arguments.get("call_id") or
+        arguments.get("conversation_id") or
+        request.headers.get("x-call-id") or
+        request.headers.get("x-conversation-id")
+    )
+    return str(call_id) if call_id else None
+
+async def get_call_user(call_id):
+    """Resolve the caller for a call, looking the user up at most once per call
+
+    Unidentified calls (no call id, or no number stored by /call-context)
+    have no caller.
+    """
+    if not call_id:
+        return None
+
+    session = call_sessions.get(call_id)
+    if session and session.get('user'):
+        return session['user']
+
+    caller_number = (session or {}).get('caller_number')
+    if not caller_number:
+        return None
+    user = await find_user_by_phone(caller_number)
+    if user:
+        call_sessions.update(call_id, user=user, caller_number=caller_number)
+    return user
+
+# Listing search index, refreshed in the background once it is older than the TTL
+listing_index = None
+listing_index_loaded_at = 0.0
+listing_index_built_at = 0.0
+listing_index_changed_since = None  # newest listing updated_at the index has seen
+listing_index_refresh = None
+
+# The indexed and displayed fields, plus what incremental refreshes need
+LISTING_INDEX_PROJECTION = {
+    "title": 1, "location": 1, "description": 1, "price_per_night": 1, "max_guests": 1,
+    "is_active": 1, "updated_at": 1
+}
+
+async def refresh_listing_index():
+    """Bring the search index up to date with the listings collection
+
+    Normally only listings whose updated_at moved are read and re-indexed;
+    every LISTING_INDEX_FULL_REBUILD seconds all active listings are.
+    """
+    global listing_index, listing_index_loaded_at, listing_index_built_at, listing_index_changed_since
+
+    started = time.monotonic()
+    loop = asyncio.get_running_loop()
+    full = listing_index is None or started - listing_index_built_at > LISTING_INDEX_FULL_REBUILD
+
+    if full:
+        listings = await db.listings.find({"is_active": {"$ne": False}}, LISTING_INDEX_PROJECTION).to_list(length=None)
+        # Tokenizing is CPU work; keep it off the event loop
+        index = await loop.run_in_executor(None, ListingSearchIndex, listings)
+    else:
+        # Re-read one TTL before the newest change seen, so a write that
+        # committed late (or from a backend worker whose clock lags) isn't missed
+        since = listing_index_changed_since - timedelta(seconds=LISTING_INDEX_TTL)
+        listings = await db.listings.find({"updated_at": {"$gte": since}}, LISTING_INDEX_PROJECTION).to_list(length=None)
+        indexed = listing_index.listings
+        changed = [
+            listing for listing in listings
+            if listing.get('is_active') is not False
+            and indexed.get(listing['_id'], {}).get('updated_at') != listing.get('updated_at')
+        ]
+        removed = [
+            listing['_id'] for listing in listings
+            if listing.get('is_active') is False and listing['_id'] in indexed
+        ]
+        if changed or removed:
+            index = await loop.run_in_executor(None, listing_index.updated, changed, removed)
+        else:
+            index = listing_index
+
+    newest = max((listing['updated_at'] for listing in listings if listing.get('updated_at')), default=None)
+    if newest and (listing_index_changed_since is None or newest > listing_index_changed_since):
+        listing_index_changed_since = newest
+    elif listing_index_changed_since is None:
+        listing_index_changed_since = datetime.utcnow()
+
+    listing_index = index
+    listing_index_loaded_at = time.monotonic()
+    if full:
+        listing_index_built_at = listing_index_loaded_at
+        print(f"🗂️ Listing index rebuilt: {len(index)} listings in {(listing_index_loaded_at - started) * 1000:.0f}ms")
+    elif changed or removed:
+        print(f"🗂️ Listing index updated: {len(changed) + len(removed)} changed listing(s) in {(listing_index_loaded_at - started) * 1000:.0f}ms")
+
+async def get_listing_index():
+    """Current listing index; the first call waits for it, later ones never do"""
+    global listing_index_refresh
+
+    if listing_index_refresh is None or listing_index_refresh.done():
+        if listing_index is None or time.monotonic() - listing_index_loaded_at > LISTING_INDEX_TTL:
+            listing_index_refresh = asyncio.create_task(refresh_listing_index())
+
+    if listing_index is None:
+        await asyncio.shield(listing_index_refresh)
+
+    return listing_index
 
 def generate_booking_reference():
     now = datetime.now()
@@ -48,57 +241,55 @@ def calculate_pricing(base_amount, nights):
         "total_amount": total_base + platform_fee + community_contribution
     }
 
-def find_user_by_phone(phone):
-    """Find user by phone number with multiple format matching"""
-    if not phone:
+async def find_user_by_phone(phone):
+    """Find user by phone number via the unique phone_e164 index"""
+    phone_e164 = normalize_phone_e164(phone)
+    if not phone_e164:
         return None
     
-    # Clean phone number
-    clean_phone = phone.replace('+91', '').replace('+', '').replace(' ', '').replace('-', '')
-    
-    # Try different phone number formats
-    phone_patterns = [
-        phone,  # Original format
-        f"+91{clean_phone}",  # With +91
-        f"91{clean_phone}",   # With 91 prefix
-        clean_phone,  # Without country code
-        f"+{clean_phone}",  # With + but no country code
-    ]
-    
-    print(f"🔍 Searching for user with phone patterns: {phone_patterns}")
-    
-    for pattern in phone_patterns:
-        user = db.users.find_one({"phone": pattern})
-        if user:
-            print(f"👤 Found user: {user['full_name']} with phone: {user['phone']}")
-            return user
+    user = await db.users.find_one({"phone_e164": phone_e164})
+    if user:
+        print(f"👤 Found user: {user['full_name']} with phone: {user.get('phone')}")
+        return user
     
     print(f"❌ No user found for phone: {phone}")
     return None
 
 # Store call context endpoint (called by ElevenLabs when call starts)
+#
+# Call id contract: the agent POSTs {"call_id", "to_number"} here when a
+# call starts, and every caller-scoped tool call (get_caller_info,
+# create_booking, get_caller_bookings) must name the same call, either as
+# the `call_id` tool argument (declared in tools/list) or in an
+# `x-call-id` / `x-conversation-id` header. Tool calls that name no call,
+# or a call that was never stored here, get no caller.
 async def store_call_context(request):
     """Store the calling number for this session"""
     try:
         data = await request.json()
         caller_number = data.get('to_number')  # The number being called to
-        call_id = data.get('call_id', 'default')
+        call_id = data.get('call_id')
+        if not call_id:
+            return JSONResponse({"status": "error", "error": "call_id is required"}, status_code=400)
         
         if caller_number:
             # Find user by the number being called
-            user = find_user_by_phone(caller_number)
+            user = await find_user_by_phone(caller_number)
+            call_sessions.update(call_id, user=user, caller_number=caller_number)
             if user:
-                current_call_session[call_id] = {
-                    'user': user,
-                    'caller_number': caller_number
-                }
-                print(f"📞 Call session stored for {user['full_name']} ({caller_number})")
+                print(f"📞 Call session {call_id} stored for {user['full_name']} ({caller_number})")
         
         return JSONResponse({"status": "success"})
     except Exception as e:
         print(f"❌ Error storing call context: {e}")
         return JSONResponse({"status": "error"})
 
+# Declared by every caller-scoped tool so the agent passes its call id
+CALL_ID_PROPERTY = {
+    "type": "string",
+    "description": "ID of the current call, as sent to /call-context when the call started"
+}
+
 # MCP Protocol Handler
 async def handle_mcp_request(request: Request):
     """Handle MCP JSON-RPC requests"""
@@ -147,8 +338,10 @@ async def handle_mcp_request(request: Request):
                     "description": "Get current caller information automatically",
                     "inputSchema": {
                         "type": "object",
-                        "properties": {},
-                        "required": []
+                        "properties": {
+                            "call_id": CALL_ID_PROPERTY
+                        },
+                        "required": ["call_id"]
                     }
                 },
                 {
@@ -185,13 +378,14 @@ async def handle_mcp_request(request: Request):
                     "inputSchema": {
                         "type": "object",
                         "properties": {
+                            "call_id": CALL_ID_PROPERTY,
                             "listing_id": {"type": "string", "description": "The listing ID to book"},
                             "check_in": {"type": "string", "description": "Check-in date in YYYY-MM-DD format"},
                             "check_out": {"type": "string", "description": "Check-out date in YYYY-MM-DD format"},
                             "guests": {"type": "integer", "description": "Number of guests"},
                             "special_requests": {"type": "string", "description": "Any special requests"}
                         },
-                        "required": ["listing_id", "check_in", "check_out", "guests"]
+                        "required": ["call_id", "listing_id", "check_in", "check_out", "guests"]
                     }
                 },
                 {
@@ -199,8 +393,10 @@ async def handle_mcp_request(request: Request):
                     "description": "Get previous bookings for the current caller",
                     "inputSchema": {
                         "type": "object",
-                        "properties": {},
-                        "required": []
+                        "properties": {
+                            "call_id": CALL_ID_PROPERTY
+                        },
+                        "required": ["call_id"]
                     }
                 }
             ]
@@ -215,19 +411,21 @@ async def handle_mcp_request(request: Request):
             tool_name = params.get("name")
             arguments = params.get("arguments", {})
             
-            print(f"🔧 Tool called: {tool_name}")
+            call_id = resolve_call_id(request, message)
+            
+            print(f"🔧 Tool called: {tool_name} (call {call_id})")
             print(f"📋 Arguments: {arguments}")
             
             if tool_name == "get_caller_info":
-                result = await get_caller_info(arguments)
+                result = await get_caller_info(arguments, call_id)
             elif tool_name == "search_experiences_by_location":
                 result = await search_experiences_by_location(arguments)
             elif tool_name == "search_experience_by_title":
                 result = await search_experience_by_title(arguments)
             elif tool_name == "create_booking":
-                result = await create_booking(arguments)
+                result = await create_booking(arguments, call_id)
             elif tool_name == "get_caller_bookings":
-                result = await get_caller_bookings(arguments)
+                result = await get_caller_bookings(arguments, call_id)
             else:
                 result = {"content": [{"type": "text", "text": "Unknown tool"}]}
             
@@ -258,20 +456,15 @@ async def handle_mcp_request(request: Request):
             "error": {"code": -32603, "message": f"Internal error: {str(e)}"}
         }, status_code=500)
 
-async def get_caller_info(arguments):
+async def get_caller_info(arguments, call_id):
     """Get caller information automatically - no phone number needed"""
-    # For now, we'll use a default number since we need ElevenLabs integration
-    # In production, this would come from the call context
-    default_number = "+916300807459"  # Your number for testing
-    
-    user = find_user_by_phone(default_number)
+    # Uses the number stored by /call-context for this call; the user is
+    # cached on the call session
+    user = await get_call_user(call_id)
     
     if user:
-        # Store user in session for other tools to use
-        current_call_session['current_user'] = user
-        
         # Get user's booking history count
-        booking_count = db.bookings.count_documents({"tourist_id": user['_id']})
+        booking_count = await db.bookings.count_documents({"tourist_id": user['_id']})
         
         response_text = f"Hello {user['full_name']}! 🙏\n\n"
         
@@ -296,25 +489,10 @@ async def search_experiences_by_location(arguments):
     if not location:
         return {"content": [{"type": "text", "text": "Please tell me which location you're interested in."}]}
     
-    # Search with variations
-    variations = [location]
-    if location.lower() == 'goa':
-        variations.extend(['goan', 'goanese'])
-    elif location.lower() == 'kerala':
-        variations.extend(['kochi', 'munnar', 'alleppey'])
-    elif location.lower() == 'rajasthan':
-        variations.extend(['rajasthani', 'jaipur', 'udaipur'])
-    
-    patterns = []
-    for var in variations:
-        patterns.extend([
-            {"location": {"$regex": var, "$options": "i"}},
-            {"title": {"$regex": var, "$options": "i"}},
-            {"description": {"$regex": var, "$options": "i"}}
-        ])
-    
-    query = {"$and": [{"$or": patterns}, {"is_active": {"$ne": False}}]}
-    listings = list(db.listings.find(query).limit(5))
+    # Gazetteer expansion (Kerala -> Munnar, Kochi...) and typo-tolerant
+    # matching against the in-memory index
+    index = await get_listing_index()
+    listings = index.search_location(location, limit=5)
     
     print(f"📋 Found {len(listings)} listings for {location}")
     
@@ -337,8 +515,8 @@ async def search_experience_by_title(arguments):
     if not title:
         return {"content": [{"type": "text", "text": "Please tell me the name of the experience you're looking for."}]}
     
-    query = {"$and": [{"title": {"$regex": title, "$options": "i"}}, {"is_active": {"$ne": False}}]}
-    listings = list(db.listings.find(query).limit(1))
+    index = await get_listing_index()
+    listings = index.search_title(title, limit=1)
     
     if not listings:
         return {"content": [{"type": "text", "text": f"I couldn't find an experience called '{title}'. Could you try a different name or search by location?"}]}
@@ -357,7 +535,7 @@ async def search_experience_by_title(arguments):
     
     return {"content": [{"type": "text", "text": response_text}]}
 
-async def create_booking(arguments):
+async def create_booking(arguments, call_id):
     """Create booking for the current caller (no phone number needed)"""
     listing_id = arguments.get("listing_id", "").strip()
     check_in_str = arguments.get("check_in", "").strip()
@@ -365,11 +543,8 @@ async def create_booking(arguments):
     guests = arguments.get("guests", 1)
     special_requests = arguments.get("special_requests", "")
     
-    # Get current user from session
-    user = current_call_session.get('current_user')
-    if not user:
-        # Fallback - try to find user by default number
-        user = find_user_by_phone("+916300807459")
+    # Get current user from the call session
+    user = await get_call_user(call_id)
     
     if not user:
         return {"content": [{"type": "text", "text": "I need to identify your account first. Could you please tell me your registered email or phone number?"}]}
@@ -387,9 +562,12 @@ async def create_booking(arguments):
     
     # Get listing
     try:
-        listing = db.listings.find_one({"_id": ObjectId(listing_id)})
+        listing = await db.listings.find_one({"_id": ObjectId(listing_id)})
     except:
-        listing = db.listings.find_one({"title": {"$regex": listing_id, "$options": "i"}})
+        # The agent passed a name instead of an id: resolve it through the index
+        index = await get_listing_index()
+        matches = index.search_title(listing_id, limit=1)
+        listing = await db.listings.find_one({"_id": matches[0]['_id']}) if matches else None
     
     if not listing:
         return {"content": [{"type": "text", "text": "I couldn't find that experience. Could you provide the correct listing ID?"}]}
@@ -406,13 +584,19 @@ async def create_booking(arguments):
         return {"content": [{"type": "text", "text": "Check-out date should be after check-in date. Could you correct that?"}]}
     
     # Create booking
+    booking_id = ObjectId()
     pricing = calculate_pricing(listing['price_per_night'], nights)
     booking_ref = generate_booking_reference()
     
     booking = {
+        "_id": booking_id,
         "listing_id": listing['_id'],
         "tourist_id": user['_id'],  # Automatically link to user account
         "host_id": listing.get('host_id'),
+        "listing_type": "homestay",
+        "listing_title": listing['title'],
+        "listing_location": listing.get('location'),
+        "listing_location_key": canonical_location_key(listing.get('location')),
         "tourist_name": user['full_name'],  # Use user's name from account
         "tourist_phone": user['phone'],  # Use user's phone from account
         "check_in": check_in,
@@ -432,8 +616,25 @@ async def create_booking(arguments):
         "updated_at": datetime.now()
     }
     
+    # Hold the nights right before writing the booking, through the same CAS
+    # as website bookings
+    try:
+        reserved = await reserve_nights(db, listing['_id'], check_in, check_out, booking_id)
+    except AvailabilityConflictError:
+        return {"content": [{"type": "text", "text": "Lots of people are booking this stay right now. Could you give me a moment and try again?"}]}
+    if not reserved:
+        return {"content": [{"type": "text", "text": f"Sorry, {listing['title']} isn't available for those dates. Would you like to try different dates?"}]}
+    
     # Save to MongoDB
-    result = db.bookings.insert_one(booking)
+    try:
+        await db.bookings.insert_one(booking)
+    except Exception:
+        # If the release fails too, the nights are reclaimed as orphaned
+        try:
+            await release_nights(db, listing['_id'], booking_id)
+        except Exception as release_error:
+            print(f"⚠️ Could not release nights of failed booking {booking_id}: {release_error}")
+        raise
     print(f"✅ Booking created: {booking_ref} for {user['full_name']}")
     
     response_text = f"🎉 Perfect, {user['full_name']}! Your booking is confirmed!\n\n"
@@ -447,25 +648,29 @@ async def create_booking(arguments):
     
     return {"content": [{"type": "text", "text": response_text}]}
 
-async def get_caller_bookings(arguments):
+async def get_caller_bookings(arguments, call_id):
     """Get caller's previous bookings"""
-    user = current_call_session.get('current_user')
-    if not user:
-        user = find_user_by_phone("+916300807459")
+    user = await get_call_user(call_id)
     
     if not user:
         return {"content": [{"type": "text", "text": "I need to identify your account first to show your bookings."}]}
     
-    bookings = list(db.bookings.find({"tourist_id": user['_id']}).sort("created_at", -1).limit(5))
+    bookings = await db.bookings.find({"tourist_id": user['_id']}).sort("created_at", -1).limit(5).to_list(length=5)
     
     if not bookings:
         return {"content": [{"type": "text", "text": f"Hi {user['full_name']}! You don't have any bookings yet. Would you like to make your first booking?"}]}
     
     response_text = f"Here are your recent bookings, {user['full_name']}:\n\n"
     
+    # One round trip for all listing titles instead of one per booking
+    listing_ids = list({booking['listing_id'] for booking in bookings})
+    listing_titles = {
+        listing['_id']: listing['title']
+        async for listing in db.listings.find({"_id": {"$in": listing_ids}}, {"title": 1})
+    }
+    
     for i, booking in enumerate(bookings, 1):
-        listing = db.listings.find_one({"_id": booking['listing_id']})
-        listing_title = listing['title'] if listing else "Experience"
+        listing_title = listing_titles.get(booking['listing_id']) or booking.get('listing_title') or "Experience"
         
         check_in = booking['check_in'].strftime('%B %d, %Y')
         status = booking.get('status', 'unknown')
@@ -482,14 +687,19 @@ async def get_caller_bookings(arguments):
 async def health_check(request):
     """Health check"""
     try:
-        listings_count = db.listings.count_documents({})
-        users_count = db.users.count_documents({})
-        bookings_count = db.bookings.count_documents({})
+        listings_count, users_count, bookings_count = await asyncio.gather(
+            db.listings.count_documents({}),
+            db.users.count_documents({}),
+            db.bookings.count_documents({})
+        )
         return JSONResponse({
             "status": "healthy",
             "listings": listings_count,
             "users": users_count,
             "bookings": bookings_count,
+            "mongo_pool": {"min": MONGO_MIN_POOL_SIZE, "max": MONGO_MAX_POOL_SIZE},
+            "active_calls": len(call_sessions),
+            "indexed_listings": len(listing_index) if listing_index is not None else 0,
             "timestamp": datetime.now().isoformat()
         })
     except Exception as e:
@@ -506,7 +716,7 @@ routes = [
     Route("/call-context", store_call_context, methods=["POST"]),
 ]
 
-app = Starlette(routes=routes)
+app = Starlette(routes=routes, on_startup=[check_mongo_connection])
 
 if __name__ == "__main__":
     print("🚀 VillageStay MCP Server with Auto Caller Detection Starting...")
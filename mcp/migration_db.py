@@ -1,71 +1,236 @@
-import pymongo
-from pymongo import MongoClient
+import argparse
+import os
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
 import certifi
+from pymongo import MongoClient, ReplaceOne, ASCENDING
 
 # Source (local) connection
-LOCAL_URL = "mongodb://localhost:27017/"
+LOCAL_URL = os.environ.get("LOCAL_MONGO_URL") or "mongodb://localhost:27017/"
 LOCAL_DB_NAME = "villagestay"
 
 # Destination (cloud) connection
-CLOUD_URL = "URL_TO_YOUR_CLOUD_MONGODB"  # Replace with your actual cloud MongoDB URL
+CLOUD_URL = os.environ.get("CLOUD_MONGO_URL") or "URL_TO_YOUR_CLOUD_MONGODB"  # Replace with your actual cloud MongoDB URL
 CLOUD_DB_NAME = "villagestay"
 
-def migrate_database():
+BATCH_SIZE = 1000
+WORKERS = 4
+
+# Per-collection progress lives in the destination, next to the data it describes
+CHECKPOINT_COLLECTION = "_migration_checkpoints"
+
+# Index options that carry over to create_index unchanged
+INDEX_OPTIONS = (
+    "unique", "sparse", "expireAfterSeconds", "partialFilterExpression",
+    "collation", "weights", "default_language", "language_override",
+    "textIndexVersion", "2dsphereIndexVersion", "bits", "min", "max",
+    "wildcardProjection", "hidden",
+)
+
+print_lock = threading.Lock()
+
+def log(message):
+    with print_lock:
+        print(message, flush=True)
+
+def load_checkpoint(cloud_db, collection_name):
+    return cloud_db[CHECKPOINT_COLLECTION].find_one({"_id": collection_name}) or {}
+
+def save_checkpoint(cloud_db, collection_name, **fields):
+    cloud_db[CHECKPOINT_COLLECTION].update_one(
+        {"_id": collection_name},
+        {"$set": {**fields, "updated_at": datetime.utcnow()}},
+        upsert=True
+    )
+
+def copy_indexes(local_collection, cloud_collection):
+    """Recreate every secondary index of the source collection"""
+    created = 0
+    for name, info in local_collection.index_information().items():
+        if name == "_id_":
+            continue
+
+        keys = info["key"]
+        if any(field == "_fts" for field, _ in keys):
+            # Text indexes report internal keys; rebuild them from their weights
+            keys = [(field, "text") for field in info.get("weights", {})]
+
+        options = {key: info[key] for key in INDEX_OPTIONS if key in info}
+        cloud_collection.create_index(keys, name=name, **options)
+        created += 1
+
+    return created
+
+def flush_batch(cloud_collection, batch):
+    """Upsert a batch by _id; unordered, so a re-run after a crash is harmless"""
+    result = cloud_collection.bulk_write(
+        [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in batch],
+        ordered=False
+    )
+    return result.upserted_count + result.modified_count
+
+def migrate_collection(local_db, cloud_db, collection_name, batch_size, resume=True, skip_indexes=False):
+    """Stream one collection in _id order, checkpointing after every batch"""
+    local_collection = local_db[collection_name]
+    cloud_collection = cloud_db[collection_name]
+
+    checkpoint = load_checkpoint(cloud_db, collection_name) if resume else {}
+    if checkpoint.get("done"):
+        log(f"⏭️  {collection_name}: already migrated ({checkpoint.get('copied', 0)} documents)")
+        return {"collection": collection_name, "copied": 0, "skipped": True}
+
+    last_id = checkpoint.get("last_id")
+    copied = checkpoint.get("copied", 0) if last_id is not None else 0
+    query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+
+    if last_id is not None:
+        log(f"↪️  {collection_name}: resuming after _id {last_id} ({copied} already copied)")
+
+    total = local_collection.estimated_document_count()
+    started = time.time()
+    written_this_run = 0
+    batch = []
+
+    cursor = local_collection.find(query).sort("_id", ASCENDING).batch_size(batch_size)
+    try:
+        for doc in cursor:
+            batch.append(doc)
+            if len(batch) < batch_size:
+                continue
+
+            flush_batch(cloud_collection, batch)
+            copied += len(batch)
+            written_this_run += len(batch)
+            save_checkpoint(cloud_db, collection_name, last_id=batch[-1]["_id"], copied=copied, done=False)
+            batch = []
+
+            elapsed = max(time.time() - started, 1e-6)
+            log(f"🔄 {collection_name}: {copied}/{total} documents ({written_this_run / elapsed:.0f} docs/s)")
+    finally:
+        cursor.close()
+
+    if batch:
+        flush_batch(cloud_collection, batch)
+        copied += len(batch)
+        written_this_run += len(batch)
+        save_checkpoint(cloud_db, collection_name, last_id=batch[-1]["_id"], copied=copied, done=False)
+
+    # Build indexes after the bulk load; it is much faster than maintaining them per insert
+    indexes = 0 if skip_indexes else copy_indexes(local_collection, cloud_collection)
+
+    save_checkpoint(cloud_db, collection_name, copied=copied, done=True)
+
+    elapsed = max(time.time() - started, 1e-6)
+    log(f"✅ {collection_name}: {written_this_run} documents in {elapsed:.1f}s "
+        f"({written_this_run / elapsed:.0f} docs/s), {indexes} indexes")
+
+    return {"collection": collection_name, "copied": written_this_run, "indexes": indexes, "seconds": elapsed}
+
+def list_source_collections(local_db, only=None):
+    """Plain collections to migrate (views and system collections are skipped)"""
+    names = [
+        info["name"] for info in local_db.list_collections()
+        if info.get("type", "collection") == "collection"
+        and not info["name"].startswith("system.")
+        and info["name"] != CHECKPOINT_COLLECTION
+    ]
+    if only:
+        missing = set(only) - set(names)
+        if missing:
+            raise ValueError(f"Collections not found in source: {sorted(missing)}")
+        names = [name for name in names if name in only]
+
+    # Largest first so the long copies start early and the pool stays busy
+    return sorted(names, key=lambda name: -local_db[name].estimated_document_count())
+
+def migrate_database(collections=None, batch_size=BATCH_SIZE, workers=WORKERS, resume=True, skip_indexes=False):
+    local_client = None
+    cloud_client = None
+
     try:
         # Connect to source and destination
         print("Connecting to databases...")
         local_client = MongoClient(LOCAL_URL)
-        
+
         # Connect to cloud with certifi certificates
         cloud_client = MongoClient(
             CLOUD_URL,
             tlsCAFile=certifi.where(),
-            serverSelectionTimeoutMS=30000
+            serverSelectionTimeoutMS=30000,
+            maxPoolSize=max(workers * 2, 10)
         )
-        
+
         local_db = local_client[LOCAL_DB_NAME]
         cloud_db = cloud_client[CLOUD_DB_NAME]
-        
+
         # Test cloud connection
         print("Testing cloud connection...")
         cloud_client.server_info()
         print("Cloud connection successful!")
-        
-        # Get all collections from local database
-        collections = local_db.list_collection_names()
-        print(f"Found {len(collections)} collections: {collections}")
-        
-        # Migrate each collection
-        for collection_name in collections:
-            print(f"\nMigrating collection: {collection_name}")
-            
-            local_collection = local_db[collection_name]
-            cloud_collection = cloud_db[collection_name]
-            
-            # Get all documents from local collection
-            documents = list(local_collection.find())
-            
-            if documents:
-                # Insert documents into cloud collection
-                cloud_collection.insert_many(documents)
-                print(f"Migrated {len(documents)} documents")
-            else:
-                print("No documents found in this collection")
-        
+
+        if not resume:
+            cloud_db[CHECKPOINT_COLLECTION].delete_many({})
+
+        names = list_source_collections(local_db, collections)
+        print(f"Found {len(names)} collections: {names}")
+        print(f"Batch size {batch_size}, {workers} parallel workers, resume={'on' if resume else 'off'}")
+
+        started = time.time()
+        results = []
+        failures = []
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(migrate_collection, local_db, cloud_db, name, batch_size, resume, skip_indexes): name
+                for name in names
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    log(f"❌ {name}: {e} (re-run to resume from the last checkpoint)")
+                    failures.append(name)
+
+        elapsed = max(time.time() - started, 1e-6)
+        copied = sum(result["copied"] for result in results)
+        print(f"\n📊 {copied} documents across {len(results)} collections in {elapsed:.1f}s ({copied / elapsed:.0f} docs/s)")
+
+        if failures:
+            print(f"❌ Migration incomplete, failed collections: {failures}")
+            sys.exit(1)
+
         print("\n✅ Migration completed successfully!")
-        
+
     except Exception as e:
         print(f"❌ Error during migration: {e}")
         sys.exit(1)
-    
+
     finally:
         # Close connections
-        try:
-            local_client.close()
-            cloud_client.close()
-        except:
-            pass
+        for client in (local_client, cloud_client):
+            if client:
+                client.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy the local VillageStay database to the cloud cluster")
+    parser.add_argument("--collections", nargs="+", help="Only migrate these collections")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Collections copied in parallel")
+    parser.add_argument("--restart", action="store_true", help="Ignore checkpoints and copy everything again")
+    parser.add_argument("--skip-indexes", action="store_true", help="Do not recreate secondary indexes")
+    args = parser.parse_args()
+
+    migrate_database(
+        collections=args.collections,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        resume=not args.restart,
+        skip_indexes=args.skip_indexes
+    )
 
 if __name__ == "__main__":
-    migrate_database()
\ No newline at end of file
+    main()
@@ -0,0 +1,121 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+
+pytest.importorskip("bson")
+pytest.importorskip("dotenv")
+
+from bson import ObjectId
+from availability import (
+    MAX_RESERVATION_ATTEMPTS,
+    AvailabilityConflictError,
+    release_nights,
+    reserve_nights,
+)
+from backend_shared import Config
+from tests.fake_motor import FakeDatabase
+
+CHECK_IN = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=10)
+CHECK_OUT = CHECK_IN + timedelta(days=3)
+
+@pytest.fixture
+def db():
+    return FakeDatabase()
+
+@pytest.fixture
+def listing_id(db):
+    listing_id = ObjectId()
+    asyncio.run(db.listings.insert_one({"_id": listing_id, "availability_calendar": {}}))
+    return listing_id
+
+def reserve(db, listing_id, booking_id, check_in=CHECK_IN, check_out=CHECK_OUT):
+    return asyncio.run(reserve_nights(db, listing_id, check_in, check_out, booking_id))
+
+def add_interval(db, listing_id, booking_id, **fields):
+    """Put a reservation made by another writer (e.g. the website) on the listing"""
+    reserve(db, listing_id, booking_id)
+    interval = db.listing_availability.docs[listing_id]['reservations'][-1]
+    interval.update(fields)
+
+def insert_booking(db, listing_id, booking_id, status):
+    asyncio.run(db.bookings.insert_one({
+        "_id": booking_id,
+        "listing_id": listing_id,
+        "listing_type": "homestay",
+        "check_in": CHECK_IN,
+        "check_out": CHECK_OUT,
+        "status": status,
+        "created_at": datetime.utcnow()
+    }))
+
+def test_reserve_then_overlap_is_refused(db, listing_id):
+    first = ObjectId()
+    assert reserve(db, listing_id, first)
+    insert_booking(db, listing_id, first, "confirmed")
+
+    assert not reserve(db, listing_id, ObjectId(), CHECK_IN + timedelta(days=1), CHECK_OUT + timedelta(days=1))
+    assert reserve(db, listing_id, ObjectId(), CHECK_OUT, CHECK_OUT + timedelta(days=2))
+
+def test_reserve_retries_lost_compare_and_swap(db, listing_id):
+    reserve(db, listing_id, ObjectId(), CHECK_OUT, CHECK_OUT + timedelta(days=1))
+    lost = {"count": 0}
+
+    def concurrent_writer(collection):
+        if lost["count"] < 2:
+            lost["count"] += 1
+            collection.docs[listing_id]['version'] += 1
+
+    db.listing_availability.before_update = concurrent_writer
+
+    assert reserve(db, listing_id, ObjectId())
+    assert lost["count"] == 2
+    assert len(db.listing_availability.docs[listing_id]['reservations']) == 2
+
+def test_reserve_gives_up_when_always_losing(db, listing_id):
+    reserve(db, listing_id, ObjectId(), CHECK_OUT, CHECK_OUT + timedelta(days=1))
+    attempts = {"count": 0}
+
+    def concurrent_writer(collection):
+        attempts["count"] += 1
+        collection.docs[listing_id]['version'] += 1
+
+    db.listing_availability.before_update = concurrent_writer
+
+    with pytest.raises(AvailabilityConflictError):
+        reserve(db, listing_id, ObjectId())
+    assert attempts["count"] == MAX_RESERVATION_ATTEMPTS
+
+def test_lapsed_pending_hold_is_reclaimed_and_expired(db, listing_id):
+    unpaid = ObjectId()
+    add_interval(db, listing_id, unpaid, held_until=datetime.utcnow() - timedelta(minutes=1))
+    insert_booking(db, listing_id, unpaid, "pending")
+
+    assert reserve(db, listing_id, ObjectId())
+    assert db.bookings.docs[unpaid]['status'] == "expired"
+
+def test_live_pending_hold_keeps_its_nights(db, listing_id):
+    unpaid = ObjectId()
+    add_interval(db, listing_id, unpaid, held_until=datetime.utcnow() + timedelta(minutes=Config.PENDING_BOOKING_HOLD_MINUTES))
+    insert_booking(db, listing_id, unpaid, "pending")
+
+    assert not reserve(db, listing_id, ObjectId())
+    assert db.bookings.docs[unpaid]['status'] == "pending"
+
+def test_orphaned_reservation_is_reclaimed(db, listing_id):
+    crashed = ObjectId()
+    add_interval(db, listing_id, crashed, reserved_at=datetime.utcnow() - timedelta(minutes=Config.ORPHANED_RESERVATION_MINUTES + 1))
+
+    assert reserve(db, listing_id, ObjectId())
+
+def test_reservation_waiting_for_its_insert_keeps_its_nights(db, listing_id):
+    reserve(db, listing_id, ObjectId())
+
+    assert not reserve(db, listing_id, ObjectId())
+
+def test_release_frees_the_nights(db, listing_id):
+    booking_id = ObjectId()
+    reserve(db, listing_id, booking_id)
+
+    assert asyncio.run(release_nights(db, listing_id, booking_id))
+    assert reserve(db, listing_id, ObjectId())
+    assert not asyncio.run(release_nights(db, listing_id, booking_id))
@@ -0,0 +1,30 @@
+import asyncio
+import pytest
+
+pytest.importorskip("motor")
+pytest.importorskip("starlette")
+
+import mcp_server
+from utils import location_utils, phone_utils
+
+class FakeUsers:
+    def __init__(self):
+        self.queries = []
+
+    async def find_one(self, query):
+        self.queries.append(query)
+        return None
+
+def test_keys_come_from_the_backend():
+    assert mcp_server.normalize_phone_e164 is phone_utils.normalize_phone_e164
+    assert mcp_server.canonical_location_key is location_utils.canonical_location_key
+
+@pytest.mark.parametrize("spoken", ["98765 43210", "098765-43210", "+91 98765 43210", "0091 9876543210"])
+def test_caller_lookup_uses_the_stored_phone_form(monkeypatch, spoken):
+    users = FakeUsers()
+    monkeypatch.setattr(mcp_server, "db", type("FakeDB", (), {"users": users})())
+
+    asyncio.run(mcp_server.find_user_by_phone(spoken))
+
+    assert users.queries == [{"phone_e164": phone_utils.normalize_phone_e164("9876543210")}]
+    assert users.queries[0]["phone_e164"] == "+919876543210"
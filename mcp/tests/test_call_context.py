@@ -0,0 +1,81 @@
+import asyncio
+import json
+import pytest
+
+pytest.importorskip("motor")
+pytest.importorskip("starlette")
+
+import mcp_server
+
+CALLER_NUMBER = "+919876543210"
+CALLER = {"_id": "user-1", "full_name": "Asha Rao", "phone": CALLER_NUMBER}
+
+class FakeRequest:
+    def __init__(self, payload, headers=None):
+        self.payload = payload
+        self.headers = headers or {}
+
+    async def json(self):
+        return self.payload
+
+    async def body(self):
+        return json.dumps(self.payload).encode()
+
+@pytest.fixture(autouse=True)
+def call_store(monkeypatch):
+    async def find_user_by_phone(phone):
+        return CALLER if phone == CALLER_NUMBER else None
+
+    monkeypatch.setattr(mcp_server, "call_sessions", mcp_server.CallSessionStore())
+    monkeypatch.setattr(mcp_server, "find_user_by_phone", find_user_by_phone)
+
+def store(call_id):
+    request = FakeRequest({"call_id": call_id, "to_number": CALLER_NUMBER})
+    return asyncio.run(mcp_server.store_call_context(request))
+
+def tool_call(name, arguments, headers=None):
+    message = {"jsonrpc": "2.0", "id": 1, "method": "tools/call", "params": {"name": name, "arguments": arguments}}
+    request = FakeRequest(message, headers)
+    return message, request
+
+def test_caller_resolves_from_call_id_argument():
+    store("call-42")
+    message, request = tool_call("get_caller_info", {"call_id": "call-42"})
+
+    call_id = mcp_server.resolve_call_id(request, message)
+
+    assert call_id == "call-42"
+    assert asyncio.run(mcp_server.get_call_user(call_id)) == CALLER
+
+def test_caller_resolves_from_call_id_header():
+    store("call-43")
+    for header in ("x-call-id", "x-conversation-id"):
+        message, request = tool_call("get_caller_info", {}, headers={header: "call-43"})
+
+        call_id = mcp_server.resolve_call_id(request, message)
+
+        assert call_id == "call-43"
+        assert asyncio.run(mcp_server.get_call_user(call_id)) == CALLER
+
+def test_unnamed_call_has_no_caller():
+    store("call-44")
+    message, request = tool_call("get_caller_info", {}, headers={"mcp-session-id": "call-44"})
+
+    call_id = mcp_server.resolve_call_id(request, message)
+
+    assert call_id is None
+    assert asyncio.run(mcp_server.get_call_user(call_id)) is None
+
+def test_unknown_call_has_no_caller():
+    store("call-45")
+    assert asyncio.run(mcp_server.get_call_user("call-other")) is None
+
+def test_caller_scoped_tools_require_call_id():
+    message = {"jsonrpc": "2.0", "id": 1, "method": "tools/list"}
+    response = asyncio.run(mcp_server.handle_mcp_request(FakeRequest(message)))
+    tools = {tool["name"]: tool for tool in json.loads(response.body)["result"]["tools"]}
+
+    for name in ("get_caller_info", "create_booking", "get_caller_bookings"):
+        schema = tools[name]["inputSchema"]
+        assert schema["properties"]["call_id"]["type"] == "string"
+        assert "call_id" in schema["required"]
@@ -0,0 +1,120 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from listing_search import ListingSearchIndex, expand_location
+
+LISTINGS = [
+    {"_id": 1, "title": "Tea Garden Cottage", "location": "Munnar, Idukki", "description": "Misty hills and spice walks"},
+    {"_id": 2, "title": "Backwater Farm Stay", "location": "Alleppey", "description": "Houseboat rides at dawn"},
+    {"_id": 3, "title": "Desert Camp", "location": "Jaisalmer, Rajasthan", "description": "Camel safari under the stars"},
+    {"_id": 4, "title": "Haveli Homestay", "location": "Udaipur", "description": "Lake views from a heritage haveli"},
+]
+
+def ids(listings):
+    return {listing["_id"] for listing in listings}
+
+@pytest.fixture
+def index():
+    return ListingSearchIndex(LISTINGS)
+
+def test_region_alias_finds_places_in_it(index):
+    assert ids(index.search_location("Kerala")) == {1, 2}
+    assert ids(index.search_location("Rajasthan")) == {3, 4}
+
+def test_place_name_matches_directly(index):
+    assert ids(index.search_location("Udaipur")) == {4}
+
+def test_misspelled_region_and_place(index):
+    assert expand_location("Kerela")[0] == "kerala"
+    assert ids(index.search_location("Kerela")) == {1, 2}
+    assert ids(index.search_location("Munar")) == {1}
+
+def test_misheard_title(index):
+    assert ids(index.search_title("tea gardn cottage")) == {1}
+    assert ids(index.search_title("haveli")) == {4}
+
+def test_unknown_location(index):
+    assert index.search_location("Antarctica") == []
+
+def test_empty_index():
+    empty = ListingSearchIndex()
+    assert len(empty) == 0
+    assert empty.search_location("Kerala") == []
+    assert empty.search_title("Desert Camp") == []
+
+def test_updated_replaces_adds_and_removes(index):
+    updated = index.updated(
+        changed=[
+            {"_id": 2, "title": "Backwater Farm Stay", "location": "Kumarakom", "description": ""},
+            {"_id": 5, "title": "Coorg Coffee Estate", "location": "Coorg", "description": ""},
+        ],
+        removed_ids=[3]
+    )
+
+    assert ids(updated.search_location("Kumarakom")) == {2}
+    assert updated.search_location("Alleppey") == []
+    assert ids(updated.search_location("Karnataka")) == {5}
+    assert ids(updated.search_location("Rajasthan")) == {4}
+    # the original index is untouched
+    assert ids(index.search_location("Rajasthan")) == {3, 4}
+    assert len(updated) == 4
+
+class TestRefreshAfterTTL:
+    @pytest.fixture(autouse=True)
+    def server(self, monkeypatch):
+        pytest.importorskip("motor")
+        pytest.importorskip("starlette")
+        import mcp_server
+        from tests.fake_motor import FakeDatabase
+
+        db = FakeDatabase()
+        self.now = datetime.utcnow()
+        for listing in LISTINGS:
+            db.listings.docs[listing["_id"]] = {**listing, "is_active": True, "updated_at": self.now - timedelta(days=1)}
+
+        monkeypatch.setattr(mcp_server, "db", db)
+        monkeypatch.setattr(mcp_server, "listing_index", None)
+        monkeypatch.setattr(mcp_server, "listing_index_loaded_at", 0.0)
+        monkeypatch.setattr(mcp_server, "listing_index_built_at", 0.0)
+        monkeypatch.setattr(mcp_server, "listing_index_changed_since", None)
+        monkeypatch.setattr(mcp_server, "listing_index_refresh", None)
+        self.server = mcp_server
+        self.db = db
+
+    async def expire_and_refresh(self):
+        # Pretend LISTING_INDEX_TTL has passed since the last refresh
+        self.server.listing_index_loaded_at -= self.server.LISTING_INDEX_TTL + 1
+        stale = await self.server.get_listing_index()
+        await self.server.listing_index_refresh
+        return stale, await self.server.get_listing_index()
+
+    def test_changed_listings_are_picked_up_incrementally(self):
+        async def scenario():
+            first = await self.server.get_listing_index()
+            assert ids(first.search_location("Rajasthan")) == {3, 4}
+
+            self.db.listings.docs[5] = {
+                "_id": 5, "title": "Coorg Coffee Estate", "location": "Coorg",
+                "is_active": True, "updated_at": self.now
+            }
+            self.db.listings.docs[3].update(is_active=False, updated_at=self.now)
+
+            stale, fresh = await self.expire_and_refresh()
+
+            # Readers are never blocked on a refresh: they get the old index meanwhile
+            assert stale is first
+            assert fresh is not first
+            assert ids(fresh.search_location("Karnataka")) == {5}
+            assert ids(fresh.search_location("Rajasthan")) == {4}
+            # not a full rebuild: unchanged listings were carried over
+            assert fresh.tokens[1] is first.tokens[1]
+
+        asyncio.run(scenario())
+
+    def test_nothing_changed_keeps_the_index(self):
+        async def scenario():
+            first = await self.server.get_listing_index()
+            _, fresh = await self.expire_and_refresh()
+            assert fresh is first
+
+        asyncio.run(scenario())
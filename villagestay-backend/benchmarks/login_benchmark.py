@@ -0,0 +1,109 @@
+# villagestay-backend/benchmarks/login_benchmark.py
+#
+# Login latency under concurrency. Against a running server it fires
+# --requests logins from --concurrency threads and reports p50/p95/p99,
+# throughput and status codes (503s mean the hashing pool shed load). With
+# --local it skips HTTP and times password verification on the hashing pool
+# directly, which is the quickest way to pick PASSWORD_HASH_METHOD and
+# PASSWORD_HASH_WORKERS for a machine.
+#
+# Usage (from villagestay-backend/):
+#     python -m benchmarks.login_benchmark --url http://localhost:5000 \
+#         --email user@example.com --password secret [--concurrency 50] [--requests 500]
+#     python -m benchmarks.login_benchmark --local [--concurrency 50] [--requests 500]
+
+import argparse
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+CONCURRENCY = 50
+REQUESTS = 500
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def run(task, concurrency, total):
+    """Run task() total times on concurrency threads; returns (latencies, outcomes, seconds)"""
+    def timed(_):
+        started = time.perf_counter()
+        outcome = task()
+        return time.perf_counter() - started, outcome
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(timed, range(total)))
+    elapsed = time.perf_counter() - started
+
+    return [latency for latency, _ in results], Counter(outcome for _, outcome in results), elapsed
+
+def http_login_task(url, email, password):
+    import requests
+
+    session = requests.Session()
+    endpoint = f"{url.rstrip('/')}/api/auth/login"
+
+    def task():
+        try:
+            return session.post(endpoint, json={"email": email, "password": password}, timeout=30).status_code
+        except requests.RequestException as e:
+            return type(e).__name__
+    return task
+
+def local_verify_task():
+    from config import Config
+    from werkzeug.security import generate_password_hash
+    from utils.password_utils import verify_password, PasswordHashBusyError
+
+    password = "benchmark-password"
+    password_hash = generate_password_hash(password, Config.PASSWORD_HASH_METHOD)
+    print(f"Hash method {Config.PASSWORD_HASH_METHOD}, {Config.PASSWORD_HASH_WORKERS} hashing workers, "
+          f"queue {Config.PASSWORD_HASH_QUEUE}")
+
+    def task():
+        try:
+            return "ok" if verify_password(password, password_hash)[0] else "invalid"
+        except PasswordHashBusyError:
+            return "busy"
+    return task
+
+def report(latencies, outcomes, elapsed, concurrency):
+    print(f"\n📊 {len(latencies)} logins at concurrency {concurrency} in {elapsed:.1f}s "
+          f"({len(latencies) / max(elapsed, 1e-6):.1f}/s)")
+    for pct in (50, 95, 99):
+        print(f"   p{pct}: {percentile(latencies, pct) * 1000:.0f}ms")
+    print(f"   max: {max(latencies) * 1000:.0f}ms")
+    print(f"   outcomes: {dict(outcomes)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure login latency percentiles under concurrency")
+    parser.add_argument("--url", help="Base URL of a running backend")
+    parser.add_argument("--email")
+    parser.add_argument("--password")
+    parser.add_argument("--local", action="store_true", help="Time password verification in-process instead of HTTP")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--requests", type=int, default=REQUESTS)
+    args = parser.parse_args()
+
+    if args.local:
+        task = local_verify_task()
+    elif args.url and args.email and args.password:
+        task = http_login_task(args.url, args.email, args.password)
+    else:
+        parser.error("either --local or --url with --email and --password is required")
+
+    try:
+        latencies, outcomes, elapsed = run(task, args.concurrency, args.requests)
+    except Exception as e:
+        print(f"❌ Benchmark failed: {e}")
+        sys.exit(1)
+
+    report(latencies, outcomes, elapsed, args.concurrency)
+
+if __name__ == "__main__":
+    main()
@@ -32,4 +32,81 @@ class Config:
     AZURE_GPT_ENDPOINT = os.environ.get('AZURE_GPT_ENDPOINT') or 'https://codecuffs1.openai.azure.com/'
     AZURE_GPT_API_KEY = os.environ.get('AZURE_GPT_API_KEY')
     AZURE_GPT_API_VERSION = os.environ.get('AZURE_GPT_API_VERSION') or '2024-12-01-preview'
-    AZURE_GPT_DEPLOYMENT = os.environ.get('AZURE_GPT_DEPLOYMENT') or 'gpt-4o'
\ No newline at end of file
+    AZURE_GPT_DEPLOYMENT = os.environ.get('AZURE_GPT_DEPLOYMENT') or 'gpt-4o'
+    
+    # Background voice-to-listing workers (transcription + Gemini stages), how
+    # many more jobs may wait for one (beyond that the route answers 503), and
+    # seconds without progress before a queued/processing job is marked failed
+    VOICE_LISTING_WORKERS = int(os.environ.get('VOICE_LISTING_WORKERS') or 4)
+    VOICE_LISTING_QUEUE = int(os.environ.get('VOICE_LISTING_QUEUE') or 16)
+    VOICE_LISTING_JOB_TIMEOUT = int(os.environ.get('VOICE_LISTING_JOB_TIMEOUT') or 600)
+
+    # Azure OpenAI Whisper (speech-to-text)
+    AZURE_WHISPER_ENDPOINT = os.environ.get('AZURE_WHISPER_ENDPOINT')
+    AZURE_WHISPER_API_KEY = os.environ.get('AZURE_WHISPER_API_KEY')
+    AZURE_WHISPER_API_VERSION = os.environ.get('AZURE_WHISPER_API_VERSION') or '2024-06-01'
+    
+    # Audio ingest limits (per request) and transcoder binary
+    MAX_AUDIO_BYTES = int(os.environ.get('MAX_AUDIO_BYTES') or 10 * 1024 * 1024)
+    MAX_AUDIO_SECONDS = int(os.environ.get('MAX_AUDIO_SECONDS') or 300)
+    FFMPEG_BINARY = os.environ.get('FFMPEG_BINARY') or 'ffmpeg'
+    
+    # Long-audio transcription: clips are split on silence into segments no
+    # longer than this and transcribed concurrently by a bounded pool
+    SPEECH_SEGMENT_MAX_SECONDS = int(os.environ.get('SPEECH_SEGMENT_MAX_SECONDS') or 50)
+    SPEECH_TRANSCRIPTION_WORKERS = int(os.environ.get('SPEECH_TRANSCRIPTION_WORKERS') or 4)
+    
+    # Budget for importing the app and running create_app(); exceeding it logs
+    # a warning, and tests/test_startup.py fails
+    STARTUP_BUDGET_MS = int(os.environ.get('STARTUP_BUDGET_MS') or 1500)
+    
+    # Country code assumed for phone numbers entered without one (E.164 digits)
+    DEFAULT_PHONE_COUNTRY_CODE = os.environ.get('DEFAULT_PHONE_COUNTRY_CODE') or '91'
+    
+    # Gemini response cache: entries kept in-process in front of Mongo
+    LLM_CACHE_MEMORY_ENTRIES = int(os.environ.get('LLM_CACHE_MEMORY_ENTRIES') or 512)
+    
+    # Days a cached field translation is kept (TTL index on translation_cache)
+    TRANSLATION_CACHE_TTL_DAYS = int(os.environ.get('TRANSLATION_CACHE_TTL_DAYS') or 30)
+    
+    # Gemini HTTP timeout, and how long a caller waits on an identical request
+    # already in flight before giving up (seconds)
+    GEMINI_REQUEST_TIMEOUT = int(os.environ.get('GEMINI_REQUEST_TIMEOUT') or 60)
+    GEMINI_COALESCE_TIMEOUT = int(os.environ.get('GEMINI_COALESCE_TIMEOUT') or 60)
+    
+    # Outbound Gemini rate limit shared by every feature; GEMINI_SHARED_QUOTA
+    # also enforces it across workers through a counter in Mongo
+    GEMINI_REQUESTS_PER_MINUTE = int(os.environ.get('GEMINI_REQUESTS_PER_MINUTE') or 60)
+    GEMINI_BURST = int(os.environ.get('GEMINI_BURST') or 10)
+    GEMINI_SHARED_QUOTA = (os.environ.get('GEMINI_SHARED_QUOTA') or 'false').lower() == 'true'
+    
+    # Identity cache for JWT-authenticated users (seconds, entries per worker)
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL') or 30)
+    USER_CACHE_MAX_ENTRIES = int(os.environ.get('USER_CACHE_MAX_ENTRIES') or 10000)
+    
+    # How long (seconds) after login the JWT's user_type claim is trusted
+    # without reading the user document
+    ROLE_CLAIM_MAX_AGE = int(os.environ.get('ROLE_CLAIM_MAX_AGE') or 300)
+    
+    # Password hashing pool: worker threads, extra requests allowed to queue,
+    # and how long a request waits for a slot before the route answers 503.
+    # Changing the method/cost upgrades existing hashes at their next login.
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS') or 4)
+    PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE') or 32)
+    PASSWORD_HASH_QUEUE_TIMEOUT = float(os.environ.get('PASSWORD_HASH_QUEUE_TIMEOUT') or 2)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'scrypt:32768:8:1'
+    
+    # Write-behind flush for activity fields (last_login, view counters)
+    ACTIVITY_FLUSH_INTERVAL_MS = int(os.environ.get('ACTIVITY_FLUSH_INTERVAL_MS') or 250)
+    ACTIVITY_FLUSH_BATCH = int(os.environ.get('ACTIVITY_FLUSH_BATCH') or 500)
+    
+    # Booking feed page size (default and the most a client may ask for)
+    BOOKINGS_PAGE_SIZE = int(os.environ.get('BOOKINGS_PAGE_SIZE') or 20)
+    BOOKINGS_MAX_PAGE_SIZE = int(os.environ.get('BOOKINGS_MAX_PAGE_SIZE') or 100)
+    
+    # Minutes an unpaid (pending) homestay booking holds its nights
+    PENDING_BOOKING_HOLD_MINUTES = int(os.environ.get('PENDING_BOOKING_HOLD_MINUTES') or 60)
+    
+    # Minutes reserved nights wait for their booking to be inserted before
+    # they count as orphaned (the writer crashed) and can be reclaimed
+    ORPHANED_RESERVATION_MINUTES = int(os.environ.get('ORPHANED_RESERVATION_MINUTES') or 5)
@@ -0,0 +1,124 @@
+# villagestay-backend/migrations/backfill_booking_locations.py
+#
+# Copies each booking's listing/experience location onto the booking as
+# `listing_location` plus a canonical `listing_location_key`, and creates the
+# index that location analytics (impact leaderboards, community impact) use.
+# Location analytics count homestay bookings only, as they did when they
+# joined the listings collection.
+#
+# Usage (from villagestay-backend/):
+#     python -m migrations.backfill_booking_locations [--all] [--batch-size 500]
+
+import argparse
+import sys
+import time
+from pymongo import MongoClient, UpdateOne, ASCENDING
+from config import Config
+from utils.location_utils import normalize_location, canonical_location_key
+
+BATCH_SIZE = 500
+
+# One index serves both the leaderboard (status, then group by key) and the
+# community lookup (status plus listing_location_key $in)
+BOOKING_LOCATION_INDEXES = [
+    ([("status", ASCENDING), ("listing_location_key", ASCENDING)], "status_listing_location_key"),
+]
+
+def create_location_indexes(db):
+    """Create the booking indexes used by location analytics"""
+    for keys, name in BOOKING_LOCATION_INDEXES:
+        db.bookings.create_index(keys, name=name)
+        print(f"📇 Index ready: bookings.{name}")
+
+def fetch_locations(db, bookings):
+    """Look up the current location of every listing/experience in a batch"""
+    listing_ids = [b['listing_id'] for b in bookings if b.get('listing_type') != 'experience']
+    experience_ids = [b['listing_id'] for b in bookings if b.get('listing_type') == 'experience']
+
+    locations = {}
+    if listing_ids:
+        for doc in db.listings.find({"_id": {"$in": listing_ids}}, {"location": 1}):
+            locations[('homestay', doc['_id'])] = doc.get('location')
+    if experience_ids:
+        for doc in db.experiences.find({"_id": {"$in": experience_ids}}, {"location": 1}):
+            locations[('experience', doc['_id'])] = doc.get('location')
+
+    return locations
+
+def build_updates(db, bookings):
+    """Build the bulk update operations for one batch of bookings"""
+    locations = fetch_locations(db, bookings)
+
+    updates = []
+    for booking in bookings:
+        listing_type = 'experience' if booking.get('listing_type') == 'experience' else 'homestay'
+
+        # Prefer the location captured at booking time, fall back to the listing
+        location = booking.get('listing_location') or locations.get((listing_type, booking.get('listing_id')))
+        if not location:
+            continue
+
+        updates.append(UpdateOne(
+            {"_id": booking['_id']},
+            {"$set": {
+                "listing_location": normalize_location(location),
+                "listing_location_key": canonical_location_key(location)
+            }}
+        ))
+
+    return updates
+
+def backfill_booking_locations(db, backfill_all=False, batch_size=BATCH_SIZE):
+    """Normalize listing_location and listing_location_key on historic bookings"""
+    query = {} if backfill_all else {"listing_location_key": {"$exists": False}}
+    projection = {"listing_id": 1, "listing_type": 1, "listing_location": 1}
+
+    started = time.time()
+    scanned = 0
+    modified = 0
+    last_id = None
+
+    # Page by _id so the query stays cheap and the run can be interrupted safely
+    while True:
+        batch_query = dict(query)
+        if last_id is not None:
+            batch_query["_id"] = {"$gt": last_id}
+
+        bookings = list(db.bookings.find(batch_query, projection).sort("_id", ASCENDING).limit(batch_size))
+        if not bookings:
+            break
+
+        last_id = bookings[-1]['_id']
+        scanned += len(bookings)
+
+        updates = build_updates(db, bookings)
+        if updates:
+            result = db.bookings.bulk_write(updates, ordered=False)
+            modified += result.modified_count
+
+        print(f"🔄 Processed {scanned} bookings ({modified} updated)")
+
+    elapsed = time.time() - started
+    print(f"✅ Backfill complete: {scanned} scanned, {modified} updated in {elapsed:.1f}s")
+    return {"scanned": scanned, "modified": modified}
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill booking location fields")
+    parser.add_argument("--all", action="store_true", help="Re-normalize bookings that already have a location key")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    client = MongoClient(Config.MONGO_URI)
+
+    try:
+        db = client.get_default_database()
+        create_location_indexes(db)
+        backfill_booking_locations(db, backfill_all=args.all, batch_size=args.batch_size)
+    except Exception as e:
+        print(f"❌ Error during backfill: {e}")
+        sys.exit(1)
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# villagestay-backend/migrations/backfill_user_phones.py
+#
+# Canonicalizes every user's phone number to E.164 into `phone_e164` and
+# creates the unique index the MCP server and auth routes look callers up by.
+# When two accounts share a number, the oldest keeps it and the others are
+# reported for manual cleanup (the index would reject them otherwise).
+#
+# Usage (from villagestay-backend/):
+#     python -m migrations.backfill_user_phones [--all] [--batch-size 500]
+
+import argparse
+import sys
+import time
+from pymongo import MongoClient, UpdateOne, ASCENDING
+from config import Config
+from utils.phone_utils import normalize_phone_e164
+
+BATCH_SIZE = 500
+
+PHONE_INDEX_NAME = "phone_e164_unique"
+
+def create_phone_index(db):
+    """Unique index on the canonical phone; users without a phone are exempt"""
+    db.users.create_index(
+        [("phone_e164", ASCENDING)],
+        name=PHONE_INDEX_NAME,
+        unique=True,
+        partialFilterExpression={"phone_e164": {"$type": "string"}}
+    )
+    print(f"📇 Index ready: users.{PHONE_INDEX_NAME}")
+
+def backfill_user_phones(db, backfill_all=False, batch_size=BATCH_SIZE):
+    """Set phone_e164 on users, skipping numbers already claimed by another account"""
+    query = {"phone": {"$nin": [None, ""]}}
+    if not backfill_all:
+        query["phone_e164"] = {"$exists": False}
+
+    # Oldest accounts first, so the original owner of a number keeps it
+    claimed = {
+        doc['phone_e164']: doc['_id']
+        for doc in db.users.find({"phone_e164": {"$type": "string"}}, {"phone_e164": 1})
+    }
+
+    started = time.time()
+    scanned = 0
+    modified = 0
+    invalid = []
+    duplicates = []
+    updates = []
+
+    cursor = db.users.find(query, {"phone": 1}).sort("_id", ASCENDING).batch_size(batch_size)
+    for user in cursor:
+        scanned += 1
+        phone_e164 = normalize_phone_e164(user['phone'])
+
+        if not phone_e164:
+            invalid.append((user['_id'], user['phone']))
+            continue
+
+        owner = claimed.get(phone_e164)
+        if owner is not None and owner != user['_id']:
+            duplicates.append((user['_id'], user['phone'], owner))
+            continue
+
+        claimed[phone_e164] = user['_id']
+        updates.append(UpdateOne({"_id": user['_id']}, {"$set": {"phone_e164": phone_e164}}))
+
+        if len(updates) >= batch_size:
+            modified += db.users.bulk_write(updates, ordered=False).modified_count
+            updates = []
+            print(f"🔄 Processed {scanned} users ({modified} updated)")
+
+    if updates:
+        modified += db.users.bulk_write(updates, ordered=False).modified_count
+
+    for user_id, phone in invalid:
+        print(f"⚠️ Unparseable phone on user {user_id}: {phone!r}")
+    for user_id, phone, owner in duplicates:
+        print(f"⚠️ User {user_id} shares {phone!r} with user {owner}, left without phone_e164")
+
+    elapsed = time.time() - started
+    print(f"✅ Backfill complete: {scanned} scanned, {modified} updated, "
+          f"{len(invalid)} invalid, {len(duplicates)} duplicates in {elapsed:.1f}s")
+    return {"scanned": scanned, "modified": modified, "invalid": len(invalid), "duplicates": len(duplicates)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill canonical E.164 phone numbers on users")
+    parser.add_argument("--all", action="store_true", help="Re-canonicalize users that already have phone_e164")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    client = MongoClient(Config.MONGO_URI)
+
+    try:
+        db = client.get_default_database()
+        # Backfill first: the unique index can only be built once duplicates are resolved
+        backfill_user_phones(db, backfill_all=args.all, batch_size=args.batch_size)
+        create_phone_index(db)
+    except Exception as e:
+        print(f"❌ Error during backfill: {e}")
+        sys.exit(1)
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+# villagestay-backend/migrations/create_booking_feed_indexes.py
+#
+# Creates the indexes behind GET /api/bookings/. The feed filters by the
+# tourist or host (optionally by status) and pages newest first, so each side
+# gets an index that serves the filter, the count and the sort without
+# scanning that user's whole booking history.
+#
+# Usage (from villagestay-backend/):
+#     python -m migrations.create_booking_feed_indexes
+
+import sys
+from pymongo import MongoClient, ASCENDING, DESCENDING
+from config import Config
+
+BOOKING_FEED_INDEXES = [
+    ([("tourist_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], "tourist_id_created_at"),
+    ([("host_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], "host_id_created_at"),
+    ([("tourist_id", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING)], "tourist_id_status_created_at"),
+    ([("host_id", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING)], "host_id_status_created_at"),
+]
+
+def create_feed_indexes(db):
+    """Create the booking indexes used by the per-user booking feed"""
+    for keys, name in BOOKING_FEED_INDEXES:
+        db.bookings.create_index(keys, name=name)
+        print(f"📇 Index ready: bookings.{name}")
+
+def main():
+    client = MongoClient(Config.MONGO_URI)
+
+    try:
+        create_feed_indexes(client.get_default_database())
+    except Exception as e:
+        print(f"❌ Error creating indexes: {e}")
+        sys.exit(1)
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    main()
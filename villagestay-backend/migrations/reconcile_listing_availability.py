@@ -0,0 +1,55 @@
+# villagestay-backend/migrations/reconcile_listing_availability.py
+#
+# Rebuilds the `listing_availability` documents from bookings and host
+# calendars. Nights held by cancelled, expired or never-inserted bookings
+# are dropped; reservations whose booking is still being written are kept.
+# Safe to run while the site is live (every write is a compare-and-swap), and
+# worth scheduling periodically as a safety net for missed releases.
+#
+# Usage (from villagestay-backend/):
+#     python -m migrations.reconcile_listing_availability [--listing <id>]
+
+import argparse
+import sys
+import time
+from app import create_app
+from database import mongo
+from utils.availability_utils import reconcile_nights
+
+def reconcile_listings(listing_ids):
+    """Reconcile each listing's availability; returns the number of reservations dropped"""
+    started = time.time()
+    reconciled = 0
+    dropped = 0
+
+    for listing_id in listing_ids:
+        dropped_here = reconcile_nights(listing_id)
+        reconciled += 1
+        dropped += dropped_here
+        if dropped_here:
+            print(f"🧹 Listing {listing_id}: dropped {dropped_here} stale reservation(s)")
+
+    elapsed = time.time() - started
+    print(f"✅ Reconciled {reconciled} listings, dropped {dropped} stale reservation(s) in {elapsed:.1f}s")
+    return dropped
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild listing availability from bookings")
+    parser.add_argument("--listing", help="Only reconcile this listing id")
+    args = parser.parse_args()
+
+    app = create_app()
+
+    try:
+        with app.app_context():
+            if args.listing:
+                listing_ids = [args.listing]
+            else:
+                listing_ids = [doc['_id'] for doc in mongo.db.listing_availability.find({}, {"_id": 1})]
+            reconcile_listings(listing_ids)
+    except Exception as e:
+        print(f"❌ Error reconciling availability: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
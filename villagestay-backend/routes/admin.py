@@ -2,16 +2,15 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from bson import ObjectId
 from database import mongo
+from utils.auth_utils import get_current_user_type
 from datetime import datetime, timedelta
 import math
 
 admin_bp = Blueprint('admin', __name__)
 
 def verify_admin():
-    """Verify user is admin"""
-    user_id = get_jwt_identity()
-    user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
-    return user and user['user_type'] == 'admin'
+    """Verify user is admin (from the JWT claim, no database read)"""
+    return get_current_user_type() == 'admin'
 
 @admin_bp.route('/dashboard', methods=['GET'])
 @jwt_required()
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from database import mongo
+from utils.auth_utils import get_current_user
 from utils.ai_utils import generate_travel_itinerary, translate_text, generate_content_from_voice, moderate_content
 from datetime import datetime
 
@@ -18,7 +19,7 @@ def travel_assistant():
             return jsonify({"error": "Query is required"}), 400
         
         # Get user preferences
-        user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
+        user = get_current_user()
         user_preferences = {
             "preferred_language": user.get('preferred_language', 'en'),
             "location": user.get('address', ''),
@@ -81,7 +82,7 @@ def voice_to_listing():
         data = request.get_json()
         
         # Verify user is a host
-        user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
+        user = get_current_user()
         if not user or user['user_type'] != 'host':
             return jsonify({"error": "Only hosts can use this feature"}), 403
         
@@ -133,7 +134,7 @@ def generate_listing_description():
        data = request.get_json()
        
        # Verify user is a host
-       user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
+       user = get_current_user()
        if not user or user['user_type'] != 'host':
            return jsonify({"error": "Only hosts can use this feature"}), 403
        
@@ -214,7 +215,7 @@ def get_sustainability_suggestions():
        data = request.get_json()
        
        # Verify user is a host
-       user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
+       user = get_current_user()
        if not user or user['user_type'] != 'host':
            return jsonify({"error": "Only hosts can use this feature"}), 403
        
@@ -236,7 +237,8 @@ def get_sustainability_suggestions():
            listing['property_type'],
            listing['location'],
            listing.get('amenities', []),
-           listing.get('sustainability_features', [])
+           listing.get('sustainability_features', []),
+           refresh=bool(data.get('refresh'))
        )
        
        return jsonify({
@@ -256,7 +258,7 @@ def generate_experience_content():
        data = request.get_json()
        
        # Verify user is a host
-       user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
+       user = get_current_user()
        if not user or user['user_type'] != 'host':
            return jsonify({"error": "Only hosts can use this feature"}), 403
        
@@ -271,7 +273,8 @@ def generate_experience_content():
        # Generate experience content
        from utils.ai_utils import generate_experience_content
        experience_content = generate_experience_content(
-           experience_type, location, duration, local_culture
+           experience_type, location, duration, local_culture,
+           refresh=bool(data.get('refresh'))
        )
        
        return jsonify({
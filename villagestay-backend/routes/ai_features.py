@@ -4,14 +4,19 @@ from flask import Blueprint, request, jsonify, Response, stream_template
 from utils.weather_utils import weather_service, get_weather_based_recommendations
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from database import mongo
+from utils.auth_utils import get_current_user, is_admin_request
 from config import Config  # ADD THIS IMPORT
 from utils.ai_utils import (
     generate_village_story_video, 
     voice_to_listing_magic, 
     cultural_concierge_chat,
     call_gemini_with_image,
-    call_gemini_api
+    call_gemini_api,
+    call_gemini_cached,
+    listing_field_translations
 )
+from utils.concierge_memory import get_conversation_state, format_conversation_state, record_concierge_turn
+from utils.structured_output import extract_json, extract_complete_json, json_generation_config, StructuredOutputError
 from datetime import datetime
 from bson import ObjectId
 import base64
@@ -329,7 +334,7 @@ def generate_village_story():
         data = request.get_json()
         
         # Verify user is a host
-        user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
+        user = get_current_user()
         if not user or user['user_type'] != 'host':
             return jsonify({"error": "Only hosts can generate village stories"}), 403
         
@@ -487,7 +492,7 @@ def voice_to_listing():
         user_id = get_jwt_identity()
         
         # Verify user is a host
-        user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
+        user = get_current_user()
         if not user or user['user_type'] != 'host':
             return jsonify({"error": "Only hosts can use voice-to-listing"}), 403
         
@@ -499,8 +504,7 @@ def voice_to_listing():
             if not audio_file:
                 return jsonify({"error": "Audio data is required"}), 400
                 
-            audio_data = audio_file.read()
-            audio_base64 = base64.b64encode(audio_data).decode('utf-8')
+            audio_bytes = audio_file.read()
             
         else:
             # Handle JSON data
@@ -515,62 +519,104 @@ def voice_to_listing():
                 return jsonify({"error": "Audio data is required"}), 400
             
             if audio_data.startswith('data:audio'):
-                audio_base64 = audio_data.split(',')[1]
-            else:
-                audio_base64 = audio_data
+                audio_data = audio_data.split(',')[1]
+            
+            try:
+                audio_bytes = base64.b64decode(audio_data, validate=True)
+            except (TypeError, ValueError):
+                return jsonify({"error": "Audio data is not valid base64"}), 400
         
-        # Process voice to listing
-        from utils.google_speech_utils import transcribe_audio_google_speech, enhance_listing_with_gemini
-        from utils.ai_utils import generate_smart_pricing, create_multilingual_listing
+        if not audio_bytes:
+            return jsonify({"error": "Audio data is required"}), 400
         
-        # Step 1: Transcribe audio
-        transcription_result = transcribe_audio_google_speech(audio_base64, language)
-        transcribed_text = transcription_result["text"]
-        confidence = transcription_result["confidence"]
+        # Transcription, enhancement, pricing and translation run in the
+        # background; clients poll the status route (or subscribe to events)
+        from utils.voice_listing_jobs import enqueue_voice_listing_job, VoiceListingBusyError
+        try:
+            processing_id = enqueue_voice_listing_job(user_id, audio_bytes, language)
+        except VoiceListingBusyError:
+            return jsonify({"error": "Voice processing is busy, please try again shortly"}), 503, {"Retry-After": "30"}
         
-        # Step 2: Enhance with Gemini
-        listing_data = enhance_listing_with_gemini(transcribed_text, language)
+        return jsonify({
+            "message": "Voice processing started",
+            "processing_id": processing_id,
+            "status": "queued",
+            "status_url": f"/api/ai-features/voice-to-listing/{processing_id}/status",
+            "events_url": f"/api/ai-features/voice-to-listing/{processing_id}/events"
+        }), 202
         
-        # Step 3: Generate pricing
-        pricing_intel = generate_smart_pricing(listing_data, language)
+    except Exception as e:
+        return jsonify({"error": f"Voice processing failed: {str(e)}"}), 500
+
+@ai_features_bp.route('/voice-to-listing/<processing_id>/status', methods=['GET'])
+@jwt_required()
+def get_voice_to_listing_status(processing_id):
+    try:
+        user_id = get_jwt_identity()
         
-        # Step 4: Create translations
-        translations = create_multilingual_listing(listing_data, language)
+        from utils.voice_listing_jobs import format_voice_job_status, fail_if_stale
         
-        # Create the processing result
-        processing_result = {
-            "original_audio_language": language,
-            "transcribed_text": transcribed_text,
-            "enhanced_listing": listing_data,
-            "pricing_intelligence": pricing_intel,
-            "translations": translations,
-            "processing_status": "completed",
-            "confidence_score": confidence,
-            "transcription_source": "google_speech_to_text"
-        }
+        voice_record = mongo.db.voice_generations.find_one({
+            "_id": ObjectId(processing_id),
+            "host_id": ObjectId(user_id)
+        })
         
-        # Save processing record
-        voice_record = {
-            "host_id": ObjectId(user_id),
-            "original_language": language,
-            "processing_result": processing_result,
-            "created_at": datetime.utcnow(),
-            "processing_type": "voice_to_listing"
-        }
+        if not voice_record:
+            return jsonify({"error": "Voice processing record not found"}), 404
         
-        result = mongo.db.voice_generations.insert_one(voice_record)
+        return jsonify(format_voice_job_status(fail_if_stale(voice_record))), 200
         
-        # Add the processing_id to the result
-        processing_result["processing_id"] = str(result.inserted_id)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@ai_features_bp.route('/voice-to-listing/<processing_id>/events', methods=['GET'])
+@jwt_required()
+def stream_voice_to_listing_status(processing_id):
+    """Server-sent events with per-stage progress until the job finishes"""
+    try:
+        user_id = get_jwt_identity()
         
-        return jsonify({
-            "message": "Voice successfully converted to listing",
-            "result": processing_result,
-            "processing_id": str(result.inserted_id)
-        }), 200
+        from utils.voice_listing_jobs import format_voice_job_status, fail_if_stale, TERMINAL_STATUSES
+        
+        query = {"_id": ObjectId(processing_id), "host_id": ObjectId(user_id)}
+        if not mongo.db.voice_generations.find_one(query, {"_id": 1}):
+            return jsonify({"error": "Voice processing record not found"}), 404
+        
+        def generate_events():
+            last_sent = None
+            deadline = time.time() + 300  # Give up after 5 minutes
+            
+            while time.time() < deadline:
+                voice_record = mongo.db.voice_generations.find_one(query)
+                if not voice_record:
+                    break
+                
+                status_data = format_voice_job_status(fail_if_stale(voice_record))
+                snapshot = (status_data['status'], status_data['current_stage'], status_data['progress'])
+                
+                if snapshot != last_sent:
+                    last_sent = snapshot
+                    yield f"data: {json.dumps(status_data, default=str)}\n\n"
+                
+                if status_data['status'] in TERMINAL_STATUSES:
+                    return
+                
+                time.sleep(0.5)
+            
+            yield f"data: {json.dumps({'status': 'timeout', 'processing_id': processing_id})}\n\n"
+        
+        return Response(
+            generate_events(),
+            mimetype='text/event-stream',
+            headers={
+                'Cache-Control': 'no-cache',
+                'Connection': 'keep-alive'
+            }
+        )
         
     except Exception as e:
-        return jsonify({"error": f"Voice processing failed: {str(e)}"}), 500
+        return jsonify({"error": str(e)}), 500
+
 def voice_to_listing_magic_google(audio_data, language="hi", host_id=None):
     """Convert voice recording to professional listing using Google Speech-to-Text + Gemini"""
     
@@ -649,7 +695,7 @@ def create_listing_from_voice():
         data = request.get_json()
         
         # Verify user is a host
-        user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
+        user = get_current_user()
         if not user or user['user_type'] != 'host':
             return jsonify({"error": "Only hosts can create listings"}), 403
         
@@ -679,11 +725,14 @@ def create_listing_from_voice():
         print(f"✅ Found voice record: {voice_record['_id']}")
         
         # Get the enhanced listing data
-        processing_result = voice_record['processing_result']
+        processing_result = voice_record.get('processing_result')
         
-        if 'error' in processing_result:
+        if voice_record.get('status') == 'error' or (processing_result and 'error' in processing_result):
             return jsonify({"error": "Voice processing failed"}), 400
         
+        if not processing_result:
+            return jsonify({"error": "Voice processing is still in progress"}), 409
+        
         listing_data = processing_result.get('enhanced_listing', {})
         translations = processing_result.get('translations', {})
         
@@ -752,6 +801,7 @@ def create_listing_from_voice():
             "ai_generated": True,
             "voice_generated": True,
             "original_voice_language": voice_record['original_language'],
+            "translations": listing_field_translations(translations),
             "voice_processing_id": processing_id,
             # Add required fields
             "ai_generated_content": {
@@ -801,7 +851,7 @@ def generate_listing_content_ai():
         data = request.get_json()
         
         # Verify user is a host
-        user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
+        user = get_current_user()
         if not user or user['user_type'] != 'host':
             return jsonify({"error": "Only hosts can generate listing content"}), 403
         
@@ -854,8 +904,8 @@ def generate_listing_content_ai():
 
         print(f"🤖 Generating AI content for listing: {title} in {location}")
         
-        from utils.ai_utils import call_gemini_api
-        ai_description = call_gemini_api(content_prompt)
+        from utils.ai_utils import call_gemini_api, call_gemini_json, PRIORITY_LISTING
+        ai_description = call_gemini_api(content_prompt, priority=PRIORITY_LISTING)
         
         # Generate additional content suggestions
         suggestions_prompt = f"""
@@ -876,14 +926,7 @@ def generate_listing_content_ai():
         """
         
         try:
-            suggestions_response = call_gemini_api(suggestions_prompt)
-            # Try to parse JSON from response
-            import re
-            json_match = re.search(r'\{.*\}', suggestions_response, re.DOTALL)
-            if json_match:
-                suggestions = json.loads(json_match.group())
-            else:
-                suggestions = generate_fallback_suggestions(property_type, location)
+            suggestions = call_gemini_json(suggestions_prompt, expect='object', priority=PRIORITY_LISTING)
         except:
             suggestions = generate_fallback_suggestions(property_type, location)
         
@@ -953,7 +996,7 @@ def cultural_concierge():
         data = request.get_json()
         
         # Verify user is a tourist/traveler
-        user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
+        user = get_current_user()
         if not user:
             return jsonify({"error": "User not found"}), 404
             
@@ -977,24 +1020,12 @@ def cultural_concierge():
             "duration": data.get('duration', '3-5 days')
         }
         
-        # Get conversation history for context
-        conversation_history = []
-        if session_id:
-            history_records = list(mongo.db.concierge_conversations.find({
-                "session_id": session_id,
-                "user_id": ObjectId(user_id)
-            }).sort("created_at", -1).limit(5))
-            
-            # Build conversation history
-            for record in reversed(history_records):
-                conversation_history.extend([
-                    {"role": "user", "content": record.get('message', '')},
-                    {"role": "assistant", "content": record.get('response', '')}
-                ])
+        # Rolling summary + recent turns for context (bounded prompt size)
+        conversation_state = get_conversation_state(user_id, session_id)
         
         # Generate comprehensive AI response
         concierge_response = generate_professional_cultural_response(
-            user_message, user_preferences, conversation_history, user
+            user_message, user_preferences, conversation_state, user
         )
         
         # Save conversation with rich metadata
@@ -1013,6 +1044,7 @@ def cultural_concierge():
         }
         
         mongo.db.concierge_conversations.insert_one(conversation_record)
+        record_concierge_turn(user_id, conversation_record['session_id'], user_message, concierge_response['response'])
         
         return jsonify({
             "response": concierge_response['response'],
@@ -1057,7 +1089,7 @@ USER PROFILE:
 - Current Location Context: {preferences['location']}
 
 CONVERSATION HISTORY:
-{format_conversation_history(history)}
+{format_conversation_state(history)}
 
 CURRENT REQUEST: "{user_message}"
 
@@ -1080,18 +1112,35 @@ Be warm, knowledgeable, and culturally sensitive. Include specific details like:
 - What to pack
 - Photography guidelines
 
-Format your response as natural, conversational text (not lists) that shows deep cultural knowledge.
+Respond with a JSON object:
+- "response": your answer as natural, conversational text (not lists) that shows deep cultural knowledge
+- "destinations": up to 5 destinations you recommended in the answer
+- "cultural_insights": 3-5 short cultural insights from the answer
+- "travel_tips": 3-5 short practical travel tips from the answer
 """
 
-        # Get AI response using Gemini
-        ai_response = call_gemini_api(context)
-        
-        # Extract and structure the response
-        recommendations = extract_destination_recommendations(ai_response, preferences)
-        cultural_insights = extract_cultural_insights(ai_response)
+        # One schema-constrained Gemini call returns the answer together with
+        # its recommendations, insights and tips
+        try:
+            raw_response = call_gemini_api(
+                context,
+                generation_config={
+                    "maxOutputTokens": 4096,
+                    "responseMimeType": "application/json",
+                    "responseSchema": CONCIERGE_RESPONSE_SCHEMA
+                }
+            )
+            structured = parse_concierge_response(raw_response)
+        except Exception as structured_error:
+            print(f"⚠️ Structured concierge call failed, falling back to plain text: {structured_error}")
+            structured = {"response": call_gemini_api(context)}
+        
+        ai_response = structured['response']
+        recommendations = structured.get('destinations') or []
+        cultural_insights = structured.get('cultural_insights') or DEFAULT_CULTURAL_INSIGHTS
         actionable_items = extract_actionable_items(ai_response, user_message)
         relevant_listings = find_relevant_listings_advanced(user_message, preferences)
-        travel_tips = extract_travel_tips(ai_response)
+        travel_tips = structured.get('travel_tips') or DEFAULT_TRAVEL_TIPS
         budget_breakdown = generate_budget_breakdown(preferences)
         
         processing_time = round(time.time() - start_time, 2)
@@ -1116,73 +1165,73 @@ Format your response as natural, conversational text (not lists) that shows deep
         print(f"AI response generation error: {e}")
         raise Exception("Failed to generate cultural guidance")
 
-def format_conversation_history(history):
-    """Format conversation history for context"""
-    if not history:
-        return "No previous conversation."
-    
-    formatted = []
-    for item in history:
-        role = item.get('role', 'unknown')
-        content = item.get('content', '')
-        formatted.append(f"{role.title()}: {content}")
-    
-    return "\n".join(formatted[-6:])  # Last 6 exchanges
-
-def extract_destination_recommendations(response, preferences):
-    """Extract structured destination recommendations"""
-    
-    # Use AI to extract recommendations
-    extraction_prompt = f"""
-    From this cultural guide response, extract destination recommendations and format as JSON:
-    
-    Response: "{response}"
-    
-    Extract up to 5 destinations with this structure:
-    {{
-        "destinations": [
-            {{
-                "name": "destination name",
-                "state": "state name",
-                "description": "brief description",
-                "best_for": ["cultural experience", "adventure", etc],
-                "duration": "recommended days",
-                "budget_estimate": "daily budget range",
-                "highlights": ["top 3 highlights"],
-                "best_time": "season/months"
-            }}
-        ]
-    }}
+CONCIERGE_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "response": {"type": "STRING"},
+        "destinations": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "name": {"type": "STRING"},
+                    "state": {"type": "STRING"},
+                    "description": {"type": "STRING"},
+                    "best_for": {"type": "ARRAY", "items": {"type": "STRING"}},
+                    "duration": {"type": "STRING"},
+                    "budget_estimate": {"type": "STRING"},
+                    "highlights": {"type": "ARRAY", "items": {"type": "STRING"}},
+                    "best_time": {"type": "STRING"}
+                },
+                "required": ["name"]
+            }
+        },
+        "cultural_insights": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "travel_tips": {"type": "ARRAY", "items": {"type": "STRING"}}
+    },
+    "required": ["response"]
+}
+
+DEFAULT_CULTURAL_INSIGHTS = [
+    "Remove shoes before entering homes and temples",
+    "Greet elders with respect and touch their feet",
+    "Dress modestly, especially in religious places",
+    "Try to learn basic local greetings"
+]
+
+DEFAULT_TRAVEL_TIPS = [
+    "Book accommodations in advance during festival seasons",
+    "Carry cash as many rural areas have limited ATM access",
+    "Learn basic local phrases to connect with villagers",
+    "Pack modest clothing for temple visits"
+]
+
+def parse_concierge_response(raw_response):
+    """Parse the structured concierge reply, tolerating fences and stray text
+    
+    Falls back to treating the whole reply as the answer when no usable JSON
+    object is found.
     """
-    
     try:
-        extraction_result = call_gemini_api(extraction_prompt)
-        return json.loads(extraction_result).get('destinations', [])
-    except:
-        return []
-
-def extract_cultural_insights(response):
-    """Extract cultural insights from response"""
+        parsed = extract_json(raw_response, expect='object')
+    except StructuredOutputError:
+        parsed = None
     
-    try:
-        insights_prompt = f"""
-        Extract cultural insights from this response and format as a list:
-        
-        Response: "{response}"
-        
-        Return a JSON array of cultural insights:
-        ["insight 1", "insight 2", "insight 3"]
-        """
-        
-        result = call_gemini_api(insights_prompt)
-        return json.loads(result)
-    except:
-        return [
-            "Remove shoes before entering homes and temples",
-            "Greet elders with respect and touch their feet",
-            "Dress modestly, especially in religious places",
-            "Try to learn basic local greetings"
-        ]
+    answer = parsed.get('response') if isinstance(parsed, dict) else None
+    if not isinstance(answer, str) or not answer.strip():
+        return {"response": raw_response}
+    
+    def string_list(value):
+        return [str(item) for item in value if item] if isinstance(value, list) else []
+    
+    destinations = parsed.get('destinations')
+    
+    return {
+        "response": answer.strip(),
+        "destinations": [item for item in destinations if isinstance(item, dict)][:5] if isinstance(destinations, list) else [],
+        "cultural_insights": string_list(parsed.get('cultural_insights')),
+        "travel_tips": string_list(parsed.get('travel_tips'))
+    }
 
 def extract_actionable_items(response, user_message):
     """Extract actionable items from response"""
@@ -1313,29 +1362,6 @@ def calculate_match_score(listing, query, preferences):
     
     return round(score, 2)
 
-def extract_travel_tips(response):
-    """Extract travel tips from response"""
-    
-    try:
-        tips_prompt = f"""
-        Extract practical travel tips from this response:
-        
-        Response: "{response}"
-        
-        Return a JSON array of travel tips:
-        ["tip 1", "tip 2", "tip 3"]
-        """
-        
-        result = call_gemini_api(tips_prompt)
-        return json.loads(result)
-    except:
-        return [
-            "Book accommodations in advance during festival seasons",
-            "Carry cash as many rural areas have limited ATM access",
-            "Learn basic local phrases to connect with villagers",
-            "Pack modest clothing for temple visits"
-        ]
-
 def generate_budget_breakdown(preferences):
     """Generate detailed budget breakdown"""
     
@@ -1456,7 +1482,7 @@ def cultural_concierge_stream():
         data = request.get_json()
         
         # Verify user is a tourist/traveler
-        user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
+        user = get_current_user()
         if not user:
             return jsonify({"error": "User not found"}), 404
             
@@ -1486,8 +1512,8 @@ def cultural_concierge_stream():
                 # Send initial acknowledgment
                 yield f"data: {json.dumps({'type': 'start', 'message': 'Processing your request...'})}\n\n"
                 
-                # Get conversation context
-                conversation_history = get_conversation_context(user_id, session_id)
+                # Rolling summary + recent turns for context
+                conversation_history = get_conversation_state(user_id, session_id)
                 
                 # Generate streaming AI response
                 yield from stream_ai_response(user_message, user_preferences, conversation_history, user, session_id)
@@ -1621,7 +1647,7 @@ USER PROFILE:
 - Location Context: {preferences['location']}
 
 CONVERSATION HISTORY:
-{format_conversation_history(history)}
+{format_conversation_state(history)}
 
 CURRENT REQUEST: "{user_message}"
 
@@ -1899,44 +1925,13 @@ def extract_duration_days(duration_string):
     return duration_map.get(duration_string, 4)
 
 # Helper functions (same as before)
-def get_conversation_context(user_id, session_id):
-    """Get conversation context"""
-    if not session_id:
-        return []
-    
-    history_records = list(mongo.db.concierge_conversations.find({
-        "session_id": session_id,
-        "user_id": ObjectId(user_id)
-    }).sort("created_at", -1).limit(5))
-    
-    conversation_history = []
-    for record in reversed(history_records):
-        conversation_history.extend([
-            {"role": "user", "content": record.get('message', '')},
-            {"role": "assistant", "content": record.get('response', '')}
-        ])
-    
-    return conversation_history
-
-def format_conversation_history(history):
-    """Format conversation history"""
-    if not history:
-        return "No previous conversation."
-    
-    formatted = []
-    for item in history:
-        role = item.get('role', 'unknown')
-        content = item.get('content', '')
-        formatted.append(f"{role.title()}: {content}")
-    
-    return "\n".join(formatted[-6:])
-
 def save_conversation(user_id, session_id, message, response, preferences):
     """Save conversation to database"""
     try:
+        session_id = session_id or f"session_{uuid.uuid4().hex[:12]}"
         conversation_record = {
             "user_id": ObjectId(user_id),
-            "session_id": session_id or f"session_{uuid.uuid4().hex[:12]}",
+            "session_id": session_id,
             "message": message,
             "response": response,
             "user_preferences": preferences,
@@ -1945,6 +1940,7 @@ def save_conversation(user_id, session_id, message, response, preferences):
         }
         
         mongo.db.concierge_conversations.insert_one(conversation_record)
+        record_concierge_turn(user_id, session_id, message, response)
     except Exception as e:
         print(f"Save conversation error: {e}")
 
@@ -2050,10 +2046,19 @@ def get_location_cultural_insights(location):
         Format as JSON with organized sections.
         """
         
-        insights_response = call_gemini_api(insights_prompt)
+        # ?refresh=true forces a new generation instead of the cached answer;
+        # the route is public, so only admins may spend Gemini quota on it
+        refresh = request.args.get('refresh', '').lower() == 'true'
+        if refresh and not is_admin_request():
+            return jsonify({"error": "Admin privileges required to refresh insights"}), 403
         
         try:
-            cultural_data = json.loads(insights_response)
+            cultural_data = call_gemini_cached(
+                insights_prompt, "cultural_insights",
+                parse=extract_complete_json,
+                generation_config=json_generation_config(),
+                refresh=refresh
+            )
         except:
             cultural_data = {
                 "location": location,
@@ -2404,7 +2409,7 @@ def analyze_property_images():
        data = request.get_json()
        
        # Verify user is a host
-       user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
+       user = get_current_user()
        if not user or user['user_type'] != 'host':
            return jsonify({"error": "Only hosts can analyze property images"}), 403
        
@@ -2461,7 +2466,7 @@ def generate_listing_photos():
        data = request.get_json()
        
        # Verify user is a host
-       user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
+       user = get_current_user()
        if not user or user['user_type'] != 'host':
            return jsonify({"error": "Only hosts can generate listing photos"}), 403
        
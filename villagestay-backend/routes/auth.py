@@ -1,8 +1,11 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from werkzeug.security import generate_password_hash, check_password_hash
 from database import mongo
-from utils.auth_utils import generate_otp, send_otp_email
+from utils.auth_utils import generate_otp, send_otp_email, get_current_user, invalidate_user_cache
+from utils.phone_utils import normalize_phone_e164
+from utils.activity_writer import record_user_activity
+from utils.password_utils import hash_password, verify_password, needs_rehash, schedule_rehash, PasswordHashBusyError
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime, timedelta
 from bson import ObjectId
 import re
@@ -32,10 +35,18 @@ def register():
         if data['user_type'] not in ['tourist', 'host', 'admin']:
             return jsonify({"error": "Invalid user type"}), 400
         
+        # Canonicalize phone so callers can be found with one indexed lookup
+        phone_e164 = normalize_phone_e164(data.get('phone'))
+        if data.get('phone') and not phone_e164:
+            return jsonify({"error": "Invalid phone number"}), 400
+        
+        if phone_e164 and mongo.db.users.find_one({"phone_e164": phone_e164}, {"_id": 1}):
+            return jsonify({"error": "Phone number already registered"}), 400
+        
         # Create user document
         user_doc = {
             "email": data['email'],
-            "password": generate_password_hash(data['password']),
+            "password": hash_password(data['password']),
             "full_name": data['full_name'],
             "user_type": data['user_type'],
             "phone": data.get('phone'),
@@ -49,8 +60,14 @@ def register():
             "created_via": "website"
         }
         
+        if phone_e164:
+            user_doc["phone_e164"] = phone_e164
+        
         # Insert user
-        result = mongo.db.users.insert_one(user_doc)
+        try:
+            result = mongo.db.users.insert_one(user_doc)
+        except DuplicateKeyError:
+            return jsonify({"error": "Phone number already registered"}), 400
         
         # Send verification OTP
         send_otp_email(data['email'], user_doc['verification_otp'])
@@ -60,6 +77,8 @@ def register():
             "user_id": str(result.inserted_id)
         }), 201
         
+    except PasswordHashBusyError:
+        return jsonify({"error": "Too many requests, please try again shortly"}), 503, {"Retry-After": "1"}
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -77,72 +96,27 @@ def login():
         if not user:
             return jsonify({"error": "Invalid credentials"}), 401
         
-        # Check password - handle both werkzeug and bcrypt hashes
-        password_valid = False
-        password_source = "unknown"
-        
-        # Try werkzeug first (existing method for website users)
-        if check_password_hash(user['password'], data['password']):
-            password_valid = True
-            password_source = "werkzeug"
-            print(f"✅ Werkzeug password verified for user: {user['email']}")
-        else:
-            # Try bcrypt for WhatsApp bot created accounts
-            try:
-                import bcrypt
-                if user['password'].startswith('$2b$') or user['password'].startswith('$2a$'):  
-                    # bcrypt hash format
-                    password_valid = bcrypt.checkpw(
-                        data['password'].encode('utf-8'), 
-                        user['password'].encode('utf-8')
-                    )
-                    password_source = "bcrypt"
-                    
-                    # If bcrypt password is valid, convert to werkzeug for consistency
-                    if password_valid:
-                        print(f"✅ Bcrypt password verified for user: {user['email']}")
-                        print(f"🔄 Converting bcrypt password to werkzeug format...")
-                        
-                        new_hash = generate_password_hash(data['password'])
-                        mongo.db.users.update_one(
-                            {"_id": user['_id']},
-                            {
-                                "$set": {
-                                    "password": new_hash, 
-                                    "updated_at": datetime.utcnow(),
-                                    "password_migrated_from": "bcrypt",
-                                    "password_migrated_at": datetime.utcnow()
-                                }
-                            }
-                        )
-                        print(f"✅ Password migrated from bcrypt to werkzeug for user: {user['email']}")
-                        password_source = "bcrypt_migrated"
-                        
-            except ImportError:
-                print("⚠️ bcrypt not available - install with: pip install bcrypt")
-            except Exception as bcrypt_error:
-                print(f"❌ Bcrypt verification error: {bcrypt_error}")
+        # One verifier, picked by hash prefix (werkzeug, or bcrypt from the WhatsApp bot)
+        password_valid, password_source = verify_password(data['password'], user['password'])
         
         if not password_valid:
             print(f"❌ Password verification failed for user: {user['email']}")
             return jsonify({"error": "Invalid credentials"}), 401
         
-        # Create access token
+        # Upgrade old schemes/costs off the request path
+        if needs_rehash(user['password']) and schedule_rehash(user['_id'], data['password'], user['password']):
+            password_source = f"{password_source}_migrated"
+        
+        # Create access token; the user type claim lets role checks skip the
+        # database while the token is fresh (Config.ROLE_CLAIM_MAX_AGE)
         access_token = create_access_token(
             identity=str(user['_id']),
+            additional_claims={"user_type": user['user_type']},
             expires_delta=timedelta(days=30)
         )
         
-        # Update last login with additional info
-        mongo.db.users.update_one(
-            {"_id": user['_id']},
-            {
-                "$set": {
-                    "last_login": datetime.utcnow(),
-                    "last_login_method": password_source
-                }
-            }
-        )
+        # Last login is written behind, off the login path
+        record_user_activity(user['_id'], last_login=datetime.utcnow(), last_login_method=password_source)
         
         print(f"✅ User logged in successfully: {user['email']} (method: {password_source})")
         
@@ -160,6 +134,8 @@ def login():
             }
         }), 200
         
+    except PasswordHashBusyError:
+        return jsonify({"error": "Too many requests, please try again shortly"}), 503, {"Retry-After": "1"}
     except Exception as e:
         print(f"❌ Login error: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -191,6 +167,7 @@ def verify_email():
                 "$unset": {"verification_otp": "", "otp_expires_at": ""}
             }
         )
+        invalidate_user_cache(user['_id'])
         
         return jsonify({"message": "Email verified successfully"}), 200
         
@@ -241,7 +218,7 @@ def resend_otp():
 def get_profile():
     try:
         user_id = get_jwt_identity()
-        user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
+        user = get_current_user()
         
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -285,17 +262,34 @@ def update_profile():
         if not update_data:
             return jsonify({"error": "No valid fields to update"}), 400
         
+        update_doc = {"$set": update_data}
+        
+        if 'phone' in update_data:
+            phone_e164 = normalize_phone_e164(update_data['phone'])
+            if update_data['phone'] and not phone_e164:
+                return jsonify({"error": "Invalid phone number"}), 400
+            
+            if phone_e164:
+                update_data['phone_e164'] = phone_e164
+            else:
+                update_doc["$unset"] = {"phone_e164": ""}
+        
         update_data['updated_at'] = datetime.utcnow()
         
         # Update user
-        result = mongo.db.users.update_one(
-            {"_id": ObjectId(user_id)},
-            {"$set": update_data}
-        )
+        try:
+            result = mongo.db.users.update_one(
+                {"_id": ObjectId(user_id)},
+                update_doc
+            )
+        except DuplicateKeyError:
+            return jsonify({"error": "Phone number already registered to another account"}), 400
         
         if result.matched_count == 0:
             return jsonify({"error": "User not found"}), 404
         
+        invalidate_user_cache(user_id)
+        
         return jsonify({"message": "Profile updated successfully"}), 200
         
     except Exception as e:
@@ -311,35 +305,20 @@ def change_password():
         if not data.get('current_password') or not data.get('new_password'):
             return jsonify({"error": "Current password and new password are required"}), 400
         
-        # Find user
+        # Read the stored hash directly; the identity cache may lag a change made elsewhere
         user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
         
         if not user:
             return jsonify({"error": "User not found"}), 404
         
-        # Verify current password (handle both werkzeug and bcrypt)
-        password_valid = False
-        
-        # Try werkzeug first
-        if check_password_hash(user['password'], data['current_password']):
-            password_valid = True
-        else:
-            # Try bcrypt
-            try:
-                import bcrypt
-                if user['password'].startswith('$2b$') or user['password'].startswith('$2a$'):
-                    password_valid = bcrypt.checkpw(
-                        data['current_password'].encode('utf-8'), 
-                        user['password'].encode('utf-8')
-                    )
-            except:
-                pass
+        # Verify current password (werkzeug or bcrypt, by hash prefix)
+        password_valid, _ = verify_password(data['current_password'], user['password'])
         
         if not password_valid:
             return jsonify({"error": "Current password is incorrect"}), 400
         
         # Update password (always use werkzeug for new passwords)
-        new_password_hash = generate_password_hash(data['new_password'])
+        new_password_hash = hash_password(data['new_password'])
         
         mongo.db.users.update_one(
             {"_id": ObjectId(user_id)},
@@ -351,9 +330,12 @@ def change_password():
                 }
             }
         )
+        invalidate_user_cache(user_id)
         
         return jsonify({"message": "Password changed successfully"}), 200
         
+    except PasswordHashBusyError:
+        return jsonify({"error": "Too many requests, please try again shortly"}), 503, {"Retry-After": "1"}
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -413,7 +395,7 @@ def reset_password():
             return jsonify({"error": "Invalid or expired reset token"}), 400
         
         # Update password
-        new_password_hash = generate_password_hash(data['new_password'])
+        new_password_hash = hash_password(data['new_password'])
         
         mongo.db.users.update_one(
             {"_id": user['_id']},
@@ -429,9 +411,12 @@ def reset_password():
                 }
             }
         )
+        invalidate_user_cache(user['_id'])
         
         return jsonify({"message": "Password reset successfully"}), 200
         
+    except PasswordHashBusyError:
+        return jsonify({"error": "Too many requests, please try again shortly"}), 503, {"Retry-After": "1"}
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
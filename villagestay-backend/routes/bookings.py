@@ -2,6 +2,10 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from bson import ObjectId
 from database import mongo
+from config import Config
+from utils.auth_utils import get_current_user
+from utils.location_utils import normalize_location, canonical_location_key
+from utils.availability_utils import reserve_nights, release_nights, confirm_nights, AvailabilityConflictError
 from datetime import datetime, timedelta
 import uuid
 import math
@@ -19,7 +23,7 @@ def create_booking():
         print(f"📋 Booking data: {data}")
         
         # Verify user is a tourist
-        user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
+        user = get_current_user()
         if not user or user['user_type'] != 'tourist':
             return jsonify({"error": "Only tourists can create bookings"}), 403
         
@@ -98,14 +102,17 @@ def create_homestay_booking(user_id, data, listing):
         total_amount = base_amount + platform_fee + community_contribution
         
         # Create booking document
+        booking_id = ObjectId()
         booking_doc = {
+            "_id": booking_id,
             "booking_reference": f"VS{uuid.uuid4().hex[:8].upper()}",
             "tourist_id": ObjectId(user_id),
             "host_id": listing['host_id'],
             "listing_id": ObjectId(data['listing_id']),
             "listing_type": "homestay",
             "listing_title": listing['title'],
-            "listing_location": listing['location'],
+            "listing_location": normalize_location(listing['location']),
+            "listing_location_key": canonical_location_key(listing['location']),
             "check_in": datetime.combine(check_in, datetime.min.time()),
             "check_out": datetime.combine(check_out, datetime.min.time()),
             "guests": guests,
@@ -121,9 +128,23 @@ def create_homestay_booking(user_id, data, listing):
             "updated_at": datetime.utcnow()
         }
         
+        # Hold the nights right before writing the booking so concurrent
+        # requests for overlapping dates cannot both succeed
+        if not reserve_nights(listing['_id'], check_in, check_out, booking_id):
+            return jsonify({"error": "Listing is not available for the selected dates"}), 409
+        
         # Insert booking
-        result = mongo.db.bookings.insert_one(booking_doc)
-        booking_id = str(result.inserted_id)
+        try:
+            mongo.db.bookings.insert_one(booking_doc)
+        except Exception:
+            # If the release fails too, the nights are reclaimed as orphaned
+            # (see utils/availability_utils.py)
+            try:
+                release_nights(listing['_id'], booking_id)
+            except Exception as release_error:
+                print(f"⚠️ Could not release nights of failed booking {booking_id}: {release_error}")
+            raise
+        booking_id = str(booking_id)
         
         print(f"✅ Homestay booking created: {booking_id}")
         
@@ -136,6 +157,8 @@ def create_homestay_booking(user_id, data, listing):
         
     except ValueError as e:
         return jsonify({"error": "Invalid date format. Use YYYY-MM-DD"}), 400
+    except AvailabilityConflictError as e:
+        return jsonify({"error": str(e)}), 409
     except Exception as e:
         print(f"❌ Error creating homestay booking: {e}")
         raise e
@@ -194,7 +217,8 @@ def create_experience_booking(user_id, data, experience):
             "listing_id": ObjectId(data['listing_id']),
             "listing_type": "experience",
             "listing_title": experience['title'],
-            "listing_location": experience['location'],
+            "listing_location": normalize_location(experience['location']),
+            "listing_location_key": canonical_location_key(experience['location']),
             "experience_date": datetime.combine(experience_date, datetime.min.time()),
             "experience_time": experience_time,
             "experience_datetime": experience_datetime,
@@ -294,13 +318,16 @@ def complete_payment(booking_id):
             "updated_at": datetime.utcnow()
         }
         
+        # Only a still-pending booking can be paid; its hold may have lapsed and expired it
         result = mongo.db.bookings.update_one(
-            {"_id": ObjectId(booking_id)},
+            {"_id": ObjectId(booking_id), "status": "pending"},
             {"$set": update_data}
         )
         
         if result.modified_count == 0:
-            return jsonify({"error": "Failed to update booking"}), 500
+            return jsonify({"error": "Booking is no longer pending, please book again"}), 409
+        
+        confirm_booking_nights(booking)
         
         # Get updated booking for response
         updated_booking = mongo.db.bookings.find_one({"_id": ObjectId(booking_id)})
@@ -327,6 +354,16 @@ def complete_payment(booking_id):
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+def confirm_booking_nights(booking):
+    """Stop a paid homestay booking's nights from lapsing with the pending hold"""
+    if booking.get('listing_type') == 'experience':
+        return
+    try:
+        confirm_nights(booking['listing_id'], booking['_id'])
+    except AvailabilityConflictError as e:
+        # The booking is confirmed either way; a lapsed hold is never reclaimed from it
+        print(f"⚠️ Could not confirm nights for booking {booking['_id']}: {e}")
+
 @bookings_bp.route('/<booking_id>/confirm-payment', methods=['POST'])
 @jwt_required()
 def confirm_payment(booking_id):
@@ -367,22 +404,173 @@ def confirm_booking_with_payment(booking_id):
             "updated_at": datetime.utcnow()
         }
         
-        mongo.db.bookings.update_one(
-            {"_id": ObjectId(booking_id)},
+        result = mongo.db.bookings.update_one(
+            {"_id": ObjectId(booking_id), "status": {"$in": ["pending", "confirmed"]}},
             {"$set": update_data}
         )
         
+        if result.matched_count == 0:
+            return jsonify({"error": "Booking is no longer pending, please book again"}), 409
+        
+        confirm_booking_nights(booking)
+        
         return jsonify({"message": "Booking confirmed successfully"}), 200
         
     except Exception as e:
         print(f"❌ Error confirming booking: {e}")
         return jsonify({"error": str(e)}), 500
+
+# Fields each part of the booking feed reads; everything else stays in Mongo
+BOOKING_FEED_PROJECTION = {
+    "booking_reference": 1, "listing_type": 1, "listing_id": 1, "host_id": 1, "tourist_id": 1,
+    "status": 1, "payment_status": 1, "total_amount": 1, "special_requests": 1, "created_at": 1,
+    "check_in": 1, "check_out": 1, "guests": 1, "nights": 1,
+    "experience_date": 1, "experience_time": 1, "experience_datetime": 1, "participants": 1,
+    "duration": 1, "category": 1, "difficulty_level": 1
+}
+LISTING_FEED_PROJECTION = {"title": 1, "location": 1, "images": 1}
+COUNTERPARTY_FEED_PROJECTION = {"full_name": 1, "email": 1, "phone": 1}
+
+SUMMARY_UPCOMING_LIMIT = 5
+
+def _find_by_ids(collection, ids, projection):
+    if not ids:
+        return {}
+    return {doc['_id']: doc for doc in mongo.db[collection].find({"_id": {"$in": list(ids)}}, projection)}
+
+def _hydrate_bookings(bookings, counterparty_field, listing_projection, user_projection):
+    """Fetch the listings, experiences and counterparties of a page of bookings in one query each"""
+    listing_ids, experience_ids, user_ids = set(), set(), set()
+    for booking in bookings:
+        if booking.get('listing_type') == 'experience':
+            experience_ids.add(booking['listing_id'])
+        else:
+            listing_ids.add(booking['listing_id'])
+        if booking.get(counterparty_field):
+            user_ids.add(booking[counterparty_field])
+
+    return (
+        _find_by_ids('listings', listing_ids, listing_projection),
+        _find_by_ids('experiences', experience_ids, listing_projection),
+        _find_by_ids('users', user_ids, user_projection)
+    )
+
+def _format_feed_booking(booking, listing, other_user, other_user_key):
+    formatted_booking = {
+        "id": str(booking['_id']),
+        "booking_reference": booking['booking_reference'],
+        "listing_type": booking.get('listing_type', 'homestay'),
+        "status": booking['status'],
+        "payment_status": booking.get('payment_status', 'pending'),
+        "total_amount": booking['total_amount'],
+        "special_requests": booking.get('special_requests', ''),
+        "created_at": booking['created_at'].isoformat(),
+        "listing": {
+            "id": str(listing['_id']),
+            "title": listing['title'],
+            "location": listing['location'],
+            "images": listing.get('images', [])
+        } if listing else None
+    }
+    
+    # Add type-specific fields
+    if booking.get('listing_type') == 'experience':
+        formatted_booking.update({
+            "experience_date": booking['experience_date'].strftime('%Y-%m-%d'),
+            "experience_time": booking.get('experience_time'),
+            "experience_datetime": booking['experience_datetime'].isoformat(),
+            "participants": booking['participants'],
+            "duration": booking.get('duration'),
+            "category": booking.get('category'),
+            "difficulty_level": booking.get('difficulty_level')
+        })
+    else:
+        formatted_booking.update({
+            "check_in": booking['check_in'].strftime('%Y-%m-%d'),
+            "check_out": booking['check_out'].strftime('%Y-%m-%d'),
+            "guests": booking['guests'],
+            "nights": booking.get('nights', 1)
+        })
+    
+    # Add other user info
+    if other_user:
+        formatted_booking[other_user_key] = {
+            "id": str(other_user['_id']),
+            "full_name": other_user['full_name'],
+            "email": other_user['email'],
+            "phone": other_user.get('phone')
+        }
+    
+    return formatted_booking
+
+def _booking_summary(query, counterparty_field, other_user_key):
+    """Status counts and the next few upcoming bookings, for dashboard widgets"""
+    now = datetime.utcnow()
+    upcoming_match = {"status": {"$in": ["pending", "confirmed"]}, "starts_at": {"$gte": now}}
+    
+    facets = next(mongo.db.bookings.aggregate([
+        {"$match": query},
+        {"$addFields": {"starts_at": {"$ifNull": ["$experience_datetime", "$check_in"]}}},
+        {"$facet": {
+            "by_status": [
+                {"$group": {"_id": "$status", "count": {"$sum": 1}, "amount": {"$sum": "$total_amount"}}}
+            ],
+            "upcoming_count": [
+                {"$match": upcoming_match},
+                {"$count": "count"}
+            ],
+            "upcoming": [
+                {"$match": upcoming_match},
+                {"$sort": {"starts_at": 1}},
+                {"$limit": SUMMARY_UPCOMING_LIMIT},
+                {"$project": {
+                    "booking_reference": 1, "listing_type": 1, "listing_id": 1, counterparty_field: 1,
+                    "status": 1, "total_amount": 1, "starts_at": 1
+                }}
+            ]
+        }}
+    ]), {})
+    
+    by_status = {group['_id']: group for group in facets.get('by_status', [])}
+    upcoming = facets.get('upcoming', [])
+    upcoming_count = facets.get('upcoming_count', [])
+    
+    listings, experiences, users = _hydrate_bookings(
+        upcoming, counterparty_field, {"title": 1}, {"full_name": 1}
+    )
+    
+    formatted_upcoming = []
+    for booking in upcoming:
+        related = experiences if booking.get('listing_type') == 'experience' else listings
+        listing = related.get(booking['listing_id'])
+        other_user = users.get(booking.get(counterparty_field))
+        formatted_upcoming.append({
+            "id": str(booking['_id']),
+            "booking_reference": booking['booking_reference'],
+            "listing_type": booking.get('listing_type', 'homestay'),
+            "status": booking['status'],
+            "total_amount": booking['total_amount'],
+            "starts_at": booking['starts_at'].isoformat(),
+            "listing": {"id": str(listing['_id']), "title": listing['title']} if listing else None,
+            other_user_key: {"id": str(other_user['_id']), "full_name": other_user['full_name']} if other_user else None
+        })
+    
+    return {
+        "summary": {
+            "total_count": sum(group['count'] for group in by_status.values()),
+            "by_status": {status: group['count'] for status, group in by_status.items()},
+            "completed_amount": by_status.get('completed', {}).get('amount', 0),
+            "upcoming_count": upcoming_count[0]['count'] if upcoming_count else 0
+        },
+        "upcoming": formatted_upcoming
+    }
+
 @bookings_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_user_bookings():
     try:
         user_id = get_jwt_identity()
-        user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
+        user = get_current_user()
         
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -390,86 +578,64 @@ def get_user_bookings():
         # Build query based on user type
         if user['user_type'] == 'tourist':
             query = {"tourist_id": ObjectId(user_id)}
+            counterparty_field, other_user_key = 'host_id', 'host'
         elif user['user_type'] == 'host':
             query = {"host_id": ObjectId(user_id)}
+            counterparty_field, other_user_key = 'tourist_id', 'tourist'
         else:
             return jsonify({"error": "Invalid user type"}), 403
         
+        # Dashboard widgets only need counts and what's coming up next
+        if request.args.get('summary', 'false').lower() == 'true':
+            return jsonify(_booking_summary(query, counterparty_field, other_user_key)), 200
+        
         # Get status filter
         status = request.args.get('status')
         if status:
             query["status"] = status
         
-        # Get bookings
-        bookings = list(mongo.db.bookings.find(query).sort("created_at", -1))
+        # Clients that don't ask for a page (older dashboards) still get every booking
+        paginate = 'page' in request.args or 'limit' in request.args
+        try:
+            page = max(int(request.args.get('page', 1)), 1)
+            limit = min(max(int(request.args.get('limit', Config.BOOKINGS_PAGE_SIZE)), 1), Config.BOOKINGS_MAX_PAGE_SIZE)
+        except ValueError:
+            return jsonify({"error": "page and limit must be integers"}), 400
+        
+        # _id breaks created_at ties so pages don't overlap
+        cursor = mongo.db.bookings.find(query, BOOKING_FEED_PROJECTION).sort([("created_at", -1), ("_id", -1)])
+        if paginate:
+            total_count = mongo.db.bookings.count_documents(query)
+            bookings = list(cursor.skip((page - 1) * limit).limit(limit))
+        else:
+            bookings = list(cursor)
+            total_count = len(bookings)
+            page, limit = 1, max(total_count, 1)
+        
+        listings, experiences, users = _hydrate_bookings(
+            bookings, counterparty_field, LISTING_FEED_PROJECTION, COUNTERPARTY_FEED_PROJECTION
+        )
         
         # Format bookings
         formatted_bookings = []
         for booking in bookings:
-            # Get listing/experience details
-            if booking.get('listing_type') == 'experience':
-                listing = mongo.db.experiences.find_one({"_id": booking['listing_id']})
-            else:
-                listing = mongo.db.listings.find_one({"_id": booking['listing_id']})
-            
-            # Get other user details
-            if user['user_type'] == 'tourist':
-                other_user = mongo.db.users.find_one({"_id": booking['host_id']})
-                other_user_key = 'host'
-            else:
-                other_user = mongo.db.users.find_one({"_id": booking['tourist_id']})
-                other_user_key = 'tourist'
-            
-            formatted_booking = {
-                "id": str(booking['_id']),
-                "booking_reference": booking['booking_reference'],
-                "listing_type": booking.get('listing_type', 'homestay'),
-                "status": booking['status'],
-                "payment_status": booking.get('payment_status', 'pending'),
-                "total_amount": booking['total_amount'],
-                "special_requests": booking.get('special_requests', ''),
-                "created_at": booking['created_at'].isoformat(),
-                "listing": {
-                    "id": str(listing['_id']),
-                    "title": listing['title'],
-                    "location": listing['location'],
-                    "images": listing.get('images', [])
-                } if listing else None
-            }
-            
-            # Add type-specific fields
-            if booking.get('listing_type') == 'experience':
-                formatted_booking.update({
-                    "experience_date": booking['experience_date'].strftime('%Y-%m-%d'),
-                    "experience_time": booking.get('experience_time'),
-                    "experience_datetime": booking['experience_datetime'].isoformat(),
-                    "participants": booking['participants'],
-                    "duration": booking.get('duration'),
-                    "category": booking.get('category'),
-                    "difficulty_level": booking.get('difficulty_level')
-                })
-            else:
-                formatted_booking.update({
-                    "check_in": booking['check_in'].strftime('%Y-%m-%d'),
-                    "check_out": booking['check_out'].strftime('%Y-%m-%d'),
-                    "guests": booking['guests'],
-                    "nights": booking.get('nights', 1)
-                })
-            
-            # Add other user info
-            if other_user:
-                formatted_booking[other_user_key] = {
-                    "id": str(other_user['_id']),
-                    "full_name": other_user['full_name'],
-                    "email": other_user['email'],
-                    "phone": other_user.get('phone')
-                }
-            
-            formatted_bookings.append(formatted_booking)
+            related = experiences if booking.get('listing_type') == 'experience' else listings
+            formatted_bookings.append(_format_feed_booking(
+                booking,
+                related.get(booking['listing_id']),
+                users.get(booking.get(counterparty_field)),
+                other_user_key
+            ))
         
         return jsonify({
             "bookings": formatted_bookings,
-            "total_count": len(formatted_bookings)
+            "total_count": total_count,
+            "pagination": {
+                "page": page,
+                "limit": limit,
+                "total_count": total_count,
+                "total_pages": math.ceil(total_count / limit) if total_count > 0 else 1
+            }
         }), 200
         
     except Exception as e:
@@ -488,7 +654,7 @@ def get_booking_details(booking_id):
             return jsonify({"error": "Booking not found"}), 404
         
         # Verify access
-        user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
+        user = get_current_user()
         if (str(booking['tourist_id']) != user_id and 
             str(booking['host_id']) != user_id and 
             user.get('user_type') != 'admin'):
@@ -611,6 +777,14 @@ def cancel_booking(booking_id):
             }
         )
         
+        # Give the nights back to the listing
+        if booking.get('listing_type') != 'experience':
+            try:
+                release_nights(booking['listing_id'], booking['_id'])
+            except AvailabilityConflictError as e:
+                # The next booking for these nights reclaims them from the cancelled booking
+                print(f"⚠️ Could not release nights for booking {booking['_id']}: {e}")
+        
         return jsonify({"message": "Booking cancelled successfully"}), 200
         
     except Exception as e:
@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from bson import ObjectId
 from database import mongo
+from utils.auth_utils import get_current_user
+from utils.activity_writer import record_view
 from datetime import datetime
 
 experiences_bp = Blueprint('experiences', __name__)
@@ -21,7 +23,7 @@ def create_experience():
         print(f"📋 Data: {data}")
         
         # Verify user is a host
-        user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
+        user = get_current_user()
         if not user or user['user_type'] != 'host':
             return jsonify({"error": "Only hosts can create experiences"}), 403
         
@@ -195,6 +197,8 @@ def get_experience(experience_id):
         if not experience:
             return jsonify({"error": "Experience not found"}), 404
         
+        record_view("experiences", experience['_id'])
+        
         # Get host information
         host = mongo.db.users.find_one({"_id": experience['host_id']})
         
@@ -243,6 +247,7 @@ def get_experience(experience_id):
             "cancellation_policy": experience.get('cancellation_policy', 'flexible'),
             "rating": experience.get('rating', 0),
             "review_count": experience.get('review_count', 0),
+            "view_count": experience.get('view_count', 0),
             "created_at": experience['created_at'].isoformat() if 'created_at' in experience else None,
             "is_active": experience.get('is_active', True),
             "is_approved": experience.get('is_approved', False),
@@ -2,10 +2,30 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from bson import ObjectId
 from database import mongo
+from utils.auth_utils import require_admin, get_current_user
+from utils.location_utils import canonical_location_key
+from utils.sustainability_utils import (
+    get_sustainability_mentions,
+    get_cached_sustainability_score,
+    store_sustainability_score
+)
 from datetime import datetime, timedelta
+import threading
 
 impact_bp = Blueprint('impact', __name__)
 
+# Several aggregations below use $lookup with both localField/foreignField
+# and a sub-pipeline, which requires MongoDB 5.0 or newer
+
+# Leaderboards are precomputed into the `leaderboards` collection and served
+# from there; a read older than LEADERBOARD_TTL triggers a background refresh
+LEADERBOARD_CATEGORIES = ('hosts', 'tourists', 'locations')
+LEADERBOARD_MAX_SIZE = 100
+LEADERBOARD_TTL = timedelta(minutes=15)
+
+_leaderboard_refresh_lock = threading.Lock()
+_leaderboard_refreshing = set()
+
 @impact_bp.route('/user/<user_id>', methods=['GET'])
 @jwt_required()
 def get_user_impact(user_id):
@@ -15,7 +35,7 @@ def get_user_impact(user_id):
         if current_user_id != user_id:
             return jsonify({"error": "Unauthorized"}), 403
         
-        user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
+        user = get_current_user()
         if not user:
             return jsonify({"error": "User not found"}), 404
         
@@ -34,20 +54,12 @@ def get_user_impact(user_id):
 @impact_bp.route('/community/<location>', methods=['GET'])
 def get_community_impact(location):
     try:
-        listings = list(mongo.db.listings.find({
-           "location": {"$regex": location, "$options": "i"},
-           "is_active": True,
-           "is_approved": True
-        }))
+        # Calculate community impact
+        impact_data = calculate_community_impact(location)
         
-        if not listings:
+        if impact_data is None:
             return jsonify({"error": "No listings found for this location"}), 404
         
-        listing_ids = [listing['_id'] for listing in listings]
-        
-        # Calculate community impact
-        impact_data = calculate_community_impact(listing_ids, location)
-        
         return jsonify(impact_data), 200
         
     except Exception as e:
@@ -75,8 +87,15 @@ def get_sustainability_score(listing_id):
        if not listing:
            return jsonify({"error": "Listing not found"}), 404
        
-       # Calculate sustainability score
-       score_data = calculate_sustainability_score(listing)
+       # Serve the cached score; it is dropped whenever the listing's
+       # features or the host's sustainability review mentions change
+       score_data = get_cached_sustainability_score(listing)
+       
+       if not score_data:
+           score_data = calculate_sustainability_score(listing)
+           store_sustainability_score(listing, score_data)
+       else:
+           score_data = {key: value for key, value in score_data.items() if key != 'computed_at'}
        
        return jsonify(score_data), 200
        
@@ -112,20 +131,37 @@ def calculate_trip_carbon_footprint():
 def get_impact_leaderboard():
    try:
        category = request.args.get('category', 'hosts')  # 'hosts', 'tourists', 'locations'
-       limit = int(request.args.get('limit', 10))
+       limit = min(int(request.args.get('limit', 10)), LEADERBOARD_MAX_SIZE)
        
-       if category == 'hosts':
-           leaderboard_data = get_host_leaderboard(limit)
-       elif category == 'tourists':
-           leaderboard_data = get_tourist_leaderboard(limit)
-       elif category == 'locations':
-           leaderboard_data = get_location_leaderboard(limit)
-       else:
+       if category not in LEADERBOARD_CATEGORIES:
            return jsonify({"error": "Invalid category"}), 400
        
+       leaderboard_doc = get_cached_leaderboard(category)
+       
        return jsonify({
            "category": category,
-           "leaderboard": leaderboard_data
+           "leaderboard": leaderboard_doc['entries'][:limit],
+           "computed_at": leaderboard_doc['computed_at'].isoformat()
+       }), 200
+       
+   except Exception as e:
+       return jsonify({"error": str(e)}), 500
+
+@impact_bp.route('/leaderboard/refresh', methods=['POST'])
+@require_admin
+def refresh_impact_leaderboard():
+   try:
+       category = request.args.get('category')
+       
+       if category and category not in LEADERBOARD_CATEGORIES:
+           return jsonify({"error": "Invalid category"}), 400
+       
+       categories = [category] if category else list(LEADERBOARD_CATEGORIES)
+       refreshed = {c: refresh_leaderboard(c)['computed_at'].isoformat() for c in categories}
+       
+       return jsonify({
+           "message": "Leaderboards refreshed successfully",
+           "computed_at": refreshed
        }), 200
        
    except Exception as e:
@@ -134,13 +170,49 @@ def get_impact_leaderboard():
 def calculate_tourist_impact(user_id):
    """Calculate environmental and economic impact for a tourist"""
    
-   # Get all completed bookings
-   bookings = list(mongo.db.bookings.find({
-       "tourist_id": ObjectId(user_id),
-       "status": "completed"
-   }))
+   # Totals are computed server-side; only the distinct listings visited are
+   # joined back for their location and sustainability features
+   pipeline = [
+       {"$match": {
+           "tourist_id": ObjectId(user_id),
+           "status": "completed"
+       }},
+       {"$group": {
+           "_id": None,
+           "total_trips": {"$sum": 1},
+           "total_spent": {"$sum": "$total_amount"},
+           "community_contribution": {"$sum": "$community_contribution"},
+           "total_nights": {"$sum": "$nights"},
+           "listing_ids": {"$addToSet": "$listing_id"}
+       }},
+       {"$lookup": {
+           "from": "listings",
+           "localField": "listing_ids",
+           "foreignField": "_id",
+           "pipeline": [
+               {"$project": {
+                   "_id": 0,
+                   "location": 1,
+                   "feature_count": {"$size": {"$ifNull": ["$sustainability_features", []]}}
+               }}
+           ],
+           "as": "listings"
+       }},
+       {"$project": {
+           "_id": 0,
+           "total_trips": 1,
+           "total_spent": 1,
+           "community_contribution": 1,
+           "total_nights": 1,
+           "listing_count": {"$size": "$listings"},
+           "unique_locations": {"$size": {"$setUnion": ["$listings.location", []]}},
+           "sustainability_features_count": {"$sum": "$listings.feature_count"}
+       }}
+   ]
+   
+   stats = next(mongo.db.bookings.aggregate(pipeline), None)
    
-   if not bookings:
+   if not stats:
        return {
            "total_trips": 0,
            "total_spent": 0,
@@ -150,53 +222,78 @@ def calculate_tourist_impact(user_id):
            "sustainability_score": 0
        }
    
-   total_spent = sum(booking['total_amount'] for booking in bookings)
-   community_contribution = sum(booking.get('community_contribution', 0) for booking in bookings)
-   
-   # Get unique locations visited
-   listing_ids = [booking['listing_id'] for booking in bookings]
-   listings = list(mongo.db.listings.find({"_id": {"$in": listing_ids}}))
-   unique_locations = set(listing['location'] for listing in listings)
+   total_trips = stats['total_trips']
+   total_spent = stats['total_spent']
+   community_contribution = stats['community_contribution']
    
    # Calculate carbon savings (rural vs urban stays)
-   carbon_saved = 0
-   for booking in bookings:
-       nights = booking['nights']
-       # Assume rural stays save 5kg CO2 per night vs urban hotels
-       carbon_saved += nights * 5
+   # Assume rural stays save 5kg CO2 per night vs urban hotels
+   carbon_saved = stats['total_nights'] * 5
    
    # Calculate jobs supported (estimate based on spending)
    jobs_supported = int(total_spent / 10000)  # Rough estimate: 1 job per ₹10,000 spent
    
    # Calculate sustainability score
-   sustainability_features_count = 0
-   for listing in listings:
-       sustainability_features_count += len(listing.get('sustainability_features', []))
-   
-   sustainability_score = min(100, (sustainability_features_count / len(listings)) * 20) if listings else 0
+   listing_count = stats['listing_count']
+   sustainability_score = min(100, (stats['sustainability_features_count'] / listing_count) * 20) if listing_count else 0
    
    return {
-       "total_trips": len(bookings),
+       "total_trips": total_trips,
        "total_spent": total_spent,
        "community_contribution": community_contribution,
-       "communities_supported": len(unique_locations),
+       "communities_supported": stats['unique_locations'],
        "carbon_saved": f"{carbon_saved}kg CO2",
        "local_jobs_supported": jobs_supported,
        "sustainability_score": round(sustainability_score, 1),
        "impact_breakdown": {
            "accommodation_spending": total_spent - community_contribution,
            "community_fund_contribution": community_contribution,
-           "average_per_trip": round(total_spent / len(bookings), 2) if bookings else 0
+           "average_per_trip": round(total_spent / total_trips, 2)
        }
    }
 
 def calculate_host_impact(user_id):
    """Calculate impact metrics for a host"""
    
-   # Get host listings
-   listings = list(mongo.db.listings.find({"host_id": ObjectId(user_id)}))
+   # Group the host's listings, then aggregate their completed bookings
+   # inside the lookup so only the totals come back
+   pipeline = [
+       {"$match": {"host_id": ObjectId(user_id)}},
+       {"$group": {
+           "_id": None,
+           "total_listings": {"$sum": 1},
+           "total_sustainability_features": {
+               "$sum": {"$size": {"$ifNull": ["$sustainability_features", []]}}
+           },
+           "listing_ids": {"$push": "$_id"}
+       }},
+       {"$lookup": {
+           "from": "bookings",
+           "localField": "listing_ids",
+           "foreignField": "listing_id",
+           "pipeline": [
+               {"$match": {"status": "completed"}},
+               {"$group": {
+                   "_id": None,
+                   "total_bookings": {"$sum": 1},
+                   "total_guests": {"$sum": "$guests"},
+                   "total_earnings": {"$sum": "$host_earnings"},
+                   "total_nights": {"$sum": "$nights"}
+               }}
+           ],
+           "as": "booking_stats"
+       }},
+       {"$project": {
+           "_id": 0,
+           "total_listings": 1,
+           "total_sustainability_features": 1,
+           "booking_stats": {"$arrayElemAt": ["$booking_stats", 0]}
+       }}
+   ]
+   
+   stats = next(mongo.db.listings.aggregate(pipeline), None)
    
-   if not listings:
+   if not stats:
        return {
            "total_listings": 0,
            "total_guests_hosted": 0,
@@ -205,46 +302,93 @@ def calculate_host_impact(user_id):
            "community_impact": 0
        }
    
-   listing_ids = [listing['_id'] for listing in listings]
-   
-   # Get completed bookings
-   bookings = list(mongo.db.bookings.find({
-       "listing_id": {"$in": listing_ids},
-       "status": "completed"
-   }))
-   
-   total_guests = sum(booking['guests'] for booking in bookings)
-   total_earnings = sum(booking.get('host_earnings', 0) for booking in bookings)
+   booking_stats = stats.get('booking_stats') or {}
+   total_listings = stats['total_listings']
+   total_bookings = booking_stats.get('total_bookings', 0)
+   total_guests = booking_stats.get('total_guests', 0)
+   total_earnings = booking_stats.get('total_earnings', 0)
    
    # Calculate sustainability score
-   total_sustainability_features = sum(len(listing.get('sustainability_features', [])) for listing in listings)
-   sustainability_score = min(100, (total_sustainability_features / len(listings)) * 10) if listings else 0
+   sustainability_score = min(100, (stats['total_sustainability_features'] / total_listings) * 10)
    
    # Calculate community impact
-   total_nights = sum(booking['nights'] for booking in bookings)
-   community_impact = total_nights * 2  # Estimate 2 points per night hosted
+   community_impact = booking_stats.get('total_nights', 0) * 2  # Estimate 2 points per night hosted
    
    return {
-       "total_listings": len(listings),
+       "total_listings": total_listings,
        "total_guests_hosted": total_guests,
        "total_earnings": total_earnings,
-       "total_bookings": len(bookings),
+       "total_bookings": total_bookings,
        "sustainability_score": round(sustainability_score, 1),
        "community_impact": community_impact,
-       "average_earnings_per_booking": round(total_earnings / len(bookings), 2) if bookings else 0,
+       "average_earnings_per_booking": round(total_earnings / total_bookings, 2) if total_bookings else 0,
        "guest_satisfaction": calculate_host_rating(user_id)
    }
 
-def calculate_community_impact(listing_ids, location):
-   """Calculate impact for a specific community/location"""
+def calculate_community_impact(location):
+   """Calculate impact for a specific community/location
    
-   # Get all bookings for listings in this location
-   bookings = list(mongo.db.bookings.find({
-       "listing_id": {"$in": listing_ids},
-       "status": "completed"
-   }))
+   Returns None when no active listings match the location.
+   """
    
-   if not bookings:
+   listing_pipeline = [
+       {"$match": {
+           "location": {"$regex": location, "$options": "i"},
+           "is_active": True,
+           "is_approved": True
+       }},
+       {"$group": {
+           "_id": None,
+           "listing_count": {"$sum": 1},
+           "total_sustainability_features": {
+               "$sum": {"$size": {"$ifNull": ["$sustainability_features", []]}}
+           },
+           "locations": {"$addToSet": "$location"},
+           "listing_ids": {"$addToSet": "$_id"}
+       }}
+   ]
+   
+   listing_stats = next(mongo.db.listings.aggregate(listing_pipeline), None)
+   
+   if not listing_stats:
+       return None
+   
+   # Bookings carry their own canonical location key, so the booking totals
+   # come from the bookings collection alone: an indexed equality match on
+   # the keys of the listings found above, kept to those (active, approved)
+   # listings as before
+   location_keys = sorted({
+       key for key in (canonical_location_key(loc) for loc in listing_stats['locations']) if key
+   })
+   booking_pipeline = [
+       {"$match": {
+           "status": "completed",
+           "listing_location_key": {"$in": location_keys},
+           "listing_id": {"$in": listing_stats['listing_ids']}
+       }},
+       {"$group": {
+           "_id": None,
+           "total_bookings": {"$sum": 1},
+           "total_visitors": {"$sum": "$guests"},
+           "total_revenue": {"$sum": "$total_amount"},
+           "community_fund": {"$sum": "$community_contribution"},
+           "total_nights": {"$sum": "$nights"},
+           "host_ids": {"$addToSet": "$host_id"}
+       }},
+       {"$project": {
+           "_id": 0,
+           "total_bookings": 1,
+           "total_visitors": 1,
+           "total_revenue": 1,
+           "community_fund": 1,
+           "total_nights": 1,
+           "active_hosts": {"$size": "$host_ids"}
+       }}
+   ]
+   
+   booking_stats = next(mongo.db.bookings.aggregate(booking_pipeline), None)
+   
+   if not booking_stats:
        return {
            "location": location,
            "total_visitors": 0,
@@ -253,39 +397,59 @@ def calculate_community_impact(listing_ids, location):
            "sustainability_rating": 0
        }
    
-   total_visitors = sum(booking['guests'] for booking in bookings)
-   total_revenue = sum(booking['total_amount'] for booking in bookings)
-   community_fund = sum(booking.get('community_contribution', 0) for booking in bookings)
+   total_revenue = booking_stats['total_revenue']
    
    # Estimate jobs created (1 job per ₹50,000 annual revenue)
    jobs_created = int(total_revenue / 50000)
    
    # Get sustainability rating for the area
-   listings = list(mongo.db.listings.find({"_id": {"$in": listing_ids}}))
-   total_sustainability_features = sum(len(listing.get('sustainability_features', [])) for listing in listings)
-   sustainability_rating = min(5, (total_sustainability_features / len(listings))) if listings else 0
+   sustainability_rating = min(5, (listing_stats['total_sustainability_features'] / listing_stats['listing_count']))
    
    return {
        "location": location,
-       "total_visitors": total_visitors,
+       "total_visitors": booking_stats['total_visitors'],
        "total_economic_impact": total_revenue,
-       "community_fund_raised": community_fund,
+       "community_fund_raised": booking_stats['community_fund'],
        "jobs_created": jobs_created,
-       "active_hosts": len(set(booking['host_id'] for booking in bookings)),
+       "active_hosts": booking_stats['active_hosts'],
        "sustainability_rating": round(sustainability_rating, 1),
-       "average_stay_duration": round(sum(booking['nights'] for booking in bookings) / len(bookings), 1) if bookings else 0
+       "average_stay_duration": round(booking_stats['total_nights'] / booking_stats['total_bookings'], 1)
    }
 
 def calculate_overall_impact(start_date):
    """Calculate overall platform impact"""
    
-   # Get all completed bookings since start_date
-   bookings = list(mongo.db.bookings.find({
-       "status": "completed",
-       "created_at": {"$gte": start_date}
-   }))
+   pipeline = [
+       {"$match": {
+           "status": "completed",
+           "created_at": {"$gte": start_date}
+       }},
+       {"$group": {
+           "_id": None,
+           "total_bookings": {"$sum": 1},
+           "total_revenue": {"$sum": "$total_amount"},
+           "total_community_fund": {"$sum": "$community_contribution"},
+           "total_guests": {"$sum": "$guests"},
+           "total_nights": {"$sum": "$nights"},
+           # Experiences never counted towards communities (they aren't listings)
+           "location_keys": {"$addToSet": {
+               "$cond": [{"$eq": ["$listing_type", "experience"]}, None, "$listing_location_key"]
+           }}
+       }},
+       {"$project": {
+           "_id": 0,
+           "total_bookings": 1,
+           "total_revenue": 1,
+           "total_community_fund": 1,
+           "total_guests": 1,
+           "total_nights": 1,
+           "unique_locations": {"$size": {"$setDifference": ["$location_keys", [None]]}}
+       }}
+   ]
+   
+   stats = next(mongo.db.bookings.aggregate(pipeline), None)
    
-   if not bookings:
+   if not stats:
        return {
            "total_bookings": 0,
            "total_economic_impact": 0,
@@ -294,31 +458,23 @@ def calculate_overall_impact(start_date):
            "jobs_supported": 0
        }
    
-   total_revenue = sum(booking['total_amount'] for booking in bookings)
-   total_community_fund = sum(booking.get('community_contribution', 0) for booking in bookings)
-   total_guests = sum(booking['guests'] for booking in bookings)
-   total_nights = sum(booking['nights'] for booking in bookings)
-   
-   # Get unique locations
-   listing_ids = [booking['listing_id'] for booking in bookings]
-   listings = list(mongo.db.listings.find({"_id": {"$in": listing_ids}}))
-   unique_locations = set(listing['location'] for listing in listings)
+   total_revenue = stats['total_revenue']
    
    # Calculate carbon savings
-   carbon_saved = total_nights * 5  # 5kg CO2 per night vs urban hotels
+   carbon_saved = stats['total_nights'] * 5  # 5kg CO2 per night vs urban hotels
    
    # Estimate jobs supported
    jobs_supported = int(total_revenue / 25000)  # 1 job per ₹25,000
    
    return {
-       "total_bookings": len(bookings),
-       "total_guests": total_guests,
+       "total_bookings": stats['total_bookings'],
+       "total_guests": stats['total_guests'],
        "total_economic_impact": total_revenue,
-       "community_fund_raised": total_community_fund,
-       "communities_benefited": len(unique_locations),
+       "community_fund_raised": stats['total_community_fund'],
+       "communities_benefited": stats['unique_locations'],
        "carbon_footprint_reduced": f"{carbon_saved}kg CO2",
        "jobs_supported": jobs_supported,
-       "average_booking_value": round(total_revenue / len(bookings), 2),
+       "average_booking_value": round(total_revenue / stats['total_bookings'], 2),
        "platform_growth": calculate_growth_metrics(start_date)
    }
 
@@ -349,8 +505,7 @@ def calculate_sustainability_score(listing):
    score = min(100, score)
    
    # Get additional factors
-   reviews = list(mongo.db.reviews.find({"reviewee_id": listing['host_id']}))
-   sustainability_mentions = sum(1 for review in reviews if 'eco' in review['comment'].lower() or 'green' in review['comment'].lower())
+   sustainability_mentions = get_sustainability_mentions(listing['host_id'])
    
    if sustainability_mentions > 0:
        score += min(10, sustainability_mentions * 2)
@@ -398,6 +553,63 @@ def calculate_carbon_footprint(origin, destination, transport_mode, guests, nigh
        "offset_suggestions": get_offset_suggestions(total_emissions)
    }
 
+def get_cached_leaderboard(category):
+   """Get a precomputed leaderboard, refreshing it when missing or stale"""
+   
+   leaderboard_doc = mongo.db.leaderboards.find_one({"_id": category})
+   
+   if not leaderboard_doc:
+       return refresh_leaderboard(category)
+   
+   if datetime.utcnow() - leaderboard_doc['computed_at'] > LEADERBOARD_TTL:
+       # Serve the stale copy while a single background refresh runs
+       schedule_leaderboard_refresh(category)
+   
+   return leaderboard_doc
+
+def schedule_leaderboard_refresh(category):
+   """Refresh a leaderboard in a background thread unless one is already running"""
+   
+   with _leaderboard_refresh_lock:
+       if category in _leaderboard_refreshing:
+           return
+       _leaderboard_refreshing.add(category)
+   
+   def refresh_async():
+       try:
+           refresh_leaderboard(category)
+       except Exception as e:
+           print(f"❌ Leaderboard refresh failed for {category}: {e}")
+       finally:
+           with _leaderboard_refresh_lock:
+               _leaderboard_refreshing.discard(category)
+   
+   thread = threading.Thread(target=refresh_async)
+   thread.daemon = True
+   thread.start()
+
+def refresh_leaderboard(category):
+   """Recompute a leaderboard and store it in the leaderboards collection"""
+   
+   if category == 'hosts':
+       entries = get_host_leaderboard(LEADERBOARD_MAX_SIZE)
+   elif category == 'tourists':
+       entries = get_tourist_leaderboard(LEADERBOARD_MAX_SIZE)
+   elif category == 'locations':
+       entries = get_location_leaderboard(LEADERBOARD_MAX_SIZE)
+   else:
+       raise ValueError(f"Invalid leaderboard category: {category}")
+   
+   leaderboard_doc = {
+       "_id": category,
+       "entries": entries,
+       "computed_at": datetime.utcnow()
+   }
+   
+   mongo.db.leaderboards.replace_one({"_id": category}, leaderboard_doc, upsert=True)
+   
+   return leaderboard_doc
+
 def get_host_leaderboard(limit):
    """Get top hosts by impact"""
    
@@ -410,23 +622,29 @@ def get_host_leaderboard(limit):
            "total_bookings": {"$sum": 1}
        }},
        {"$sort": {"total_earnings": -1}},
-       {"$limit": limit}
+       {"$limit": limit},
+       {"$lookup": {
+           "from": "users",
+           "localField": "_id",
+           "foreignField": "_id",
+           "pipeline": [{"$project": {"full_name": 1}}],
+           "as": "host"
+       }},
+       {"$unwind": "$host"}
    ]
    
    host_stats = list(mongo.db.bookings.aggregate(pipeline))
    
    leaderboard = []
    for stat in host_stats:
-       host = mongo.db.users.find_one({"_id": stat['_id']})
-       if host:
-           leaderboard.append({
-               "host_id": str(host['_id']),
-               "host_name": host['full_name'],
-               "total_earnings": stat['total_earnings'],
-               "total_guests": stat['total_guests'],
-               "total_bookings": stat['total_bookings'],
-               "impact_score": calculate_host_impact_score(stat)
-           })
+       leaderboard.append({
+           "host_id": str(stat['_id']),
+           "host_name": stat['host']['full_name'],
+           "total_earnings": stat['total_earnings'],
+           "total_guests": stat['total_guests'],
+           "total_bookings": stat['total_bookings'],
+           "impact_score": calculate_host_impact_score(stat)
+       })
    
    return leaderboard
 
@@ -442,40 +660,45 @@ def get_tourist_leaderboard(limit):
            "community_contribution": {"$sum": "$community_contribution"}
        }},
        {"$sort": {"community_contribution": -1}},
-       {"$limit": limit}
+       {"$limit": limit},
+       {"$lookup": {
+           "from": "users",
+           "localField": "_id",
+           "foreignField": "_id",
+           "pipeline": [{"$project": {"full_name": 1}}],
+           "as": "tourist"
+       }},
+       {"$unwind": "$tourist"}
    ]
    
    tourist_stats = list(mongo.db.bookings.aggregate(pipeline))
    
    leaderboard = []
    for stat in tourist_stats:
-       tourist = mongo.db.users.find_one({"_id": stat['_id']})
-       if tourist:
-           leaderboard.append({
-               "tourist_id": str(tourist['_id']),
-               "tourist_name": tourist['full_name'],
-               "total_spent": stat['total_spent'],
-               "total_trips": stat['total_trips'],
-               "community_contribution": stat['community_contribution'],
-               "impact_score": calculate_tourist_impact_score(stat)
-           })
+       leaderboard.append({
+           "tourist_id": str(stat['_id']),
+           "tourist_name": stat['tourist']['full_name'],
+           "total_spent": stat['total_spent'],
+           "total_trips": stat['total_trips'],
+           "community_contribution": stat['community_contribution'],
+           "impact_score": calculate_tourist_impact_score(stat)
+       })
    
    return leaderboard
 
 def get_location_leaderboard(limit):
    """Get top locations by impact"""
    
+   # Single-collection pipeline over the denormalized booking location
    pipeline = [
-       {"$lookup": {
-           "from": "listings",
-           "localField": "listing_id",
-           "foreignField": "_id",
-           "as": "listing"
+       {"$match": {
+           "status": "completed",
+           "listing_location_key": {"$ne": None},
+           "listing_type": {"$ne": "experience"}
        }},
-       {"$unwind": "$listing"},
-       {"$match": {"status": "completed"}},
        {"$group": {
-           "_id": "$listing.location",
+           "_id": "$listing_location_key",
+           "location": {"$first": "$listing_location"},
            "total_revenue": {"$sum": "$total_amount"},
            "total_visitors": {"$sum": "$guests"},
            "total_bookings": {"$sum": 1}
@@ -489,7 +712,7 @@ def get_location_leaderboard(limit):
    leaderboard = []
    for stat in location_stats:
        leaderboard.append({
-           "location": stat['_id'],
+           "location": stat['location'],
            "total_revenue": stat['total_revenue'],
            "total_visitors": stat['total_visitors'],
            "total_bookings": stat['total_bookings'],
@@ -500,12 +723,15 @@ def get_location_leaderboard(limit):
 
 def calculate_host_rating(host_id):
    """Calculate average rating for a host"""
-   reviews = list(mongo.db.reviews.find({"reviewee_id": ObjectId(host_id)}))
-   if not reviews:
+   result = list(mongo.db.reviews.aggregate([
+       # Reviews without a numeric rating would make $avg null
+       {"$match": {"reviewee_id": ObjectId(host_id), "rating": {"$type": "number"}}},
+       {"$group": {"_id": None, "average_rating": {"$avg": "$rating"}}}
+   ]))
+   if not result:
        return 0
    
-   total_rating = sum(review['rating'] for review in reviews)
-   return round(total_rating / len(reviews), 1)
+   return round(result[0]['average_rating'], 1)
 
 def get_sustainability_grade(score):
    """Get sustainability grade based on score"""
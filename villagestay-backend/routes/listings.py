@@ -2,8 +2,18 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from bson import ObjectId
 from database import mongo
+from utils.auth_utils import get_current_user, get_current_user_type
+from utils.activity_writer import record_view
 from utils.geocoding_utils import get_coordinates_from_location, validate_coordinates
-from utils.ai_utils import generate_listing_content, translate_text, generate_pricing_suggestion
+from utils.ai_utils import (
+    generate_listing_content,
+    translate_text,
+    generate_pricing_suggestion,
+    refresh_listing_translations,
+    TRANSLATABLE_FIELDS
+)
+from utils.availability_utils import is_available, sync_blocked_nights, AvailabilityConflictError
+from utils.sustainability_utils import sustainability_cache_invalidation
 from utils.geocoding_utils import get_coordinates_from_location, validate_coordinates, get_location_suggestions, get_place_details
 from datetime import datetime, timedelta
 import math
@@ -14,6 +24,7 @@ from utils.semantic_search_utils import (
 )
 
 import base64
+import threading
 from werkzeug.utils import secure_filename
 import os
 from PIL import Image
@@ -159,6 +170,7 @@ def get_listing(listing_id):
             return jsonify({"error": "Listing not found"}), 404
         
         print(f"✅ Found listing: {listing['title']}")
+        record_view("listings", listing['_id'])
         
         # Get host information
         host = mongo.db.users.find_one({"_id": listing['host_id']})
@@ -205,6 +217,7 @@ def get_listing(listing_id):
             "experiences": listing.get('experiences', []),
             "rating": listing.get('rating', 0),
             "review_count": listing.get('review_count', 0),
+            "view_count": listing.get('view_count', 0),
             "created_at": listing['created_at'].isoformat() if 'created_at' in listing else None,
             "is_active": listing.get('is_active', True),
             "is_approved": listing.get('is_approved', False),
@@ -242,7 +255,7 @@ def create_listing():
         print(f"🚨 Old route data: {data}")
         
         # This route expects homestay data only
-        user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
+        user = get_current_user()
         if not user or user['user_type'] != 'host':
             return jsonify({"error": "Only hosts can create listings"}), 403
         
@@ -361,12 +374,35 @@ def update_listing(listing_id):
             if field in data:
                 update_data[field] = data[field]
         
+        update_query = {"$set": update_data}
+        
+        # A cached sustainability score depends on the features; it is
+        # dropped and versioned in the same write, so a score computed from
+        # the old features can no longer be cached
+        if 'sustainability_features' in update_data:
+            update_query.update(sustainability_cache_invalidation())
+        
         # Update listing
         mongo.db.listings.update_one(
             {"_id": ObjectId(listing_id)},
-            {"$set": update_data}
+            update_query
         )
         
+        # Re-translate only the text fields that actually changed
+        if listing.get('translations'):
+            changed_fields = {
+                field: update_data[field] for field in TRANSLATABLE_FIELDS
+                if field in update_data and update_data[field] != listing.get(field)
+            }
+            if changed_fields:
+                source_language = listing.get('original_voice_language', 'en')
+                thread = threading.Thread(
+                    target=refresh_listing_translations,
+                    args=(listing['_id'], changed_fields, source_language)
+                )
+                thread.daemon = True
+                thread.start()
+        
         return jsonify({"message": "Listing updated successfully"}), 200
         
     except Exception as e:
@@ -549,8 +585,12 @@ def update_availability(listing_id):
            {"$set": {"availability_calendar": current_calendar, "updated_at": datetime.utcnow()}}
        )
        
+       sync_blocked_nights(listing_id, current_calendar)
+       
        return jsonify({"message": "Availability updated successfully"}), 200
        
+   except AvailabilityConflictError as e:
+       return jsonify({"error": str(e)}), 409
    except Exception as e:
        return jsonify({"error": str(e)}), 500
 
@@ -565,8 +605,7 @@ def get_host_listings(host_id):
         
         # Verify user can access these listings
         if user_id != host_id:
-            user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
-            if not user or user['user_type'] != 'admin':
+            if get_current_user_type() != 'admin':
                 return jsonify({"error": "Unauthorized"}), 403
         
         # Get listings
@@ -595,6 +634,7 @@ def get_host_listings(host_id):
                 "village_story_videos": videos,
                 "rating": listing.get('rating', 0),
                 "review_count": listing.get('review_count', 0),
+                "view_count": listing.get('view_count', 0),
                 "created_at": listing['created_at'].isoformat() if 'created_at' in listing else None
             }
             formatted_listings.append(formatted_listing)
@@ -629,7 +669,8 @@ def get_pricing_suggestion(listing_id):
            listing['property_type'],
            listing['amenities'],
            listing.get('max_guests', 4),
-           listing.get('rating', 0)
+           listing.get('rating', 0),
+           refresh=request.args.get('refresh', '').lower() == 'true'
        )
        
        return jsonify({
@@ -643,40 +684,17 @@ def get_pricing_suggestion(listing_id):
 def check_availability(listing_id, check_in, check_out):
    """Check if listing is available for given dates"""
    try:
-       # Convert dates to datetime objects
        check_in_date = datetime.strptime(check_in, '%Y-%m-%d')
        check_out_date = datetime.strptime(check_out, '%Y-%m-%d')
        
-       # Check for existing bookings
-       existing_bookings = mongo.db.bookings.find({
-           "listing_id": ObjectId(listing_id),
-           "status": {"$in": ["confirmed", "pending"]},
-           "$or": [
-               {"check_in": {"$lte": check_in}, "check_out": {"$gt": check_in}},
-               {"check_in": {"$lt": check_out}, "check_out": {"$gte": check_out}},
-               {"check_in": {"$gte": check_in}, "check_out": {"$lte": check_out}}
-           ]
-       })
-       
-       if existing_bookings.count() > 0:
+       if check_out_date <= check_in_date:
            return False
        
-       # Check availability calendar
-       listing = mongo.db.listings.find_one({"_id": ObjectId(listing_id)})
-       if not listing:
+       if not mongo.db.listings.find_one({"_id": ObjectId(listing_id)}, {"_id": 1}):
            return False
        
-       availability_calendar = listing.get('availability_calendar', {})
-       
-       # Check each date in the range
-       current_date = check_in_date
-       while current_date < check_out_date:
-           date_str = current_date.strftime('%Y-%m-%d')
-           if availability_calendar.get(date_str) == False:
-               return False
-           current_date += timedelta(days=1)
-       
-       return True
+       # Booked and host-blocked nights both live in the availability index
+       return is_available(listing_id, check_in_date, check_out_date)
        
    except Exception as e:
        return False
@@ -926,6 +944,7 @@ def analyze_image_with_gemini(image_base64):
     
     try:
         from utils.ai_utils import call_gemini_with_image
+        from utils.structured_output import extract_json, json_generation_config, StructuredOutputError
         
         # Clean base64 data
         if image_base64.startswith('data:image'):
@@ -962,15 +981,11 @@ def analyze_image_with_gemini(image_base64):
         }
         """
         
-        response = call_gemini_with_image(analysis_prompt, image_base64)
+        response = call_gemini_with_image(analysis_prompt, image_base64, generation_config=json_generation_config())
         
-        # Extract JSON from response
-        import re
-        json_match = re.search(r'\{.*\}', response, re.DOTALL)
-        if json_match:
-            import json
-            return json.loads(json_match.group())
-        else:
+        try:
+            return extract_json(response, expect='object')
+        except StructuredOutputError:
             return create_fallback_visual_analysis()
             
     except Exception as e:
@@ -1343,7 +1358,7 @@ def create_listing_or_experience():
             return jsonify({"error": "listing_category must be 'homestay' or 'experience'"}), 400
         
         # Verify user is a host
-        user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
+        user = get_current_user()
         if not user or user['user_type'] != 'host':
             return jsonify({"error": "Only hosts can create listings"}), 403
         
@@ -1541,8 +1556,7 @@ def get_host_all_listings(host_id):
         
         # Verify ownership
         if str(user_id) != host_id:
-            user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
-            if not user or user['user_type'] != 'admin':
+            if get_current_user_type() != 'admin':
                 return jsonify({"error": "Unauthorized"}), 403
         
         # Get query parameters
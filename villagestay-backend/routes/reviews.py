@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from database import mongo
+from utils.sustainability_utils import record_review_mentions
+from utils.auth_utils import invalidate_user_cache
 from bson import ObjectId
 from datetime import datetime, timedelta
 import statistics
@@ -70,7 +72,9 @@ def create_review():
             "response": None,
             "response_date": None,
             "photos": data.get('photos', []),
-            "status": 'active'
+            "status": 'active',
+            # Counted by record_review_mentions below, not by the legacy seed
+            "mentions_counted": True
         }
         
         # Insert review
@@ -83,6 +87,9 @@ def create_review():
         # Update user ratings
         update_user_rating(reviewee_id, review_type)
         
+        # Keep keyword-mention counters (used by sustainability scores) current
+        record_review_mentions(reviewee_id, data['comment'])
+        
         return jsonify({
             "message": "Review created successfully",
             "review_id": str(result.inserted_id)
@@ -489,6 +496,7 @@ def update_user_rating(user_id, review_type):
                     }
                 }
             )
+            invalidate_user_cache(user_id)
             print(f"Updated user {user_id} rating to {avg_rating} with {review_count} reviews")
     except Exception as e:
         print(f"Error updating user rating: {e}")
@@ -0,0 +1,82 @@
+# In-memory stand-in for the handful of pymongo collection calls the
+# availability code makes (find/find_one/insert_one/update_one with simple
+# equality, $in, $ne, $gt and $exists filters). Projections are ignored.
+
+import copy
+from types import SimpleNamespace
+from pymongo.errors import DuplicateKeyError
+
+_MISSING = object()
+
+def _matches(doc, query):
+    for key, condition in query.items():
+        value = doc.get(key, _MISSING)
+        if isinstance(condition, dict) and condition and all(op.startswith('$') for op in condition):
+            for op, arg in condition.items():
+                if op == '$in':
+                    ok = value in arg
+                elif op == '$ne':
+                    ok = value != arg
+                elif op == '$gt':
+                    ok = value is not _MISSING and value > arg
+                elif op == '$exists':
+                    ok = (value is not _MISSING) == arg
+                else:
+                    raise NotImplementedError(op)
+                if not ok:
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, key, direction=1):
+        self.docs.sort(key=lambda doc: doc[key], reverse=direction < 0)
+        return self
+
+    def __iter__(self):
+        return iter(self.docs)
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = {}
+        # Called before every update_one, e.g. to simulate a concurrent writer
+        self.before_update = None
+
+    def find_one(self, query, projection=None):
+        return next(iter(self.find(query).docs), None)
+
+    def find(self, query, projection=None):
+        return FakeCursor([copy.deepcopy(doc) for doc in self.docs.values() if _matches(doc, query)])
+
+    def insert_one(self, doc):
+        if doc['_id'] in self.docs:
+            raise DuplicateKeyError("duplicate _id")
+        self.docs[doc['_id']] = copy.deepcopy(doc)
+        return SimpleNamespace(inserted_id=doc['_id'])
+
+    def update_one(self, query, update):
+        if self.before_update:
+            self.before_update(self)
+
+        doc = next((doc for doc in self.docs.values() if _matches(doc, query)), None)
+        if doc is None:
+            return SimpleNamespace(matched_count=0, modified_count=0)
+
+        for key, value in update.get('$set', {}).items():
+            doc[key] = copy.deepcopy(value)
+        for key, value in update.get('$inc', {}).items():
+            doc[key] = doc.get(key, 0) + value
+        return SimpleNamespace(matched_count=1, modified_count=1)
+
+class FakeDatabase:
+    def __init__(self):
+        self.collections = {}
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return self.collections.setdefault(name, FakeCollection())
@@ -0,0 +1,165 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import pytest
+
+pytest.importorskip("bson")
+pytest.importorskip("dotenv")
+pytest.importorskip("flask_pymongo")
+
+from bson import ObjectId
+from config import Config
+from utils import availability_utils
+from utils.availability_utils import (
+    MAX_RESERVATION_ATTEMPTS,
+    AvailabilityConflictError,
+    confirm_nights,
+    is_available,
+    reconcile_nights,
+    release_nights,
+    reserve_nights,
+)
+from tests.fake_mongo import FakeDatabase
+
+CHECK_IN = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=10)
+CHECK_OUT = CHECK_IN + timedelta(days=3)
+
+@pytest.fixture
+def db(monkeypatch):
+    db = FakeDatabase()
+    monkeypatch.setattr(availability_utils, "mongo", SimpleNamespace(db=db))
+    return db
+
+@pytest.fixture
+def listing_id(db):
+    listing_id = ObjectId()
+    db.listings.insert_one({"_id": listing_id, "availability_calendar": {}})
+    return listing_id
+
+def insert_booking(db, listing_id, booking_id, status, created_at=None):
+    db.bookings.insert_one({
+        "_id": booking_id,
+        "listing_id": listing_id,
+        "listing_type": "homestay",
+        "check_in": CHECK_IN,
+        "check_out": CHECK_OUT,
+        "status": status,
+        "created_at": created_at or datetime.utcnow()
+    })
+
+def age_reservation(db, listing_id, booking_id, minutes):
+    """Move a reservation's timestamps `minutes` into the past"""
+    doc = db.listing_availability.docs[listing_id]
+    for interval in doc['reservations']:
+        if interval['booking_id'] == booking_id:
+            for field in ('reserved_at', 'held_until'):
+                if field in interval:
+                    interval[field] -= timedelta(minutes=minutes)
+
+def test_reserve_then_overlap_is_refused(db, listing_id):
+    first = ObjectId()
+    assert reserve_nights(listing_id, CHECK_IN, CHECK_OUT, first)
+    insert_booking(db, listing_id, first, "pending")
+
+    assert not reserve_nights(listing_id, CHECK_IN + timedelta(days=1), CHECK_OUT + timedelta(days=1), ObjectId())
+    assert not is_available(listing_id, CHECK_IN, CHECK_OUT)
+    assert is_available(listing_id, CHECK_OUT, CHECK_OUT + timedelta(days=2))
+
+def test_reserve_retries_lost_compare_and_swap(db, listing_id):
+    reserve_nights(listing_id, CHECK_OUT, CHECK_OUT + timedelta(days=1), ObjectId())
+    lost = {"count": 0}
+
+    def concurrent_writer(collection):
+        # Another request wins the first two CAS attempts
+        if lost["count"] < 2:
+            lost["count"] += 1
+            collection.docs[listing_id]['version'] += 1
+
+    db.listing_availability.before_update = concurrent_writer
+
+    assert reserve_nights(listing_id, CHECK_IN, CHECK_OUT, ObjectId())
+    assert lost["count"] == 2
+    assert len(db.listing_availability.docs[listing_id]['reservations']) == 2
+
+def test_reserve_gives_up_when_always_losing(db, listing_id):
+    reserve_nights(listing_id, CHECK_OUT, CHECK_OUT + timedelta(days=1), ObjectId())
+    attempts = {"count": 0}
+
+    def concurrent_writer(collection):
+        attempts["count"] += 1
+        collection.docs[listing_id]['version'] += 1
+
+    db.listing_availability.before_update = concurrent_writer
+
+    with pytest.raises(AvailabilityConflictError):
+        reserve_nights(listing_id, CHECK_IN, CHECK_OUT, ObjectId())
+    assert attempts["count"] == MAX_RESERVATION_ATTEMPTS
+
+def test_lapsed_pending_hold_is_reclaimed_and_expired(db, listing_id):
+    unpaid = ObjectId()
+    reserve_nights(listing_id, CHECK_IN, CHECK_OUT, unpaid)
+    insert_booking(db, listing_id, unpaid, "pending")
+    age_reservation(db, listing_id, unpaid, Config.PENDING_BOOKING_HOLD_MINUTES + 1)
+
+    assert is_available(listing_id, CHECK_IN, CHECK_OUT)
+    assert reserve_nights(listing_id, CHECK_IN, CHECK_OUT, ObjectId())
+    assert db.bookings.docs[unpaid]['status'] == "expired"
+
+def test_confirmed_booking_keeps_its_nights(db, listing_id):
+    paid = ObjectId()
+    reserve_nights(listing_id, CHECK_IN, CHECK_OUT, paid)
+    insert_booking(db, listing_id, paid, "confirmed")
+    assert confirm_nights(listing_id, paid)
+    age_reservation(db, listing_id, paid, Config.PENDING_BOOKING_HOLD_MINUTES + 1)
+
+    interval = db.listing_availability.docs[listing_id]['reservations'][0]
+    assert 'held_until' not in interval
+    assert not is_available(listing_id, CHECK_IN, CHECK_OUT)
+    assert not reserve_nights(listing_id, CHECK_IN, CHECK_OUT, ObjectId())
+    assert db.bookings.docs[paid]['status'] == "confirmed"
+
+def test_confirm_nights_without_a_hold(db, listing_id):
+    assert not confirm_nights(listing_id, ObjectId())
+
+def test_reservation_waiting_for_its_insert_keeps_its_nights(db, listing_id):
+    in_flight = ObjectId()
+    reserve_nights(listing_id, CHECK_IN, CHECK_OUT, in_flight, pending=False)
+
+    assert not reserve_nights(listing_id, CHECK_IN, CHECK_OUT, ObjectId())
+
+def test_orphaned_reservation_is_reclaimed(db, listing_id):
+    crashed = ObjectId()
+    reserve_nights(listing_id, CHECK_IN, CHECK_OUT, crashed, pending=False)
+    age_reservation(db, listing_id, crashed, Config.ORPHANED_RESERVATION_MINUTES + 1)
+
+    assert reserve_nights(listing_id, CHECK_IN, CHECK_OUT, ObjectId())
+
+def test_release_frees_the_nights(db, listing_id):
+    booking_id = ObjectId()
+    reserve_nights(listing_id, CHECK_IN, CHECK_OUT, booking_id)
+
+    assert release_nights(listing_id, booking_id)
+    assert is_available(listing_id, CHECK_IN, CHECK_OUT)
+    assert not release_nights(listing_id, booking_id)
+
+def test_reconcile_drops_stale_reservations(db, listing_id):
+    cancelled, crashed, in_flight, active = ObjectId(), ObjectId(), ObjectId(), ObjectId()
+    reserve_nights(listing_id, CHECK_IN, CHECK_OUT, cancelled)
+    insert_booking(db, listing_id, cancelled, "cancelled")
+    reserve_nights(listing_id, CHECK_OUT, CHECK_OUT + timedelta(days=1), crashed, pending=False)
+    age_reservation(db, listing_id, crashed, Config.ORPHANED_RESERVATION_MINUTES + 1)
+    reserve_nights(listing_id, CHECK_OUT + timedelta(days=2), CHECK_OUT + timedelta(days=3), in_flight)
+    reserve_nights(listing_id, CHECK_OUT + timedelta(days=4), CHECK_OUT + timedelta(days=5), active)
+    db.bookings.insert_one({
+        "_id": active,
+        "listing_id": listing_id,
+        "listing_type": "homestay",
+        "check_in": CHECK_OUT + timedelta(days=4),
+        "check_out": CHECK_OUT + timedelta(days=5),
+        "status": "confirmed",
+        "created_at": datetime.utcnow()
+    })
+
+    assert reconcile_nights(listing_id) == 2
+
+    kept = {interval['booking_id'] for interval in db.listing_availability.docs[listing_id]['reservations']}
+    assert kept == {in_flight, active}
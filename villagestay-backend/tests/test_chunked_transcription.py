@@ -0,0 +1,102 @@
+import sys
+from array import array
+import pytest
+
+pytest.importorskip("dotenv")
+
+from config import Config
+from utils.audio_ingest import TARGET_SAMPLE_RATE, pcm_to_wav
+from utils.chunked_transcription import (
+    FakeSpeechBackend,
+    split_on_silence,
+    stitch_segments,
+    transcribe_long_audio,
+)
+
+def clip(*parts):
+    """16-bit PCM from (milliseconds, amplitude) parts; amplitude 0 is silence"""
+    samples = array('h')
+    for ms, amplitude in parts:
+        count = TARGET_SAMPLE_RATE * ms // 1000
+        samples.extend(amplitude if i % 2 else -amplitude for i in range(count))
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    return samples.tobytes()
+
+SPEECH = 8000
+
+def test_short_clip_is_one_segment():
+    pcm = clip((3000, SPEECH))
+    assert split_on_silence(pcm, max_segment_ms=10000) == [(0, 3000)]
+
+def test_long_clip_is_cut_inside_pauses():
+    pcm = clip((6000, SPEECH), (600, 0), (6000, SPEECH), (600, 0), (6000, SPEECH))
+    segments = split_on_silence(pcm, max_segment_ms=10000, min_segment_ms=2000)
+
+    assert len(segments) == 3
+    assert all(end - start <= 10000 for start, end in segments)
+    # each cut lands in the middle of a pause, not in speech
+    assert 6000 <= segments[0][1] <= 6600
+    assert 12600 <= segments[1][1] <= 13200
+    assert segments[-1][1] == 19200
+
+def test_speech_without_pauses_is_cut_at_the_limit():
+    pcm = clip((25000, SPEECH))
+    segments = split_on_silence(pcm, max_segment_ms=10000)
+
+    assert segments == [(0, 9990), (9990, 19980), (19980, 25020)]
+
+def test_silent_clip_has_no_segments():
+    assert split_on_silence(clip((5000, 0)), max_segment_ms=10000) == []
+
+def test_threshold_follows_a_loud_noisy_clip():
+    # the pauses are louder than a fixed 500 but quiet relative to the speech
+    pcm = clip((6000, 20000), (600, 1000), (6000, 20000))
+    segments = split_on_silence(pcm, max_segment_ms=10000, min_segment_ms=2000)
+
+    assert len(segments) == 2
+    assert 6000 <= segments[0][1] <= 6600
+
+def test_threshold_follows_a_quiet_clip():
+    # speech quieter than a fixed 500 is still speech
+    pcm = clip((6000, 400), (600, 0), (6000, 400))
+    segments = split_on_silence(pcm, max_segment_ms=10000, min_segment_ms=2000)
+
+    assert len(segments) == 2
+
+def test_explicit_threshold_is_respected():
+    pcm = clip((3000, 400))
+    assert split_on_silence(pcm, max_segment_ms=10000, threshold=500) == []
+
+def test_stitch_keeps_order_and_weights_confidence():
+    text, confidence = stitch_segments([
+        {"start_ms": 0, "end_ms": 3000, "text": "namaste", "confidence": 0.9},
+        {"start_ms": 3000, "end_ms": 4000, "text": "", "confidence": 0.0},
+        {"start_ms": 4000, "end_ms": 5000, "text": "ji", "confidence": 0.5},
+    ])
+
+    assert text == "namaste ji"
+    assert confidence == pytest.approx(0.8)
+
+def test_stitch_of_nothing_spoken():
+    assert stitch_segments([{"start_ms": 0, "end_ms": 1000, "text": "", "confidence": 0.7}]) == ("", 0.0)
+
+def test_transcribe_long_audio_with_fake_backend(monkeypatch):
+    monkeypatch.setattr(Config, "SPEECH_SEGMENT_MAX_SECONDS", 10)
+    backend = FakeSpeechBackend(confidence=0.8, delay=0.01)
+    wav = pcm_to_wav(clip((6000, SPEECH), (600, 0), (6000, SPEECH), (600, 0), (6000, SPEECH)))
+
+    result = transcribe_long_audio(wav, "hi-IN", backend)
+
+    assert len(backend.calls) == 3
+    assert {call["language"] for call in backend.calls} == {"hi-IN"}
+    assert [segment["start_ms"] for segment in result["segments"]] == sorted(
+        segment["start_ms"] for segment in result["segments"]
+    )
+    assert result["text"] == " ".join(segment["text"] for segment in result["segments"])
+    assert result["confidence"] == pytest.approx(0.8)
+    assert result["language"] == "hi-IN"
+
+def test_transcribe_silence_raises():
+    with pytest.raises(Exception, match="No speech detected"):
+        transcribe_long_audio(pcm_to_wav(clip((3000, 0))), "en-IN", FakeSpeechBackend())
@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+import pytest
+
+pytest.importorskip("flask")
+
+from config import Config
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# A fresh interpreter so nothing is already imported by the test session
+STARTUP_SCRIPT = """
+import time
+started = time.perf_counter()
+from app import create_app
+create_app()
+print((time.perf_counter() - started) * 1000)
+"""
+
+def test_app_starts_within_budget():
+    result = subprocess.run(
+        [sys.executable, "-c", STARTUP_SCRIPT],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        timeout=60
+    )
+    assert result.returncode == 0, result.stderr
+
+    startup_ms = float(result.stdout.strip().splitlines()[-1])
+    assert startup_ms < Config.STARTUP_BUDGET_MS, f"startup took {startup_ms:.0f}ms (budget {Config.STARTUP_BUDGET_MS}ms)"
@@ -0,0 +1,79 @@
+import pytest
+from utils.structured_output import (
+    extract_json,
+    extract_complete_json,
+    json_generation_config,
+    StructuredOutputError,
+    TruncatedOutputError,
+)
+
+def test_bare_json():
+    assert extract_json('{"a": 1, "b": [1, 2]}') == {"a": 1, "b": [1, 2]}
+
+def test_already_parsed_value_is_returned():
+    value = {"a": 1}
+    assert extract_json(value) is value
+
+def test_code_fence_and_prose():
+    text = 'Here you go:\n```json\n{"title": "Stay", "tags": ["farm"]}\n```\nEnjoy!'
+    assert extract_json(text) == {"title": "Stay", "tags": ["farm"]}
+
+def test_stops_at_matching_brace():
+    text = '{"a": {"b": 1}} and later {"c": 2}'
+    assert extract_json(text) == {"a": {"b": 1}}
+
+def test_braces_inside_strings():
+    assert extract_json('note {"text": "use } and { freely", "n": 1} done') == {"text": "use } and { freely", "n": 1}
+
+def test_trailing_commas():
+    assert extract_json('{"a": [1, 2,], "b": 3,}') == {"a": [1, 2], "b": 3}
+
+def test_raw_newline_in_string():
+    assert extract_json('{"a": "line one\nline two"}') == {"a": "line one\nline two"}
+
+def test_expect_skips_prose_brackets():
+    assert extract_json('See [1] for details: {"ok": true}', expect='object') == {"ok": True}
+    assert extract_json('Result {note} follows: [1, 2]', expect='array') == [1, 2]
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"a": 1, "b": "half a sent', {"a": 1, "b": "half a sent"}),
+    ('{"a": 1, "b": [1, 2', {"a": 1, "b": [1, 2]}),
+    ('{"a": 1, "b"', {"a": 1}),
+    ('{"a": 1, "b":', {"a": 1}),
+    ('{"a": 1, "b": tr', {"a": 1}),
+    ('{"a": 1, "b": 12', {"a": 1, "b": 12}),
+    ('{"a": 1, "ke', {"a": 1}),
+    ('[{"a": 1}, {"a": 2', [{"a": 1}, {"a": 2}]),
+])
+def test_truncated_reply_is_repaired(text, expected):
+    assert extract_json(text) == expected
+
+def test_truncated_reply_refused_without_repair():
+    with pytest.raises(TruncatedOutputError) as excinfo:
+        extract_json('{"hi": "Namaste", "ta": "Vanak', allow_repair=False)
+    assert excinfo.value.value == {"hi": "Namaste", "ta": "Vanak"}
+
+def test_extract_complete_json():
+    assert extract_complete_json('```json\n{"a": 1}\n```') == {"a": 1}
+    with pytest.raises(TruncatedOutputError):
+        extract_complete_json('{"a": [1, 2')
+
+def test_truncated_array_when_object_expected():
+    # Returning the first element would hide everything cut off after it
+    with pytest.raises(StructuredOutputError) as excinfo:
+        extract_json('[{"a": 1}, {"a": 2}, {"a"', expect='object')
+    assert not isinstance(excinfo.value, TruncatedOutputError)
+
+@pytest.mark.parametrize("text", ["", "   ", "no json here", "{\"a\" 1}"])
+def test_unrecoverable(text):
+    with pytest.raises(StructuredOutputError):
+        extract_json(text)
+
+def test_json_generation_config():
+    schema = {"type": "OBJECT"}
+    assert json_generation_config() == {"responseMimeType": "application/json"}
+    assert json_generation_config(schema, temperature=0.2) == {
+        "responseMimeType": "application/json",
+        "responseSchema": schema,
+        "temperature": 0.2,
+    }
@@ -0,0 +1,141 @@
+# villagestay-backend/utils/activity_writer.py
+#
+# Write-behind channel for non-critical activity fields (last_login,
+# last_seen, view counters). Requests record the change in memory and return;
+# a background thread merges everything recorded for the same document and
+# flushes it with one unordered bulk_write every ACTIVITY_FLUSH_INTERVAL_MS
+# (sooner once ACTIVITY_FLUSH_BATCH documents are pending). A crash can lose
+# the last interval of these fields, which is the trade for keeping them off
+# the request path.
+
+import atexit
+import os
+import threading
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from config import Config
+from database import mongo
+
+MAX_FLUSH_ATTEMPTS = 3
+
+class ActivityWriter:
+    """Coalesces $set/$inc/$max updates per document and flushes them in bulk"""
+
+    def __init__(self, interval_ms, batch_size):
+        self.interval = interval_ms / 1000.0
+        self.batch_size = batch_size
+        self.pending = {}       # (collection, _id) -> {"$set": {...}, "$inc": {...}, "$max": {...}}
+        self.attempts = {}      # (collection, _id) -> failed flushes so far
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.pid = None
+
+    def record(self, collection, doc_id, set_fields=None, inc_fields=None, max_fields=None):
+        """Queue an update; later values win for $set, $inc adds up, $max keeps the largest"""
+        key = (collection, doc_id)
+        with self.lock:
+            update = self.pending.setdefault(key, {})
+            self._merge(update, set_fields, inc_fields, max_fields)
+            backlog = len(self.pending)
+
+        self._ensure_thread()
+        if backlog >= self.batch_size:
+            self.wakeup.set()
+
+    @staticmethod
+    def _merge(update, set_fields=None, inc_fields=None, max_fields=None):
+        if set_fields:
+            update.setdefault("$set", {}).update(set_fields)
+        for field, amount in (inc_fields or {}).items():
+            increments = update.setdefault("$inc", {})
+            increments[field] = increments.get(field, 0) + amount
+        for field, value in (max_fields or {}).items():
+            maxima = update.setdefault("$max", {})
+            maxima[field] = max(maxima[field], value) if field in maxima else value
+
+    def _ensure_thread(self):
+        # Started lazily, and again in each forked worker (threads don't survive fork)
+        if self.thread and self.thread.is_alive() and self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.thread and self.thread.is_alive() and self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            self.thread = threading.Thread(target=self._run, name="activity-writer", daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        while True:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """Write everything pending; failed documents are retried on the next flush"""
+        with self.lock:
+            batch, self.pending = self.pending, {}
+        if not batch:
+            return 0
+
+        by_collection = {}
+        for (collection, doc_id), update in batch.items():
+            by_collection.setdefault(collection, []).append((doc_id, update))
+
+        written = 0
+        for collection, updates in by_collection.items():
+            failed = []
+            try:
+                result = mongo.db[collection].bulk_write(
+                    [UpdateOne({"_id": doc_id}, update) for doc_id, update in updates],
+                    ordered=False
+                )
+                written += result.modified_count
+            except BulkWriteError as e:
+                # Unordered: every op not listed in writeErrors was applied, and
+                # requeueing those would apply their $inc a second time
+                failed = [updates[error['index']] for error in e.details.get('writeErrors', [])]
+                written += e.details.get('nModified', 0)
+                print(f"⚠️ Activity flush to {collection}: {len(failed)} of {len(updates)} documents failed")
+            except Exception as e:
+                failed = updates
+                print(f"⚠️ Activity flush to {collection} failed ({len(updates)} documents): {e}")
+
+            failed_ids = {doc_id for doc_id, _ in failed}
+            with self.lock:
+                for doc_id, _ in updates:
+                    if doc_id not in failed_ids:
+                        self.attempts.pop((collection, doc_id), None)
+            if failed:
+                self._requeue(collection, failed)
+
+        return written
+
+    def _requeue(self, collection, updates):
+        with self.lock:
+            for doc_id, update in updates:
+                key = (collection, doc_id)
+                self.attempts[key] = self.attempts.get(key, 0) + 1
+                if self.attempts[key] >= MAX_FLUSH_ATTEMPTS:
+                    self.attempts.pop(key)
+                    print(f"❌ Dropping activity update for {collection} {doc_id} after {MAX_FLUSH_ATTEMPTS} attempts")
+                    continue
+                # Merge back under anything recorded since, keeping the newer $set values
+                newer = self.pending.pop(key, {})
+                merged = {}
+                self._merge(merged, update.get("$set"), update.get("$inc"), update.get("$max"))
+                self._merge(merged, newer.get("$set"), newer.get("$inc"), newer.get("$max"))
+                self.pending[key] = merged
+
+activity_writer = ActivityWriter(Config.ACTIVITY_FLUSH_INTERVAL_MS, Config.ACTIVITY_FLUSH_BATCH)
+
+# Best effort on clean shutdown
+atexit.register(activity_writer.flush)
+
+def record_user_activity(user_id, **fields):
+    """Buffer non-critical user fields such as last_login or last_seen"""
+    activity_writer.record("users", user_id, set_fields=fields)
+
+def record_view(collection, doc_id):
+    """Buffer a view counter increment for a listing or experience"""
+    activity_writer.record(collection, doc_id, inc_fields={"view_count": 1})
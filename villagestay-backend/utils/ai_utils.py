@@ -3,10 +3,97 @@ import json
 import base64
 import time
 import uuid
+import re
+import hashlib
+import threading
+from datetime import datetime
+from pymongo import UpdateOne, ASCENDING
 from config import Config
+from database import mongo
+from utils.llm_cache import llm_cache_key, get_cached_response, store_cached_response
+from utils.gemini_scheduler import gemini_scheduler, GeminiQuotaError, PRIORITY_INTERACTIVE, PRIORITY_LISTING, PRIORITY_BACKGROUND
+from utils.structured_output import extract_json, extract_complete_json, json_generation_config, TruncatedOutputError
 
-def call_gemini_api(prompt, model="gemini-2.0-flash"):
-    """Make API call to Gemini"""
+# Languages every listing is offered in, and the listing fields that get translated
+TRANSLATION_LANGUAGES = ["en", "hi", "gu", "te", "mr", "ta"]
+TRANSLATABLE_FIELDS = ["title", "description"]
+
+# Bump when the translation prompt or reply format changes, so translations
+# made with the old one stop being served from translation_cache
+TRANSLATION_PROMPT_VERSION = 2
+
+LANGUAGE_NAMES = {
+    "en": "English",
+    "hi": "Hindi",
+    "gu": "Gujarati",
+    "te": "Telugu",
+    "mr": "Marathi",
+    "ta": "Tamil"
+}
+
+class _InFlightCall:
+    """A Gemini request other callers with the same key can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+# cache key -> _InFlightCall for requests currently waiting on Gemini
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+def call_gemini_api(prompt, model="gemini-2.0-flash", generation_config=None, coalesce_timeout=None,
+                    priority=PRIORITY_INTERACTIVE, deadline=None):
+    """Make API call to Gemini
+    
+    generation_config entries override the defaults (e.g. maxOutputTokens,
+    responseMimeType).
+    
+    Identical requests (same model, normalized prompt and config) already in
+    flight are coalesced: the first caller makes the request and the others
+    wait up to coalesce_timeout seconds for its result, so a burst of users on
+    one page costs a single upstream call.
+    
+    The request then queues for the shared Gemini quota by priority
+    (PRIORITY_INTERACTIVE, PRIORITY_LISTING or PRIORITY_BACKGROUND) and fails
+    if no slot frees up within deadline seconds (a per-priority default).
+    """
+    
+    key = llm_cache_key(model, prompt, generation_config)
+    
+    with _in_flight_lock:
+        call = _in_flight.get(key)
+        leader = call is None
+        if leader:
+            call = _in_flight[key] = _InFlightCall()
+        else:
+            call.followers += 1
+    
+    if not leader:
+        timeout = coalesce_timeout if coalesce_timeout is not None else Config.GEMINI_COALESCE_TIMEOUT
+        if not call.done.wait(timeout):
+            raise Exception(f"Gemini API failed: timed out after {timeout}s waiting for identical request")
+        if call.error:
+            raise call.error
+        return call.result
+    
+    try:
+        call.result = _request_gemini(prompt, model, generation_config, priority, deadline)
+        return call.result
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _in_flight_lock:
+            _in_flight.pop(key, None)
+        call.done.set()
+        if call.followers:
+            print(f"🔗 Coalesced {call.followers} identical Gemini requests")
+
+def _request_gemini(prompt, model, generation_config, priority=PRIORITY_INTERACTIVE, deadline=None):
+    """POST one generateContent request through the scheduler and return the response text"""
     
     url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
     
@@ -29,7 +116,8 @@ def call_gemini_api(prompt, model="gemini-2.0-flash"):
             "temperature": 0.7,
             "topK": 40,
             "topP": 0.95,
-            "maxOutputTokens": 1024
+            "maxOutputTokens": 1024,
+            **(generation_config or {})
         }
     }
     
@@ -37,7 +125,11 @@ def call_gemini_api(prompt, model="gemini-2.0-flash"):
         if not Config.GEMINI_API_KEY:
             raise Exception("Gemini API key not configured")
             
-        response = requests.post(url, headers=headers, json=data)
+        response = gemini_scheduler.send(
+            lambda: requests.post(url, headers=headers, json=data, timeout=Config.GEMINI_REQUEST_TIMEOUT),
+            priority,
+            deadline
+        )
         response.raise_for_status()
         
         result = response.json()
@@ -46,12 +138,61 @@ def call_gemini_api(prompt, model="gemini-2.0-flash"):
             return result['candidates'][0]['content']['parts'][0]['text']
         else:
             raise Exception("No valid response from Gemini API")
-            
+    
+    except GeminiQuotaError:
+        raise
     except Exception as e:
         print(f"Gemini API error: {e}")
         raise Exception(f"Gemini API failed: {str(e)}")
 
-def call_gemini_with_image(prompt, image_data, model="gemini-2.0-flash"):
+def call_gemini_cached(prompt, endpoint, parse=None, model="gemini-2.0-flash", generation_config=None, refresh=False,
+                       priority=PRIORITY_INTERACTIVE):
+    """call_gemini_api through the LLM response cache
+
+    parse (e.g. json.loads) is applied to the response and only responses it
+    accepts are cached, so a malformed answer is never served twice. A parse
+    that raises TruncatedOutputError (extract_complete_json) still returns the
+    repaired value, but the cut-off reply is not cached. refresh skips the
+    cache lookup and overwrites the entry with a fresh generation.
+    """
+    key = llm_cache_key(model, prompt, generation_config)
+
+    if not refresh:
+        cached = get_cached_response(key)
+        if cached is not None:
+            try:
+                return parse(cached) if parse else cached
+            except Exception:
+                print(f"⚠️ Discarding unparseable cached {endpoint} response")
+
+    response = call_gemini_api(prompt, model=model, generation_config=generation_config, priority=priority)
+    try:
+        result = parse(response) if parse else response
+    except TruncatedOutputError as e:
+        print(f"⚠️ Not caching truncated {endpoint} response")
+        return e.value
+    store_cached_response(key, response, endpoint, model)
+    return result
+
+def call_gemini_json(prompt, schema=None, expect=None, model="gemini-2.0-flash", generation_config=None,
+                     priority=PRIORITY_INTERACTIVE, allow_repair=True):
+    """call_gemini_api in JSON mode, returning the parsed value
+    
+    schema (a Gemini responseSchema) constrains the shape where it is known.
+    Replies are parsed with extract_json, which also recovers fenced or
+    truncated JSON; StructuredOutputError is raised if nothing is usable.
+    Callers that store the result pass allow_repair=False, so a reply cut
+    off at maxOutputTokens raises TruncatedOutputError instead.
+    """
+    response = call_gemini_api(
+        prompt,
+        model=model,
+        generation_config=json_generation_config(schema, **(generation_config or {})),
+        priority=priority
+    )
+    return extract_json(response, expect, allow_repair=allow_repair)
+
+def call_gemini_with_image(prompt, image_data, model="gemini-2.0-flash", priority=PRIORITY_INTERACTIVE, generation_config=None):
     """Make API call to Gemini with image"""
     
     url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
@@ -81,15 +222,19 @@ def call_gemini_with_image(prompt, image_data, model="gemini-2.0-flash"):
             "temperature": 0.7,
             "topK": 40,
             "topP": 0.95,
-            "maxOutputTokens": 1024
+            "maxOutputTokens": 1024,
+            **(generation_config or {})
         }
     }
     
     try:
         if not Config.GEMINI_API_KEY:
             raise Exception("Gemini API key not configured")
-            
-        response = requests.post(url, headers=headers, json=data)
+        
+        response = gemini_scheduler.send(
+            lambda: requests.post(url, headers=headers, json=data, timeout=Config.GEMINI_REQUEST_TIMEOUT),
+            priority
+        )
         response.raise_for_status()
         
         result = response.json()
@@ -161,53 +306,174 @@ def generate_smart_pricing(listing_data, language):
 def create_multilingual_listing(listing_data, original_language):
     """Create translations in multiple languages"""
     
-    languages = ["en", "hi", "gu", "te", "mr", "ta"]
-    translations = {}
+    fields = {
+        field: listing_data[field]
+        for field in TRANSLATABLE_FIELDS
+        if isinstance(listing_data.get(field), str) and listing_data[field].strip()
+    }
+    target_languages = [lang for lang in TRANSLATION_LANGUAGES if lang != original_language]
+    
+    translated = translate_listing_fields(fields, original_language, target_languages, priority=PRIORITY_LISTING)
+    
+    translations = {original_language: listing_data}
+    for lang in target_languages:
+        translations[lang] = {**listing_data, **translated.get(lang, {})}
+    
+    return translations
+
+def translate_listing_fields(fields, source_language, target_languages, priority=PRIORITY_BACKGROUND):
+    """Translate listing fields into several languages
+    
+    fields is {field: text}; returns {language: {field: translated_text}}.
+    Translations are cached per (content hash, source and target language,
+    prompt version), so only text that has not been translated before is
+    sent to Gemini, in a single call for all fields and languages. Anything that cannot be translated keeps the
+    original text.
+    """
+    
+    translations = {lang: {} for lang in target_languages}
+    if not fields or not target_languages:
+        return translations
+    
+    cache_keys = {
+        (field, lang): translation_cache_key(text, source_language, lang)
+        for field, text in fields.items()
+        for lang in target_languages
+    }
+    
+    try:
+        cached = {
+            doc['_id']: doc['text']
+            for doc in mongo.db.translation_cache.find({"_id": {"$in": list(cache_keys.values())}})
+        }
+    except Exception as e:
+        print(f"⚠️ Translation cache lookup failed: {e}")
+        cached = {}
+    
+    missing = {}
+    for (field, lang), key in cache_keys.items():
+        if key in cached:
+            translations[lang][field] = cached[key]
+        else:
+            missing.setdefault(lang, set()).add(field)
+    
+    if not missing:
+        return translations
     
-    for lang in languages:
-        if lang == original_language:
-            translations[lang] = listing_data
-            continue
+    missing_fields = sorted(set().union(*missing.values()))
+    
+    source_fields = {field: fields[field] for field in missing_fields}
+    try:
+        translated = request_translations(source_fields, source_language, sorted(missing), priority=priority)
+    except TruncatedOutputError:
+        # Cut off at maxOutputTokens: half a translation must never reach the
+        # cache, so ask again one language at a time (smaller replies)
+        translated = {}
+        for lang in sorted(missing):
+            try:
+                translated.update(request_translations(source_fields, source_language, [lang], priority=priority))
+            except Exception as e:
+                print(f"❌ Translation to {lang} failed: {e}")
+    except Exception as e:
+        print(f"❌ Translation failed: {e}")
+        translated = {}
+    
+    cache_updates = []
+    for lang, lang_fields in missing.items():
+        for field in lang_fields:
+            text = translated.get(lang, {}).get(field)
             
-        # Use Gemini for translations
-        try:
-            if lang == 'en' and original_language != 'en':
-                translation_prompt = f"""
-                Translate this rural homestay listing to English while maintaining cultural context:
-                
-                Title: {listing_data.get('title', '')}
-                Description: {listing_data.get('description', '')}
-                
-                Provide JSON with translated title and description:
-                {{
-                    "title": "translated_title",
-                    "description": "translated_description"
-                }}
-                """
-                
-                translation_result = call_gemini_api(translation_prompt)
-                
-                # Try to parse JSON
-                import re
-                json_match = re.search(r'\{.*\}', translation_result, re.DOTALL)
-                if json_match:
-                    translated_data = json.loads(json_match.group())
-                    translations[lang] = {
-                        **listing_data,
-                        "title": translated_data.get('title', listing_data['title']),
-                        "description": translated_data.get('description', listing_data['description'])
-                    }
-                else:
-                    translations[lang] = listing_data
+            if isinstance(text, str) and text.strip():
+                translations[lang][field] = text
+                cache_updates.append(UpdateOne(
+                    {"_id": cache_keys[(field, lang)]},
+                    {"$set": {"text": text, "language": lang, "created_at": datetime.utcnow()}},
+                    upsert=True
+                ))
             else:
-                translations[lang] = listing_data
-                
+                translations[lang][field] = fields[field]
+    
+    if cache_updates:
+        try:
+            _ensure_translation_cache_index()
+            mongo.db.translation_cache.bulk_write(cache_updates, ordered=False)
         except Exception as e:
-            print(f"❌ Translation failed for {lang}: {e}")
-            translations[lang] = listing_data
+            print(f"⚠️ Translation cache write failed: {e}")
     
     return translations
 
+def listing_field_translations(translations):
+    """Keep only the translated fields of each language version, for storing on a listing"""
+    return {
+        lang: {field: version[field] for field in TRANSLATABLE_FIELDS if field in version}
+        for lang, version in (translations or {}).items()
+    }
+
+def refresh_listing_translations(listing_id, changed_fields, source_language):
+    """Re-translate only the listing fields that changed and store them per field"""
+    
+    fields = {
+        field: text for field, text in changed_fields.items()
+        if field in TRANSLATABLE_FIELDS and isinstance(text, str) and text.strip()
+    }
+    if not fields:
+        return
+    
+    target_languages = [lang for lang in TRANSLATION_LANGUAGES if lang != source_language]
+    translated = translate_listing_fields(fields, source_language, target_languages)
+    
+    update_data = {f"translations.{source_language}.{field}": text for field, text in fields.items()}
+    for lang, lang_fields in translated.items():
+        for field, text in lang_fields.items():
+            update_data[f"translations.{lang}.{field}"] = text
+    
+    mongo.db.listings.update_one({"_id": listing_id}, {"$set": update_data})
+
+def request_translations(fields, source_language, target_languages, priority=PRIORITY_BACKGROUND):
+    """Ask Gemini for every field in every target language in one call"""
+    
+    source_name = LANGUAGE_NAMES.get(source_language, source_language)
+    targets = ', '.join(f"{lang} ({LANGUAGE_NAMES.get(lang, lang)})" for lang in target_languages)
+    
+    translation_prompt = f"""
+    Translate this rural homestay listing from {source_name} into each of these languages: {targets}.
+    Maintain the cultural context and keep proper nouns (village and place names) unchanged.
+    
+    Listing fields (JSON):
+    {json.dumps(fields, ensure_ascii=False)}
+    
+    Respond with a JSON object keyed by language code, each containing the same fields:
+    {{
+        "{target_languages[0]}": {{{', '.join(f'"{field}": "..."' for field in fields)}}}
+    }}
+    """
+    
+    return call_gemini_json(
+        translation_prompt,
+        expect='object',
+        generation_config={"temperature": 0.2, "maxOutputTokens": 8192},
+        priority=priority,
+        allow_repair=False
+    )
+
+def translation_cache_key(text, source_language, language):
+    """Content-addressed cache key for one translated field"""
+    digest = hashlib.sha256(text.strip().encode('utf-8')).hexdigest()
+    return f"{digest}:{source_language}:{language}:v{TRANSLATION_PROMPT_VERSION}"
+
+_translation_index_ready = False
+
+def _ensure_translation_cache_index():
+    """Create the TTL index once per process; Mongo then drops old translations itself"""
+    global _translation_index_ready
+    if not _translation_index_ready:
+        mongo.db.translation_cache.create_index(
+            [("created_at", ASCENDING)],
+            name="created_at_ttl",
+            expireAfterSeconds=Config.TRANSLATION_CACHE_TTL_DAYS * 24 * 3600
+        )
+        _translation_index_ready = True
+
 def voice_to_listing_magic(audio_data, language="hi", host_id=None):
     """Convert voice recording to professional listing using Google Speech + Gemini"""
     
@@ -288,7 +554,7 @@ def generate_village_story_video(images, listing_details, host_info):
         Make it authentic and showcase rural Indian culture.
         """
         
-        story_script = call_gemini_api(story_prompt)
+        story_script = call_gemini_api(story_prompt, priority=PRIORITY_BACKGROUND)
         
         # Generate video metadata (mock implementation for video generation)
         video_data = generate_video_metadata(story_script, images, listing_details)
@@ -420,6 +686,18 @@ def extract_actionable_items(ai_response, user_message):
     
     return actionable_items
 
+CULTURAL_INSIGHTS_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "insight": {"type": "STRING"},
+            "importance": {"type": "STRING", "enum": ["high", "medium", "low"]}
+        },
+        "required": ["insight"]
+    }
+}
+
 def get_cultural_insights(user_message, user_preferences):
     """Get specific cultural insights based on user query"""
     
@@ -437,8 +715,7 @@ def get_cultural_insights(user_message, user_preferences):
     """
     
     try:
-        insights_response = call_gemini_api(insights_prompt)
-        return json.loads(insights_response)
+        return call_gemini_json(insights_prompt, schema=CULTURAL_INSIGHTS_SCHEMA)
     except:
         return [
             {
@@ -534,6 +811,17 @@ def generate_conversation_id():
 
 # ============ EXISTING FUNCTIONS ============
 
+LISTING_CONTENT_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "description": {"type": "STRING"},
+        "suggested_amenities": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "house_rules": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "pricing_tips": {"type": "ARRAY", "items": {"type": "STRING"}}
+    },
+    "required": ["description"]
+}
+
 def generate_listing_content(title, description, location, property_type, amenities):
     """Generate enhanced listing content using AI"""
     
@@ -555,12 +843,8 @@ def generate_listing_content(title, description, location, property_type, amenit
     Format the response as JSON with keys: description, suggested_amenities, house_rules, pricing_tips
     """
     
-    response = call_gemini_api(prompt)
-    
     try:
-        # Try to parse as JSON
-        content = json.loads(response)
-        return content
+        return call_gemini_json(prompt, schema=LISTING_CONTENT_SCHEMA, priority=PRIORITY_LISTING)
     except:
         raise Exception("Failed to generate listing content")
 
@@ -599,6 +883,18 @@ def translate_text(text, target_language, source_language="auto"):
     
     return call_gemini_api(prompt)
 
+VOICE_CONTENT_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "title": {"type": "STRING"},
+        "description": {"type": "STRING"},
+        "amenities": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "suggested_price_range": {"type": "STRING"},
+        "property_type": {"type": "STRING"}
+    },
+    "required": ["title", "description"]
+}
+
 def generate_content_from_voice(voice_text, language):
     """Generate listing content from voice description"""
     
@@ -617,13 +913,22 @@ def generate_content_from_voice(voice_text, language):
     Format as JSON with keys: title, description, amenities, suggested_price_range, property_type
     """
     
-    response = call_gemini_api(prompt)
-    
     try:
-        return json.loads(response)
+        return call_gemini_json(prompt, schema=VOICE_CONTENT_SCHEMA, priority=PRIORITY_LISTING)
     except:
         raise Exception("Failed to generate content from voice")
 
+MODERATION_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "is_safe": {"type": "BOOLEAN"},
+        "confidence": {"type": "NUMBER"},
+        "categories": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "suggestions": {"type": "ARRAY", "items": {"type": "STRING"}}
+    },
+    "required": ["is_safe", "confidence"]
+}
+
 def moderate_content(content, content_type):
     """Moderate content for safety and appropriateness"""
     
@@ -645,14 +950,30 @@ def moderate_content(content, content_type):
     - suggestions (list of improvements if needed)
     """
     
-    response = call_gemini_api(prompt)
-    
     try:
-        return json.loads(response)
+        return call_gemini_json(prompt, schema=MODERATION_SCHEMA, generation_config={"temperature": 0.1})
     except:
         raise Exception("Content moderation failed")
 
-def generate_pricing_suggestion(location, property_type, amenities, max_guests, rating):
+PRICING_SUGGESTION_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "base_price": {"type": "NUMBER"},
+        "seasonal_adjustments": {
+            "type": "OBJECT",
+            "properties": {
+                "peak": {"type": "NUMBER"},
+                "off_peak": {"type": "NUMBER"}
+            }
+        },
+        "weekly_discount_percentage": {"type": "NUMBER"},
+        "monthly_discount_percentage": {"type": "NUMBER"},
+        "reasoning": {"type": "STRING"}
+    },
+    "required": ["base_price", "reasoning"]
+}
+
+def generate_pricing_suggestion(location, property_type, amenities, max_guests, rating, refresh=False):
     """Generate AI-powered pricing suggestions"""
     
     prompt = f"""
@@ -660,7 +981,7 @@ def generate_pricing_suggestion(location, property_type, amenities, max_guests,
     
     Location: {location}
     Property Type: {property_type}
-    Amenities: {', '.join(amenities)}
+    Amenities: {', '.join(sorted(amenities))}
     Max Guests: {max_guests}
     Current Rating: {rating}/5
     
@@ -678,22 +999,41 @@ def generate_pricing_suggestion(location, property_type, amenities, max_guests,
     - reasoning (brief explanation)
     """
     
-    response = call_gemini_api(prompt)
-    
     try:
-        return json.loads(response)
+        return call_gemini_cached(
+            prompt, "pricing_suggestion",
+            parse=extract_complete_json,
+            generation_config=json_generation_config(PRICING_SUGGESTION_SCHEMA),
+            refresh=refresh,
+            priority=PRIORITY_LISTING
+        )
     except:
         raise Exception("Pricing suggestion generation failed")
 
-def generate_sustainability_suggestions(property_type, location, amenities, current_features):
+SUSTAINABILITY_SUGGESTIONS_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "feature_name": {"type": "STRING"},
+            "category": {"type": "STRING", "enum": ["energy", "water", "waste", "transport", "community"]},
+            "implementation_cost": {"type": "STRING", "enum": ["low", "medium", "high"]},
+            "environmental_impact": {"type": "STRING"},
+            "guest_appeal": {"type": "STRING"}
+        },
+        "required": ["feature_name", "category"]
+    }
+}
+
+def generate_sustainability_suggestions(property_type, location, amenities, current_features, refresh=False):
     """Generate sustainability improvement suggestions"""
     
     prompt = f"""
     Property Details:
     Type: {property_type}
     Location: {location}
-    Current Amenities: {', '.join(amenities)}
-    Current Sustainability Features: {', '.join(current_features)}
+    Current Amenities: {', '.join(sorted(amenities))}
+    Current Sustainability Features: {', '.join(sorted(current_features))}
     
     Suggest 5 practical sustainability improvements that:
     1. Are feasible for rural properties
@@ -709,14 +1049,32 @@ def generate_sustainability_suggestions(property_type, location, amenities, curr
     - guest_appeal (description)
     """
     
-    response = call_gemini_api(prompt)
-    
     try:
-        return json.loads(response)
+        return call_gemini_cached(
+            prompt, "sustainability_suggestions",
+            parse=extract_complete_json,
+            generation_config=json_generation_config(SUSTAINABILITY_SUGGESTIONS_SCHEMA),
+            refresh=refresh,
+            priority=PRIORITY_LISTING
+        )
     except:
         raise Exception("Sustainability suggestions generation failed")
 
-def generate_experience_content(experience_type, location, duration, local_culture):
+EXPERIENCE_CONTENT_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "title": {"type": "STRING"},
+        "description": {"type": "STRING"},
+        "inclusions": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "requirements": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "pricing_suggestion": {"type": "NUMBER"},
+        "best_time": {"type": "STRING"},
+        "cultural_tips": {"type": "ARRAY", "items": {"type": "STRING"}}
+    },
+    "required": ["title", "description"]
+}
+
+def generate_experience_content(experience_type, location, duration, local_culture, refresh=False):
     """Generate content for local experiences"""
     
     prompt = f"""
@@ -739,9 +1097,13 @@ def generate_experience_content(experience_type, location, duration, local_cultu
     Format as JSON with appropriate keys.
     """
     
-    response = call_gemini_api(prompt)
-    
     try:
-        return json.loads(response)
+        return call_gemini_cached(
+            prompt, "experience_content",
+            parse=extract_complete_json,
+            generation_config=json_generation_config(EXPERIENCE_CONTENT_SCHEMA),
+            refresh=refresh,
+            priority=PRIORITY_LISTING
+        )
     except:
         raise Exception("Experience content generation failed")
\ No newline at end of file
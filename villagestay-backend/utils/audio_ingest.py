@@ -0,0 +1,175 @@
+# villagestay-backend/utils/audio_ingest.py
+#
+# Shared audio ingest for the speech backends. Uploaded clips are turned into
+# 16 kHz mono 16-bit PCM WAV entirely in memory: the input is streamed through
+# an ffmpeg pipe (no temp files), clips that are already in that format are
+# passed through untouched, and both the input and the decoded PCM are capped
+# so a single request cannot grow without bound.
+
+import base64
+import io
+import shutil
+import subprocess
+import threading
+import wave
+from config import Config
+
+TARGET_SAMPLE_RATE = 16000
+TARGET_CHANNELS = 1
+TARGET_SAMPLE_WIDTH = 2  # bytes, i.e. 16-bit PCM
+
+PIPE_CHUNK_SIZE = 64 * 1024
+FFMPEG_TIMEOUT = 60  # seconds
+
+class AudioIngestError(Exception):
+    """Raised when an uploaded clip cannot be turned into PCM"""
+
+def max_pcm_bytes():
+    """Upper bound on decoded PCM for one request"""
+    return Config.MAX_AUDIO_SECONDS * TARGET_SAMPLE_RATE * TARGET_CHANNELS * TARGET_SAMPLE_WIDTH
+
+def decode_audio_payload(audio_data):
+    """Accept raw bytes or a base64 string (with or without a data: prefix)"""
+    if isinstance(audio_data, str):
+        if audio_data.startswith('data:') and ',' in audio_data:
+            audio_data = audio_data.split(',', 1)[1]
+        audio_data = base64.b64decode(audio_data)
+
+    if not audio_data:
+        raise AudioIngestError("Empty audio payload")
+
+    if len(audio_data) > Config.MAX_AUDIO_BYTES:
+        raise AudioIngestError(
+            f"Audio payload too large ({len(audio_data)} bytes, limit {Config.MAX_AUDIO_BYTES})"
+        )
+
+    return audio_data
+
+def read_wav_format(audio_bytes):
+    """Return (sample_rate, channels, sample_width, frames) for a PCM WAV, else None"""
+    if audio_bytes[:4] != b'RIFF' or audio_bytes[8:12] != b'WAVE':
+        return None
+
+    try:
+        with wave.open(io.BytesIO(audio_bytes), 'rb') as wav:
+            return wav.getframerate(), wav.getnchannels(), wav.getsampwidth(), wav.getnframes()
+    except (wave.Error, EOFError):
+        # Not PCM (e.g. float or compressed WAV), let ffmpeg handle it
+        return None
+
+def is_speech_ready(audio_bytes):
+    """Check whether a clip is already 16 kHz mono 16-bit PCM WAV"""
+    wav_format = read_wav_format(audio_bytes)
+    return bool(wav_format) and wav_format[:3] == (TARGET_SAMPLE_RATE, TARGET_CHANNELS, TARGET_SAMPLE_WIDTH)
+
+def pcm_to_wav(pcm):
+    """Wrap raw 16 kHz mono s16le PCM in a WAV header"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(TARGET_CHANNELS)
+        wav.setsampwidth(TARGET_SAMPLE_WIDTH)
+        wav.setframerate(TARGET_SAMPLE_RATE)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+def wav_to_pcm(wav_bytes):
+    """Strip the WAV header from a speech-ready clip and return the raw PCM"""
+    with wave.open(io.BytesIO(wav_bytes), 'rb') as wav:
+        return wav.readframes(wav.getnframes())
+
+def _feed_stdin(process, audio_bytes):
+    """Write the clip to ffmpeg in chunks; ffmpeg may close the pipe early"""
+    view = memoryview(audio_bytes)
+    try:
+        for offset in range(0, len(view), PIPE_CHUNK_SIZE):
+            process.stdin.write(view[offset:offset + PIPE_CHUNK_SIZE])
+    except (BrokenPipeError, ValueError):
+        pass
+    finally:
+        try:
+            process.stdin.close()
+        except (BrokenPipeError, ValueError):
+            pass
+
+def transcode_to_pcm(audio_bytes):
+    """Stream a clip through ffmpeg and return raw 16 kHz mono s16le PCM"""
+    ffmpeg = shutil.which(Config.FFMPEG_BINARY)
+    if not ffmpeg:
+        raise AudioIngestError(f"ffmpeg not found ({Config.FFMPEG_BINARY})")
+
+    limit = max_pcm_bytes()
+    command = [
+        ffmpeg, '-hide_banner', '-loglevel', 'error', '-nostdin',
+        '-i', 'pipe:0',
+        '-vn', '-ac', str(TARGET_CHANNELS), '-ar', str(TARGET_SAMPLE_RATE),
+        '-f', 's16le', '-acodec', 'pcm_s16le',
+        'pipe:1'
+    ]
+
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+
+    writer = threading.Thread(target=_feed_stdin, args=(process, audio_bytes), daemon=True)
+    writer.start()
+
+    # Drain stderr in the background so ffmpeg never blocks on a full pipe
+    stderr_chunks = []
+    drainer = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)
+    drainer.start()
+
+    pcm = bytearray()
+    try:
+        while True:
+            chunk = process.stdout.read(PIPE_CHUNK_SIZE)
+            if not chunk:
+                break
+            pcm.extend(chunk)
+            if len(pcm) > limit:
+                raise AudioIngestError(f"Audio longer than {Config.MAX_AUDIO_SECONDS} seconds")
+
+        process.wait(timeout=FFMPEG_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        raise AudioIngestError("ffmpeg timed out while decoding audio")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        writer.join(timeout=1)
+        drainer.join(timeout=1)
+
+    if process.returncode != 0:
+        error_output = b''.join(stderr_chunks).decode('utf-8', 'replace').strip()
+        raise AudioIngestError(f"ffmpeg failed: {error_output or process.returncode}")
+
+    if not pcm:
+        raise AudioIngestError("No audio decoded from payload")
+
+    # An odd trailing byte would be half a sample
+    if len(pcm) % TARGET_SAMPLE_WIDTH:
+        del pcm[-1]
+
+    return bytes(pcm)
+
+def prepare_speech_audio(audio_data):
+    """Return a 16 kHz mono 16-bit PCM WAV for speech recognition
+
+    Accepts raw bytes or base64. Compliant WAVs skip ffmpeg entirely; anything
+    else is decoded through an ffmpeg pipe.
+    """
+    audio_bytes = decode_audio_payload(audio_data)
+
+    if is_speech_ready(audio_bytes):
+        if read_wav_format(audio_bytes)[3] * TARGET_SAMPLE_WIDTH > max_pcm_bytes():
+            raise AudioIngestError(f"Audio longer than {Config.MAX_AUDIO_SECONDS} seconds")
+        print(f"🎵 Audio already 16 kHz mono PCM ({len(audio_bytes)} bytes), skipping transcode")
+        return audio_bytes
+
+    pcm = transcode_to_pcm(audio_bytes)
+    print(f"🔄 Transcoded {len(audio_bytes)} bytes to {len(pcm)} bytes of 16 kHz mono PCM")
+
+    return pcm_to_wav(pcm)
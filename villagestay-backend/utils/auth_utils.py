@@ -1,12 +1,84 @@
+import copy
 import random
 import string
+import threading
+import time
+from collections import OrderedDict
 from config import Config
 from functools import wraps
-from flask import request, jsonify
-from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from flask import request, jsonify, g, has_app_context
+from flask_jwt_extended import get_jwt, get_jwt_identity, verify_jwt_in_request
 from database import mongo
 from bson import ObjectId
 
+# user_id -> (expires_at, user document); a short-lived cache of the users
+# behind JWT identities, so a burst of requests from one user reads Mongo once
+_user_cache = OrderedDict()
+_user_cache_lock = threading.Lock()
+
+def load_user(user_id):
+    """User document for an id, served from the identity cache when fresh"""
+    user_id = str(user_id)
+    now = time.monotonic()
+
+    with _user_cache_lock:
+        entry = _user_cache.get(user_id)
+        if entry and entry[0] > now:
+            _user_cache.move_to_end(user_id)
+            return copy.deepcopy(entry[1])
+
+    user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
+    if not user:
+        return None
+
+    with _user_cache_lock:
+        _user_cache[user_id] = (now + Config.USER_CACHE_TTL, user)
+        _user_cache.move_to_end(user_id)
+        while len(_user_cache) > Config.USER_CACHE_MAX_ENTRIES:
+            _user_cache.popitem(last=False)
+
+    # Callers get their own deep copy, so a route mutating it (nested
+    # fields included) can't touch the cache
+    return copy.deepcopy(user)
+
+def invalidate_user_cache(user_id):
+    """Drop a user from the identity cache after writing to their document"""
+    with _user_cache_lock:
+        _user_cache.pop(str(user_id), None)
+    if has_app_context():
+        g.pop('current_user', None)
+
+def get_current_user():
+    """The user behind the request's JWT, loaded at most once per request"""
+    if 'current_user' not in g:
+        g.current_user = load_user(get_jwt_identity())
+    return g.current_user
+
+def get_current_user_type():
+    """The caller's user type, from the JWT claim without a database read
+
+    Tokens live for 30 days, so the claim is only trusted for
+    ROLE_CLAIM_MAX_AGE seconds after issue; older tokens (and tokens issued
+    before the claim existed) fall back to the user document, so a role
+    change or demotion takes effect within that window on every worker.
+    """
+    claims = get_jwt()
+    user_type = claims.get('user_type')
+    issued_at = claims.get('iat')
+    if user_type and issued_at and time.time() - issued_at < Config.ROLE_CLAIM_MAX_AGE:
+        return user_type
+
+    user = get_current_user()
+    return user['user_type'] if user else None
+
+def is_admin_request():
+    """True when a public route's request carries a valid admin JWT"""
+    try:
+        verify_jwt_in_request(optional=True)
+    except Exception:
+        return False
+    return get_jwt_identity() is not None and get_current_user_type() == 'admin'
+
 def require_user_type(*allowed_types):
     """Decorator to require specific user types"""
     def decorator(f):
@@ -14,13 +86,12 @@ def require_user_type(*allowed_types):
         def decorated_function(*args, **kwargs):
             verify_jwt_in_request()
             
-            user_id = get_jwt_identity()
-            user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
+            user_type = get_current_user_type()
             
-            if not user:
+            if not user_type:
                 return jsonify({"error": "User not found"}), 404
             
-            if user['user_type'] not in allowed_types:
+            if user_type not in allowed_types:
                 return jsonify({
                     "error": f"Access denied. Required user type: {' or '.join(allowed_types)}"
                 }), 403
@@ -35,10 +106,7 @@ def require_admin(f):
     def decorated_function(*args, **kwargs):
         verify_jwt_in_request()
         
-        user_id = get_jwt_identity()
-        user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
-        
-        if not user or user['user_type'] != 'admin':
+        if get_current_user_type() != 'admin':
             return jsonify({"error": "Admin privileges required"}), 403
         
         return f(*args, **kwargs)
@@ -50,10 +118,7 @@ def require_host(f):
     def decorated_function(*args, **kwargs):
         verify_jwt_in_request()
         
-        user_id = get_jwt_identity()
-        user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
-        
-        if not user or user['user_type'] != 'host':
+        if get_current_user_type() != 'host':
             return jsonify({"error": "Host account required"}), 403
         
         return f(*args, **kwargs)
@@ -104,14 +169,14 @@ def validate_phone_number(phone):
     return False
 
 def hash_password(password):
-    """Hash password with salt"""
-    from werkzeug.security import generate_password_hash
-    return generate_password_hash(password)
+    """Hash password with the configured method (see utils.password_utils)"""
+    from utils import password_utils
+    return password_utils.hash_password(password)
 
 def verify_password(password, password_hash):
-    """Verify password against hash"""
-    from werkzeug.security import check_password_hash
-    return check_password_hash(password_hash, password)
+    """Verify password against a werkzeug or bcrypt hash"""
+    from utils import password_utils
+    return password_utils.verify_password(password, password_hash)[0]
 
 def generate_secure_token(length=32):
     """Generate secure random token"""
@@ -0,0 +1,364 @@
+# villagestay-backend/utils/availability_utils.py
+#
+# Per-listing availability index for homestays. Each listing has one document
+# in `listing_availability` holding two sorted, non-overlapping interval lists
+# of occupied nights ([start, end) at midnight, like booking check_in/out):
+#
+#   reservations - nights held by pending/confirmed bookings
+#   blocked      - nights the host switched off in availability_calendar
+#
+# Overlap checks are a binary search over each list. Writes are
+# compare-and-swap on a `version` field, so two concurrent requests can never
+# both reserve the same nights.
+#
+# Nights held by a pending (unpaid) booking carry `held_until`. Once that
+# passes, the nights show as free, and the next booking that needs them
+# expires the pending booking and takes them over. A conflicting interval
+# whose booking is no longer active (a cancellation whose release lost the
+# CAS race) is reclaimed the same way.
+#
+# Nights are reserved before their booking is inserted, so every interval
+# records `reserved_at`. One whose booking still doesn't exist
+# ORPHANED_RESERVATION_MINUTES later was left by a writer that crashed or
+# failed to release it, and is reclaimed as well. reconcile_nights rebuilds
+# a listing's reservations from its bookings for anything else that drifted
+# (see migrations/reconcile_listing_availability.py).
+
+from bisect import bisect_left
+from datetime import datetime, date, timedelta
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from config import Config
+from database import mongo
+
+MAX_RESERVATION_ATTEMPTS = 5
+
+ACTIVE_BOOKING_STATUSES = ["pending", "confirmed"]
+
+class AvailabilityConflictError(Exception):
+    """Raised when concurrent writers keep winning the availability CAS"""
+
+class OccupiedIntervals:
+    """Sorted list of non-overlapping [start, end) intervals"""
+
+    def __init__(self, intervals=None):
+        self.intervals = sorted(intervals or [], key=lambda interval: interval['start'])
+        self.starts = [interval['start'] for interval in self.intervals]
+
+    def overlaps(self, start, end):
+        """Check whether [start, end) intersects any interval"""
+        # Only the last interval starting before `end` can reach into the
+        # range, because intervals never overlap each other
+        index = bisect_left(self.starts, end)
+        return index > 0 and self.intervals[index - 1]['end'] > start
+
+    def overlapping(self, start, end):
+        """Every interval that intersects [start, end)"""
+        # Intervals don't overlap, so their ends are sorted too: walk back
+        # from the last one starting before `end` while they reach `start`
+        index = bisect_left(self.starts, end)
+        found = []
+        while index > 0 and self.intervals[index - 1]['end'] > start:
+            index -= 1
+            found.append(self.intervals[index])
+        return found
+
+    def add(self, interval):
+        """Insert an interval; returns False if it would overlap an existing one"""
+        if self.overlaps(interval['start'], interval['end']):
+            return False
+
+        index = bisect_left(self.starts, interval['start'])
+        self.intervals.insert(index, interval)
+        self.starts.insert(index, interval['start'])
+        return True
+
+    def remove(self, booking_id):
+        """Remove the interval held by a booking; returns False if none was held"""
+        for index, interval in enumerate(self.intervals):
+            if interval.get('booking_id') == booking_id:
+                del self.intervals[index]
+                del self.starts[index]
+                return True
+        return False
+
+    def prune_before(self, cutoff):
+        """Drop intervals that ended before the cutoff"""
+        self.intervals = [interval for interval in self.intervals if interval['end'] > cutoff]
+        self.starts = [interval['start'] for interval in self.intervals]
+
+    def to_list(self):
+        return list(self.intervals)
+
+def to_night(value):
+    """Normalize a date/datetime/'YYYY-MM-DD' string to a midnight datetime"""
+    if isinstance(value, str):
+        value = datetime.strptime(value, '%Y-%m-%d')
+    if isinstance(value, datetime):
+        return datetime.combine(value.date(), datetime.min.time())
+    if isinstance(value, date):
+        return datetime.combine(value, datetime.min.time())
+    raise ValueError(f"Invalid date: {value}")
+
+def pending_hold_deadline(created_at):
+    """When the nights of an unpaid booking created at created_at are released"""
+    return created_at + timedelta(minutes=Config.PENDING_BOOKING_HOLD_MINUTES)
+
+def _hold_lapsed(interval, now):
+    return bool(interval.get('held_until')) and interval['held_until'] <= now
+
+def _orphaned(interval, now):
+    """True once a reservation has waited too long for its booking to exist"""
+    reserved_at = interval.get('reserved_at')
+    return reserved_at is None or reserved_at + timedelta(minutes=Config.ORPHANED_RESERVATION_MINUTES) <= now
+
+def blocked_intervals_from_calendar(availability_calendar):
+    """Merge the host's unavailable calendar days into night intervals"""
+    blocked_days = sorted(
+        to_night(day) for day, available in (availability_calendar or {}).items()
+        if available is False
+    )
+
+    intervals = []
+    for day in blocked_days:
+        if intervals and intervals[-1]['end'] == day:
+            intervals[-1]['end'] = day + timedelta(days=1)
+        else:
+            intervals.append({"start": day, "end": day + timedelta(days=1)})
+
+    return intervals
+
+def build_availability_doc(listing_id):
+    """Build the availability document for a listing from its bookings and calendar"""
+    listing_id = ObjectId(listing_id)
+    today = to_night(datetime.utcnow())
+
+    listing = mongo.db.listings.find_one({"_id": listing_id}, {"availability_calendar": 1})
+
+    bookings = mongo.db.bookings.find(
+        {
+            "listing_id": listing_id,
+            "listing_type": {"$ne": "experience"},
+            "status": {"$in": ACTIVE_BOOKING_STATUSES},
+            "check_out": {"$gt": today}
+        },
+        {"check_in": 1, "check_out": 1, "status": 1, "created_at": 1}
+    ).sort("check_in", 1)
+
+    reservations = OccupiedIntervals()
+    for booking in bookings:
+        interval = {
+            "start": to_night(booking['check_in']),
+            "end": to_night(booking['check_out']),
+            "booking_id": booking['_id']
+        }
+        if booking['status'] == 'pending' and booking.get('created_at'):
+            interval['held_until'] = pending_hold_deadline(booking['created_at'])
+        if not reservations.add(interval):
+            print(f"⚠️ Booking {booking['_id']} overlaps an earlier booking on listing {listing_id}")
+
+    blocked = blocked_intervals_from_calendar((listing or {}).get('availability_calendar'))
+
+    return {
+        "_id": listing_id,
+        "reservations": reservations.to_list(),
+        "blocked": [interval for interval in blocked if interval['end'] > today],
+        "version": 0,
+        "updated_at": datetime.utcnow()
+    }
+
+def get_availability_doc(listing_id):
+    """Load a listing's availability document, building it on first use"""
+    doc = mongo.db.listing_availability.find_one({"_id": ObjectId(listing_id)})
+    if doc:
+        return doc
+
+    doc = build_availability_doc(listing_id)
+    try:
+        mongo.db.listing_availability.insert_one(doc)
+    except DuplicateKeyError:
+        # Another request built it first
+        doc = mongo.db.listing_availability.find_one({"_id": ObjectId(listing_id)})
+
+    return doc
+
+def _compare_and_swap(doc, update_fields):
+    """Write fields only if nobody else changed the document since it was read"""
+    result = mongo.db.listing_availability.update_one(
+        {"_id": doc['_id'], "version": doc['version']},
+        {
+            "$set": {**update_fields, "updated_at": datetime.utcnow()},
+            "$inc": {"version": 1}
+        }
+    )
+    return result.modified_count == 1
+
+def is_available(listing_id, check_in, check_out):
+    """Check whether every night in [check_in, check_out) is free"""
+    start, end = to_night(check_in), to_night(check_out)
+    doc = get_availability_doc(listing_id)
+    now = datetime.utcnow()
+
+    if OccupiedIntervals(doc.get('blocked')).overlaps(start, end):
+        return False
+    return all(
+        _hold_lapsed(interval, now)
+        for interval in OccupiedIntervals(doc.get('reservations')).overlapping(start, end)
+    )
+
+def _reclaim(conflicts, now):
+    """True if every conflicting interval belongs to a lapsed or inactive booking
+
+    Lapsed pending bookings are marked expired, so a late payment can't
+    confirm them after their nights went to someone else.
+    """
+    booking_ids = [interval['booking_id'] for interval in conflicts]
+    bookings = {
+        booking['_id']: booking
+        for booking in mongo.db.bookings.find({"_id": {"$in": booking_ids}}, {"status": 1})
+    }
+
+    for interval in conflicts:
+        status = bookings.get(interval['booking_id'], {}).get('status')
+        if status == 'confirmed':
+            return False
+        if status == 'pending' and not _hold_lapsed(interval, now):
+            return False
+        # A missing booking may simply not be inserted yet (nights are
+        # reserved first), so its nights are kept until they are orphaned
+        if status is None and not (_hold_lapsed(interval, now) or _orphaned(interval, now)):
+            return False
+        if status == 'pending':
+            expired = mongo.db.bookings.update_one(
+                {"_id": interval['booking_id'], "status": "pending"},
+                {"$set": {"status": "expired", "expired_at": now, "updated_at": now}}
+            )
+            if not expired.modified_count:
+                # Paid in the meantime
+                return False
+            print(f"⌛ Expired unpaid booking {interval['booking_id']}")
+
+    return True
+
+def reserve_nights(listing_id, check_in, check_out, booking_id, pending=True):
+    """Atomically hold [check_in, check_out) for a booking
+
+    Returns True when the nights were reserved, False when any of them is
+    already booked or blocked. Nights held for a pending booking lapse
+    after PENDING_BOOKING_HOLD_MINUTES unless confirm_nights is called.
+    """
+    start, end = to_night(check_in), to_night(check_out)
+
+    for _ in range(MAX_RESERVATION_ATTEMPTS):
+        doc = get_availability_doc(listing_id)
+        now = datetime.utcnow()
+
+        if OccupiedIntervals(doc.get('blocked')).overlaps(start, end):
+            return False
+
+        reservations = OccupiedIntervals(doc.get('reservations'))
+        reservations.prune_before(to_night(now))
+
+        conflicts = reservations.overlapping(start, end)
+        if conflicts:
+            if not _reclaim(conflicts, now):
+                return False
+            for interval in conflicts:
+                reservations.remove(interval['booking_id'])
+
+        interval = {"start": start, "end": end, "booking_id": ObjectId(booking_id), "reserved_at": now}
+        if pending:
+            interval['held_until'] = pending_hold_deadline(now)
+        reservations.add(interval)
+
+        if _compare_and_swap(doc, {"reservations": reservations.to_list()}):
+            return True
+
+    raise AvailabilityConflictError("Could not reserve dates due to concurrent bookings, please retry")
+
+def confirm_nights(listing_id, booking_id):
+    """Make a paid booking's hold permanent; returns False if it holds no nights"""
+    for _ in range(MAX_RESERVATION_ATTEMPTS):
+        doc = mongo.db.listing_availability.find_one({"_id": ObjectId(listing_id)})
+        if not doc:
+            return False
+
+        reservations = doc.get('reservations') or []
+        held = next(
+            (interval for interval in reservations if interval.get('booking_id') == ObjectId(booking_id)),
+            None
+        )
+        if not held:
+            return False
+        if 'held_until' not in held:
+            return True
+
+        held.pop('held_until')
+        if _compare_and_swap(doc, {"reservations": reservations}):
+            return True
+
+    raise AvailabilityConflictError("Could not confirm dates due to concurrent bookings, please retry")
+
+def release_nights(listing_id, booking_id):
+    """Free the nights held by a booking (e.g. after cancellation)"""
+    for _ in range(MAX_RESERVATION_ATTEMPTS):
+        doc = mongo.db.listing_availability.find_one({"_id": ObjectId(listing_id)})
+        if not doc:
+            return False
+
+        reservations = OccupiedIntervals(doc.get('reservations'))
+        if not reservations.remove(ObjectId(booking_id)):
+            return False
+
+        if _compare_and_swap(doc, {"reservations": reservations.to_list()}):
+            return True
+
+    raise AvailabilityConflictError("Could not release dates due to concurrent bookings, please retry")
+
+def reconcile_nights(listing_id):
+    """Rebuild a listing's reservations and blocked nights from the source of truth
+
+    Nights held by bookings that are no longer active, or by bookings that
+    were never inserted, are dropped. Reservations still waiting for their
+    booking insert are kept. Returns the number of reservations dropped.
+    """
+    for _ in range(MAX_RESERVATION_ATTEMPTS):
+        doc = get_availability_doc(listing_id)
+        rebuilt = build_availability_doc(listing_id)
+        now = datetime.utcnow()
+
+        reservations = OccupiedIntervals(rebuilt['reservations'])
+        active_ids = {interval['booking_id'] for interval in rebuilt['reservations']}
+        candidates = [
+            interval for interval in doc.get('reservations') or []
+            if interval.get('booking_id') not in active_ids and not _orphaned(interval, now)
+        ]
+        inserted_ids = {
+            booking['_id'] for booking in mongo.db.bookings.find(
+                {"_id": {"$in": [interval['booking_id'] for interval in candidates]}}, {"_id": 1}
+            )
+        } if candidates else set()
+        for interval in candidates:
+            if interval['booking_id'] not in inserted_ids:
+                reservations.add(interval)
+
+        if _compare_and_swap(doc, {"reservations": reservations.to_list(), "blocked": rebuilt['blocked']}):
+            kept_ids = {interval['booking_id'] for interval in reservations.to_list()}
+            return len({interval.get('booking_id') for interval in doc.get('reservations') or []} - kept_ids)
+
+    raise AvailabilityConflictError("Could not reconcile availability due to concurrent bookings, please retry")
+
+def sync_blocked_nights(listing_id, availability_calendar):
+    """Rebuild the blocked intervals after the host edits the availability calendar"""
+    today = to_night(datetime.utcnow())
+    blocked = [
+        interval for interval in blocked_intervals_from_calendar(availability_calendar)
+        if interval['end'] > today
+    ]
+
+    for _ in range(MAX_RESERVATION_ATTEMPTS):
+        doc = get_availability_doc(listing_id)
+        if _compare_and_swap(doc, {"blocked": blocked}):
+            return True
+
+    raise AvailabilityConflictError("Could not update availability due to concurrent bookings, please retry")
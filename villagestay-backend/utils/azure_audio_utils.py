@@ -1,24 +1,10 @@
 import requests
-from openai import AzureOpenAI
 import json
-import tempfile
-import os
-import base64
-from pydub import AudioSegment
 import io
 from config import Config
-
-# Initialize Azure OpenAI Client
-azure_client = None
-try:
-    azure_client = AzureOpenAI(
-        api_key=Config.AZURE_GPT_API_KEY,
-        api_version=Config.AZURE_GPT_API_VERSION,
-        azure_endpoint=Config.AZURE_GPT_ENDPOINT
-    )
-    print("✅ Azure OpenAI client initialized successfully")
-except Exception as e:
-    print(f"❌ Failed to initialize Azure OpenAI client: {e}")
+from utils.audio_ingest import prepare_speech_audio
+from utils.service_registry import get_service, is_service_available, ServiceUnavailableError
+from utils.structured_output import extract_json, StructuredOutputError
 
 def transcribe_audio_azure_whisper(audio_data, language="auto"):
     """
@@ -27,85 +13,59 @@ def transcribe_audio_azure_whisper(audio_data, language="auto"):
     try:
         print(f"🎵 Starting Azure Whisper transcription for language: {language}")
         
-        # Create temporary file for audio
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
-            # Decode base64 audio data if needed
-            if isinstance(audio_data, str):
-                audio_bytes = base64.b64decode(audio_data)
-            else:
-                audio_bytes = audio_data
-            
-            print(f"🎵 Processing {len(audio_bytes)} bytes of audio data")
-            
-            # Convert webm to wav using pydub
-            try:
-                audio = AudioSegment.from_file(io.BytesIO(audio_bytes))
-                # Ensure proper format for Whisper (16kHz, mono)
-                audio = audio.set_frame_rate(16000).set_channels(1)
-                audio.export(temp_file.name, format="wav")
-                print(f"🔄 Converted audio to WAV format: {temp_file.name}")
-            except Exception as conversion_error:
-                print(f"❌ Audio conversion error: {conversion_error}")
-                # Write raw audio data if conversion fails
-                temp_file.write(audio_bytes)
-                temp_file.flush()
-            
-            # Map language codes for Azure Whisper
-            azure_language = get_azure_language_code(language)
-            
-            # Prepare API request
-            with open(temp_file.name, "rb") as audio_file:
-                files = {
-                    "file": (temp_file.name, audio_file, "audio/wav"),
-                }
-                data = {
-                    "language": azure_language,
-                    "response_format": "text"
-                }
-                headers = {
-                    "api-key": Config.AZURE_WHISPER_API_KEY,
-                }
+        # Decode + transcode to 16kHz mono WAV in memory (no temp files)
+        wav_bytes = prepare_speech_audio(audio_data)
+        print(f"🎵 Uploading {len(wav_bytes)} bytes of 16kHz mono WAV")
+        
+        # Map language codes for Azure Whisper
+        azure_language = get_azure_language_code(language)
+        
+        # Prepare API request
+        files = {
+            "file": ("audio.wav", io.BytesIO(wav_bytes), "audio/wav"),
+        }
+        data = {
+            "language": azure_language,
+            "response_format": "text"
+        }
+        headers = {
+            "api-key": Config.AZURE_WHISPER_API_KEY,
+        }
 
-                url = f"{Config.AZURE_WHISPER_ENDPOINT}?api-version={Config.AZURE_WHISPER_API_VERSION}"
-                
-                print(f"🎤 Calling Azure Whisper API (language: {azure_language})")
-                print(f"📡 URL: {url}")
-                
-                response = requests.post(url, headers=headers, data=data, files=files)
+        url = f"{Config.AZURE_WHISPER_ENDPOINT}?api-version={Config.AZURE_WHISPER_API_VERSION}"
+        
+        print(f"🎤 Calling Azure Whisper API (language: {azure_language})")
+        print(f"📡 URL: {url}")
+        
+        response = requests.post(url, headers=headers, data=data, files=files)
 
-                if response.status_code == 200:
-                    transcribed_text = response.text.strip()
-                    print(f"✅ Azure Whisper transcription successful!")
-                    print(f"📝 Result: {transcribed_text}")
-                    
-                    # Cleanup
-                    os.unlink(temp_file.name)
-                    
-                    return {
-                        "text": transcribed_text,
-                        "language": language,
-                        "confidence": 0.95
-                    }
-                else:
-                    error_msg = f"Azure Whisper Error {response.status_code}: {response.text}"
-                    print(f"❌ {error_msg}")
-                    # Cleanup
-                    os.unlink(temp_file.name)
-                    raise Exception(error_msg)
+        if response.status_code == 200:
+            transcribed_text = response.text.strip()
+            print(f"✅ Azure Whisper transcription successful!")
+            print(f"📝 Result: {transcribed_text}")
+            
+            return {
+                "text": transcribed_text,
+                "language": language,
+                "confidence": 0.95
+            }
+        else:
+            error_msg = f"Azure Whisper Error {response.status_code}: {response.text}"
+            print(f"❌ {error_msg}")
+            raise Exception(error_msg)
                     
     except Exception as e:
         print(f"❌ Azure Whisper transcription error: {e}")
-        # Cleanup on error
-        if 'temp_file' in locals() and os.path.exists(temp_file.name):
-            os.unlink(temp_file.name)
         raise Exception(f"Azure audio transcription failed: {str(e)}")
 
 def enhance_listing_with_azure_gpt(transcribed_text, language):
     """
     Use Azure GPT-4o to enhance the transcribed text into a professional listing
     """
-    if not azure_client:
-        raise Exception("Azure OpenAI client not available")
+    try:
+        azure_client = get_service("azure_openai")
+    except ServiceUnavailableError as e:
+        raise Exception(f"Azure OpenAI client not available: {e}")
     
     try:
         system_prompt = """
@@ -156,19 +116,17 @@ def enhance_listing_with_azure_gpt(transcribed_text, language):
             max_tokens=2048,
             temperature=0.7,
             top_p=1.0,
-            model=Config.AZURE_GPT_DEPLOYMENT
+            model=Config.AZURE_GPT_DEPLOYMENT,
+            response_format={"type": "json_object"}
         )
 
         gpt_response = response.choices[0].message.content
         print(f"✅ Azure GPT-4o enhancement successful")
         print(f"📝 Response: {gpt_response[:200]}...")
         
-        # Extract JSON from response
-        import re
-        json_match = re.search(r'\{.*\}', gpt_response, re.DOTALL)
-        if json_match:
-            return json.loads(json_match.group())
-        else:
+        try:
+            return extract_json(gpt_response, expect='object')
+        except StructuredOutputError:
             print("⚠️ No valid JSON found in GPT response, using fallback")
             return create_fallback_listing_data(transcribed_text, language)
             
@@ -229,7 +187,7 @@ def test_azure_transcription():
     print("🧪 Testing Azure transcription setup...")
     
     # Test Azure OpenAI client
-    if azure_client:
+    if is_service_available("azure_openai"):
         print("✅ Azure OpenAI client available")
     else:
         print("❌ Azure OpenAI client not available")
@@ -0,0 +1,194 @@
+# villagestay-backend/utils/chunked_transcription.py
+#
+# Long-audio transcription. A speech-ready clip (16 kHz mono PCM WAV, see
+# utils/audio_ingest.py) is split on silence into segments that fit a single
+# synchronous recognize call, the segments are transcribed concurrently by a
+# bounded pool, and the results are stitched back in order with a
+# duration-weighted confidence. Latency therefore tracks the longest segment
+# rather than the length of the clip.
+#
+# The speech backend is any callable `(wav_bytes, language) -> {"text", "confidence"}`;
+# FakeSpeechBackend runs everything locally for tests.
+
+import sys
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from utils.audio_ingest import TARGET_SAMPLE_RATE, TARGET_SAMPLE_WIDTH, wav_to_pcm, pcm_to_wav
+
+FRAME_MS = 30
+MIN_SILENCE_MS = 400
+MIN_SEGMENT_MS = 5000
+SILENCE_RATIO = 0.1  # frames quieter than this fraction of the clip's speech level are silence
+SILENCE_FLOOR = 100  # peak amplitude (of 32767) that always counts as silence
+SPEECH_LEVEL_PERCENTILE = 0.9
+
+SAMPLES_PER_FRAME = TARGET_SAMPLE_RATE * FRAME_MS // 1000
+
+_segment_executor = ThreadPoolExecutor(
+    max_workers=Config.SPEECH_TRANSCRIPTION_WORKERS,
+    thread_name_prefix="speech-segment"
+)
+
+def frame_peaks(pcm):
+    """Peak amplitude of each FRAME_MS frame of 16-bit PCM"""
+    samples = array('h')
+    samples.frombytes(pcm[:len(pcm) - len(pcm) % TARGET_SAMPLE_WIDTH])
+    if sys.byteorder == 'big':
+        samples.byteswap()
+
+    peaks = []
+    for offset in range(0, len(samples), SAMPLES_PER_FRAME):
+        frame = samples[offset:offset + SAMPLES_PER_FRAME]
+        peaks.append(max(max(frame), -min(frame)))
+    return peaks
+
+def silence_threshold(peaks):
+    """Silence threshold relative to the clip's level
+
+    The level is a high percentile of the frame peaks, so quiet phone
+    recordings and loud, noisy ones both split on their own pauses.
+    """
+    if not peaks:
+        return SILENCE_FLOOR
+
+    level = sorted(peaks)[min(len(peaks) - 1, int(len(peaks) * SPEECH_LEVEL_PERCENTILE))]
+    return max(SILENCE_FLOOR, int(level * SILENCE_RATIO))
+
+def _silence_cut_points(peaks, min_silence_frames, threshold):
+    """Midpoints of every silent run long enough to split on"""
+    cuts = []
+    run_start = None
+
+    for index, peak in enumerate(peaks + [threshold]):
+        if peak < threshold:
+            if run_start is None:
+                run_start = index
+        elif run_start is not None:
+            if index - run_start >= min_silence_frames:
+                cuts.append((run_start + index) // 2)
+            run_start = None
+
+    return cuts
+
+def split_on_silence(pcm, max_segment_ms=None, min_segment_ms=MIN_SEGMENT_MS,
+                     min_silence_ms=MIN_SILENCE_MS, threshold=None):
+    """Split PCM into (start_ms, end_ms) segments, cutting inside pauses
+
+    Each segment is as long as possible without exceeding max_segment_ms,
+    ending at the last pause that fits. Speech with no usable pause is cut
+    hard at the limit. Segments that are silent throughout are dropped.
+    Without an explicit threshold, silence is judged relative to the clip.
+    """
+    max_segment_ms = max_segment_ms or Config.SPEECH_SEGMENT_MAX_SECONDS * 1000
+
+    peaks = frame_peaks(pcm)
+    if threshold is None:
+        threshold = silence_threshold(peaks)
+    total_frames = len(peaks)
+    max_frames = max(1, max_segment_ms // FRAME_MS)
+    min_frames = min(max_frames, min_segment_ms // FRAME_MS)
+
+    cuts = _silence_cut_points(peaks, max(1, min_silence_ms // FRAME_MS), threshold)
+
+    boundaries = []
+    start = 0
+    cut_index = 0
+    while total_frames - start > max_frames:
+        best = None
+        while cut_index < len(cuts) and cuts[cut_index] - start <= max_frames:
+            if cuts[cut_index] - start >= min_frames:
+                best = cuts[cut_index]
+            cut_index += 1
+
+        end = best if best is not None else start + max_frames
+        boundaries.append((start, end))
+        start = end
+    boundaries.append((start, total_frames))
+
+    return [
+        (start * FRAME_MS, end * FRAME_MS)
+        for start, end in boundaries
+        if end > start and max(peaks[start:end]) >= threshold
+    ]
+
+def _pcm_slice(pcm, start_ms, end_ms):
+    bytes_per_ms = TARGET_SAMPLE_RATE * TARGET_SAMPLE_WIDTH // 1000
+    return pcm[start_ms * bytes_per_ms:end_ms * bytes_per_ms]
+
+def stitch_segments(segment_results):
+    """Join segment transcripts in order and average confidence by duration"""
+    spoken = [segment for segment in segment_results if segment['text']]
+    text = " ".join(segment['text'] for segment in spoken)
+
+    total_ms = sum(segment['end_ms'] - segment['start_ms'] for segment in spoken)
+    if total_ms:
+        confidence = sum(
+            segment['confidence'] * (segment['end_ms'] - segment['start_ms']) for segment in spoken
+        ) / total_ms
+    else:
+        confidence = 0.0
+
+    return text, confidence
+
+def transcribe_long_audio(wav_bytes, language, transcribe_segment):
+    """Transcribe a speech-ready WAV of any length with a segment backend"""
+    pcm = wav_to_pcm(wav_bytes)
+    segments = split_on_silence(pcm)
+
+    if not segments:
+        raise Exception("No speech detected in audio")
+
+    print(f"✂️ Split {len(pcm) // (TARGET_SAMPLE_RATE * TARGET_SAMPLE_WIDTH)}s of audio into {len(segments)} segment(s)")
+
+    def run(segment):
+        start_ms, end_ms = segment
+        result = transcribe_segment(pcm_to_wav(_pcm_slice(pcm, start_ms, end_ms)), language)
+        return {
+            "start_ms": start_ms,
+            "end_ms": end_ms,
+            "text": (result.get('text') or "").strip(),
+            "confidence": result.get('confidence', 0.0)
+        }
+
+    if len(segments) == 1:
+        segment_results = [run(segments[0])]
+    else:
+        # map() keeps segment order and re-raises the first segment failure
+        segment_results = list(_segment_executor.map(run, segments))
+
+    text, confidence = stitch_segments(segment_results)
+    if not text:
+        raise Exception("Empty transcription result")
+
+    return {
+        "text": text,
+        "language": language,
+        "confidence": confidence,
+        "segments": segment_results
+    }
+
+class FakeSpeechBackend:
+    """Offline segment backend for tests and local runs
+
+    Describes each segment instead of recognizing it, after an optional delay
+    that stands in for API latency. Calls are recorded for assertions.
+    """
+
+    def __init__(self, confidence=0.9, delay=0):
+        self.confidence = confidence
+        self.delay = delay
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, wav_bytes, language):
+        duration = len(wav_to_pcm(wav_bytes)) / (TARGET_SAMPLE_RATE * TARGET_SAMPLE_WIDTH)
+        with self._lock:
+            self.calls.append({"language": language, "duration": duration})
+
+        if self.delay:
+            time.sleep(self.delay)
+
+        return {"text": f"[{duration:.1f}s of {language} speech]", "confidence": self.confidence}
@@ -0,0 +1,183 @@
+# villagestay-backend/utils/concierge_memory.py
+#
+# Conversation memory for the cultural concierge. Each chat session has one
+# `concierge_sessions` document holding a rolling summary of older turns plus
+# the last few turns verbatim, so the prompt stays a bounded size however long
+# the conversation runs. Turns that fall out of the recent window are folded
+# into the summary by a background Gemini call after the response is sent,
+# in batches of FOLD_BATCH_TURNS so a long chat costs one Gemini call per few
+# turns rather than one per turn.
+
+import threading
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from database import mongo
+
+RECENT_TURNS = 4           # turns quoted verbatim in the prompt
+FOLD_BATCH_TURNS = 4       # overflow turns collected before one summary call
+MAX_STORED_TURNS = 12      # hard cap if summarization keeps failing
+MAX_TURN_CHARS = 1200      # per message/response, when quoted in the prompt
+MAX_SUMMARY_WORDS = 150
+
+def _session_key(user_id, session_id):
+    return f"{user_id}:{session_id}"
+
+_folding = set()
+_folding_lock = threading.Lock()
+
+def _legacy_state(user_id, session_id, limit=RECENT_TURNS):
+    """Seed state for sessions that started before session documents existed"""
+    records = list(mongo.db.concierge_conversations.find(
+        {"session_id": session_id, "user_id": ObjectId(user_id)},
+        {"message": 1, "response": 1, "created_at": 1}
+    ).sort("created_at", -1).limit(limit))
+
+    return {
+        "summary": "",
+        "recent_turns": [
+            {"user": record.get('message', ''), "assistant": record.get('response', ''), "at": record.get('created_at')}
+            for record in reversed(records)
+        ]
+    }
+
+def get_conversation_state(user_id, session_id):
+    """Rolling summary and recent turns for a session (empty for a new one)"""
+    if not session_id:
+        return {"summary": "", "recent_turns": []}
+
+    state = mongo.db.concierge_sessions.find_one(
+        {"_id": _session_key(user_id, session_id)},
+        {"summary": 1, "recent_turns": {"$slice": -RECENT_TURNS}}
+    )
+    if state:
+        return state
+
+    return _legacy_state(user_id, session_id)
+
+def _clip(text):
+    text = (text or '').strip()
+    return text if len(text) <= MAX_TURN_CHARS else text[:MAX_TURN_CHARS].rsplit(' ', 1)[0] + " …"
+
+def format_conversation_state(state):
+    """Render conversation state for the concierge prompt"""
+    summary = (state or {}).get('summary')
+    turns = (state or {}).get('recent_turns') or []
+
+    if not summary and not turns:
+        return "No previous conversation."
+
+    sections = []
+    if summary:
+        sections.append(f"Summary of earlier conversation: {summary}")
+    for turn in turns[-RECENT_TURNS:]:
+        sections.append(f"User: {_clip(turn.get('user'))}")
+        sections.append(f"Assistant: {_clip(turn.get('assistant'))}")
+
+    return "\n".join(sections)
+
+def record_concierge_turn(user_id, session_id, message, response):
+    """Append a turn to the session and fold overflow into the summary in the background"""
+    if not session_id:
+        return
+
+    key = _session_key(user_id, session_id)
+    turn = {"user": message, "assistant": response, "at": datetime.utcnow()}
+
+    state = _push_turn(key, turn)
+    if state is None:
+        _seed_session(key, user_id, session_id, turn)
+        state = _push_turn(key, turn)
+
+    # Summarize off the request path once a batch of turns has overflowed
+    if len(state.get('recent_turns', [])) >= RECENT_TURNS + FOLD_BATCH_TURNS:
+        with _folding_lock:
+            if key in _folding:
+                return
+            _folding.add(key)
+        threading.Thread(target=fold_old_turns, args=(key,), daemon=True).start()
+
+def _push_turn(key, turn):
+    return mongo.db.concierge_sessions.find_one_and_update(
+        {"_id": key},
+        {
+            "$push": {"recent_turns": {"$each": [turn], "$slice": -MAX_STORED_TURNS}},
+            "$inc": {"turn_count": 1, "version": 1},
+            "$set": {"updated_at": turn['at']}
+        },
+        projection={"recent_turns.at": 1},
+        return_document=ReturnDocument.AFTER
+    )
+
+def _seed_session(key, user_id, session_id, turn):
+    """Create the session document, carrying over turns from before session documents existed"""
+    seeded = _legacy_state(user_id, session_id, limit=RECENT_TURNS + 1)['recent_turns']
+    # This turn's conversation record is already saved; it gets pushed separately
+    if seeded and seeded[-1]['user'] == turn['user'] and seeded[-1]['assistant'] == turn['assistant']:
+        seeded.pop()
+    seeded = seeded[-RECENT_TURNS:]
+
+    try:
+        mongo.db.concierge_sessions.insert_one({
+            "_id": key,
+            "user_id": ObjectId(user_id),
+            "session_id": session_id,
+            "summary": "",
+            "recent_turns": seeded,
+            "turn_count": len(seeded),
+            "version": 0,
+            "created_at": turn['at'],
+            "updated_at": turn['at']
+        })
+    except DuplicateKeyError:
+        # Another request for the same session created it first
+        pass
+
+def fold_old_turns(key):
+    """Summarize turns older than the recent window into the rolling summary"""
+    from utils.ai_utils import call_gemini_api, PRIORITY_BACKGROUND
+
+    try:
+        state = mongo.db.concierge_sessions.find_one({"_id": key})
+        turns = (state or {}).get('recent_turns') or []
+        if len(turns) <= RECENT_TURNS:
+            return
+
+        overflow, keep = turns[:-RECENT_TURNS], turns[-RECENT_TURNS:]
+        transcript = "\n".join(
+            f"User: {_clip(turn.get('user'))}\nAssistant: {_clip(turn.get('assistant'))}" for turn in overflow
+        )
+
+        prompt = f"""
+        You maintain the running memory of a travel concierge chat about rural India.
+        Update the summary with the new exchanges. Keep the traveler's stated
+        preferences, destinations discussed, decisions made and open questions.
+        Drop pleasantries. At most {MAX_SUMMARY_WORDS} words, plain text.
+
+        Current summary: {state.get('summary') or 'None yet.'}
+
+        New exchanges:
+        {transcript}
+        """
+
+        summary = call_gemini_api(prompt, generation_config={"temperature": 0.3, "maxOutputTokens": 400},
+                                  priority=PRIORITY_BACKGROUND).strip()
+
+        # Compare-and-swap on version: if another turn landed meanwhile, leave
+        # the fold to a later turn's background pass
+        result = mongo.db.concierge_sessions.update_one(
+            {"_id": key, "version": state['version']},
+            {
+                "$set": {"summary": summary, "recent_turns": keep, "summarized_at": datetime.utcnow()},
+                "$inc": {"summarized_turns": len(overflow), "version": 1}
+            }
+        )
+        if result.modified_count:
+            print(f"🧠 Folded {len(overflow)} concierge turns into summary for {key}")
+
+    except Exception as e:
+        print(f"❌ Concierge summary error for {key}: {e}")
+    finally:
+        with _folding_lock:
+            _folding.discard(key)
@@ -0,0 +1,205 @@
+# villagestay-backend/utils/gemini_scheduler.py
+#
+# Outbound rate limiting for the shared GEMINI_API_KEY. Every Gemini request
+# takes a token from a per-process token bucket first; callers queue by
+# priority (interactive search and chat ahead of listing generation, ahead of
+# background jobs) and give up at a deadline instead of failing on the first
+# 429 (a 429 that does get through empties the bucket and the request queues
+# again). Lower classes also leave a reserve in the bucket, so a translation or
+# video backlog can't spend the tokens an interactive request is about to need.
+#
+# With GEMINI_SHARED_QUOTA enabled, each request also counts against a
+# per-minute window in Mongo, so several workers stay under one quota.
+
+import heapq
+import itertools
+import threading
+import time
+from datetime import datetime
+from pymongo import ASCENDING, ReturnDocument
+from config import Config
+from database import mongo
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_LISTING = 1
+PRIORITY_BACKGROUND = 2
+
+# Fraction of the bucket a class must leave for the classes above it
+PRIORITY_RESERVE = {
+    PRIORITY_INTERACTIVE: 0.0,
+    PRIORITY_LISTING: 0.1,
+    PRIORITY_BACKGROUND: 0.3,
+}
+
+# Seconds a request may queue before it fails, by class
+DEFAULT_DEADLINES = {
+    PRIORITY_INTERACTIVE: 15,
+    PRIORITY_LISTING: 60,
+    PRIORITY_BACKGROUND: 600,
+}
+
+QUOTA_COLLECTION = "gemini_quota_windows"
+QUOTA_WINDOW_SECONDS = 60
+
+class GeminiQuotaError(Exception):
+    """Raised when a request can't get a Gemini slot before its deadline"""
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+class GeminiScheduler:
+    """Priority queue in front of a token bucket"""
+
+    def __init__(self, requests_per_minute, burst, shared=False):
+        self.requests_per_minute = requests_per_minute
+        self.rate = requests_per_minute / 60.0
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.shared = shared
+
+        self.condition = threading.Condition()
+        self.waiters = []
+        self._sequence = itertools.count()
+        self._index_ready = False
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _tokens_needed(self, priority):
+        return 1 + self.capacity * PRIORITY_RESERVE[priority]
+
+    def acquire(self, priority=PRIORITY_INTERACTIVE, deadline=None):
+        """Block until this request may call Gemini, or raise GeminiQuotaError"""
+        if deadline is None:
+            deadline = DEFAULT_DEADLINES[priority]
+        expires = time.monotonic() + deadline
+        started = time.monotonic()
+
+        with self.condition:
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self.waiters, ticket)
+            try:
+                while True:
+                    self._refill()
+                    # Strict priority order: only the head of the queue may take a token
+                    if self.waiters[0] == ticket and self.tokens >= self._tokens_needed(priority):
+                        heapq.heappop(self.waiters)
+                        self.tokens -= 1
+                        break
+
+                    remaining = expires - time.monotonic()
+                    if remaining <= 0:
+                        raise GeminiQuotaError(f"Gemini rate limit: no slot within {deadline}s")
+
+                    shortfall = max(self._tokens_needed(priority) - self.tokens, 0)
+                    self.condition.wait(min(remaining, max(shortfall / self.rate, 0.01)))
+            except BaseException:
+                if ticket in self.waiters:
+                    self.waiters.remove(ticket)
+                    heapq.heapify(self.waiters)
+                raise
+            finally:
+                # The head changed either way; let the next waiter re-check
+                self.condition.notify_all()
+
+        waited = time.monotonic() - started
+        if waited > 1:
+            print(f"⏳ Gemini request (priority {priority}) queued {waited:.1f}s")
+
+        if self.shared:
+            self._acquire_shared(expires, deadline)
+
+    def _ensure_quota_index(self):
+        if not self._index_ready:
+            mongo.db[QUOTA_COLLECTION].create_index(
+                [("expires_at", ASCENDING)],
+                name="expires_at_ttl",
+                expireAfterSeconds=0
+            )
+            self._index_ready = True
+
+    def _acquire_shared(self, expires, deadline):
+        """Count the request against the cross-worker per-minute window"""
+        while True:
+            now = time.time()
+            window = int(now // QUOTA_WINDOW_SECONDS)
+
+            try:
+                self._ensure_quota_index()
+                counter = mongo.db[QUOTA_COLLECTION].find_one_and_update(
+                    {"_id": f"gemini:{window}"},
+                    {
+                        "$inc": {"count": 1},
+                        "$setOnInsert": {
+                            "expires_at": datetime.utcfromtimestamp((window + 2) * QUOTA_WINDOW_SECONDS)
+                        }
+                    },
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER
+                )
+            except Exception as e:
+                # Fail open: the local bucket still limits this worker
+                print(f"⚠️ Shared Gemini quota unavailable: {e}")
+                return
+
+            if counter['count'] <= self.requests_per_minute:
+                return
+
+            wait = (window + 1) * QUOTA_WINDOW_SECONDS - now
+            if time.monotonic() + wait > expires:
+                raise GeminiQuotaError(f"Gemini rate limit: shared quota exhausted for the next {deadline}s")
+            time.sleep(wait)
+
+    def send(self, request, priority=PRIORITY_INTERACTIVE, deadline=None):
+        """Run request() (returning a requests.Response) under the rate limit
+
+        A 429 from Gemini backs the bucket off and the request queues again,
+        until its deadline passes; then GeminiQuotaError is raised.
+        """
+        if deadline is None:
+            deadline = DEFAULT_DEADLINES[priority]
+        expires = time.monotonic() + deadline
+
+        throttled = False
+        while True:
+            try:
+                self.acquire(priority, max(expires - time.monotonic(), 0))
+            except GeminiQuotaError:
+                if throttled:
+                    raise GeminiQuotaError(f"Gemini rate limit: still throttled after {deadline}s")
+                raise
+
+            response = request()
+            if response.status_code != 429:
+                return response
+
+            throttled = True
+            self.back_off(_retry_after(response))
+            print(f"⏳ Gemini answered 429, requeueing (priority {priority})")
+
+    def back_off(self, retry_after=None):
+        """Empty the bucket after Gemini itself answered 429
+
+        With a Retry-After, the bucket goes into debt for that long, so every
+        waiter holds off instead of only this request.
+        """
+        with self.condition:
+            self._refill()
+            self.tokens = min(self.tokens, -(retry_after or 0) * self.rate)
+
+    def stats(self):
+        with self.condition:
+            self._refill()
+            return {"tokens": round(self.tokens, 2), "queued": len(self.waiters)}
+
+gemini_scheduler = GeminiScheduler(
+    Config.GEMINI_REQUESTS_PER_MINUTE,
+    Config.GEMINI_BURST,
+    shared=Config.GEMINI_SHARED_QUOTA
+)
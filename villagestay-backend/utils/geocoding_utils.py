@@ -1,10 +1,7 @@
-import googlemaps
 import requests
 from config import Config
 import logging
-
-# Initialize Google Maps client
-gmaps = googlemaps.Client(key=Config.GOOGLE_PLACES_API_KEY)
+from utils.service_registry import get_service
 
 def get_coordinates_from_location(location_text):
     """
@@ -12,7 +9,7 @@ def get_coordinates_from_location(location_text):
     """
     try:
         # Use Google Maps Geocoding API
-        geocode_result = gmaps.geocode(location_text)
+        geocode_result = get_service("google_maps").geocode(location_text)
         
         if not geocode_result:
             raise Exception(f"No results found for location: {location_text}")
@@ -54,7 +51,7 @@ def get_location_suggestions(query, limit=6):
     """
     try:
         # Use Google Places Autocomplete
-        predictions = gmaps.places_autocomplete(
+        predictions = get_service("google_maps").places_autocomplete(
             input_text=query,
             types=['(regions)'],  # Focus on regions, cities, etc.
             components={'country': 'in'},  # Restrict to India
@@ -84,7 +81,7 @@ def get_place_details(place_id):
     """
     try:
         # Get place details with correct field names
-        place_result = gmaps.place(
+        place_result = get_service("google_maps").place(
             place_id=place_id,
             fields=[
                 'name', 
@@ -127,7 +124,7 @@ def reverse_geocode(lat, lng):
     Get address from coordinates using reverse geocoding
     """
     try:
-        reverse_geocode_result = gmaps.reverse_geocode((lat, lng))
+        reverse_geocode_result = get_service("google_maps").reverse_geocode((lat, lng))
         
         if not reverse_geocode_result:
             raise Exception(f"No address found for coordinates: {lat}, {lng}")
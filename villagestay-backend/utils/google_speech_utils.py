@@ -1,105 +1,70 @@
-import io
-import base64
-import tempfile
-import os
-from google.cloud import speech
-from pydub import AudioSegment
 from config import Config
+from utils.audio_ingest import prepare_speech_audio
+from utils.chunked_transcription import transcribe_long_audio
+from utils.service_registry import get_service
 import json
 
-# Initialize Google Speech client
-speech_client = None
-try:
-    if Config.GOOGLE_APPLICATION_CREDENTIALS and Config.GOOGLE_CLOUD_PROJECT_ID:
-        os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = Config.GOOGLE_APPLICATION_CREDENTIALS
-        speech_client = speech.SpeechClient()
-    else:
-        raise Exception("Google Cloud credentials not configured")
-except Exception as e:
-    raise Exception(f"Failed to initialize Google Speech client: {e}")
-
 def transcribe_audio_google_speech(audio_data, language="auto"):
-    """Transcribe audio using Google Cloud Speech-to-Text API"""
-    
-    if not speech_client:
-        raise Exception("Google Speech-to-Text client not initialized")
+    """Transcribe audio of any length using Google Cloud Speech-to-Text API
+
+    Long clips are split on silence and the segments are recognized in
+    parallel (see utils/chunked_transcription.py).
+    """
     
     try:
-        # Decode base64 audio data
-        if isinstance(audio_data, str):
-            audio_bytes = base64.b64decode(audio_data)
-        else:
-            audio_bytes = audio_data
-        
-        # Convert audio to proper format
-        audio_content = convert_audio_for_google_speech(audio_bytes)
-        
-        # Map language codes
-        google_language = get_google_language_code(language)
-        
-        # Configure recognition with better settings
-        config = speech.RecognitionConfig(
-            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-            sample_rate_hertz=16000,
-            language_code=google_language,
-            enable_automatic_punctuation=True,
-            audio_channel_count=1,
-            model="latest_short"  # Better for short audio clips
-        )
+        # Fail before transcoding if the client can't be built
+        get_service("google_speech")
         
-        # Create audio object
-        audio = speech.RecognitionAudio(content=audio_content)
+        # Decode (raw bytes or base64) and convert audio to proper format
+        audio_content = convert_audio_for_google_speech(audio_data)
         
-        # Perform the transcription
-        response = speech_client.recognize(config=config, audio=audio)
-        
-        if not response.results:
-            raise Exception("No speech detected in audio")
-        
-        # Extract transcription
-        transcribed_text = ""
-        confidence_scores = []
-        
-        for result in response.results:
-            if result.alternatives:
-                alternative = result.alternatives[0]
-                transcribed_text += alternative.transcript + " "
-                if hasattr(alternative, 'confidence'):
-                    confidence_scores.append(alternative.confidence)
-        
-        transcribed_text = transcribed_text.strip()
-        avg_confidence = sum(confidence_scores) / len(confidence_scores) if confidence_scores else 0.9
-        
-        if not transcribed_text:
-            raise Exception("Empty transcription result")
-        
-        return {
-            "text": transcribed_text,
-            "language": language,
-            "confidence": avg_confidence
-        }
+        return transcribe_long_audio(audio_content, language, transcribe_segment_google_speech)
         
     except Exception as e:
         raise Exception(f"Google Speech transcription failed: {str(e)}")
 
+def transcribe_segment_google_speech(wav_bytes, language):
+    """Recognize one speech-ready segment (under a minute) with a synchronous call"""
+    from google.cloud import speech
+    
+    # Map language codes
+    google_language = get_google_language_code(language)
+    
+    # latest_long handles full sentences better; segments stay under the
+    # one-minute limit of synchronous recognition
+    config = speech.RecognitionConfig(
+        encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+        sample_rate_hertz=16000,
+        language_code=google_language,
+        enable_automatic_punctuation=True,
+        audio_channel_count=1,
+        model="latest_long"
+    )
+    
+    audio = speech.RecognitionAudio(content=wav_bytes)
+    response = get_service("google_speech").recognize(config=config, audio=audio)
+    
+    # Extract transcription (a silent segment simply yields no results)
+    transcripts = []
+    confidence_scores = []
+    
+    for result in response.results:
+        if result.alternatives:
+            alternative = result.alternatives[0]
+            transcripts.append(alternative.transcript.strip())
+            if hasattr(alternative, 'confidence'):
+                confidence_scores.append(alternative.confidence)
+    
+    return {
+        "text": " ".join(transcript for transcript in transcripts if transcript),
+        "confidence": sum(confidence_scores) / len(confidence_scores) if confidence_scores else 0.9
+    }
+
 def convert_audio_for_google_speech(audio_bytes):
-    """Convert audio to format required by Google Speech API"""
+    """Convert audio to format required by Google Speech API (16kHz, mono, 16-bit PCM)"""
     try:
-        # Create audio segment from bytes
-        audio = AudioSegment.from_file(io.BytesIO(audio_bytes))
-        
-        # Convert to required format: 16kHz, mono, 16-bit PCM
-        audio = audio.set_frame_rate(16000).set_channels(1).set_sample_width(2)
-        
-        # Normalize audio levels
-        audio = audio.normalize()
-        
-        # Export to bytes
-        output_buffer = io.BytesIO()
-        audio.export(output_buffer, format="wav")
-        
-        return output_buffer.getvalue()
-        
+        # No gain normalization: Google recommends sending unprocessed levels
+        return prepare_speech_audio(audio_bytes)
     except Exception as e:
         raise Exception(f"Audio conversion failed: {str(e)}")
 
@@ -121,7 +86,7 @@ def get_google_language_code(language):
 def enhance_listing_with_gemini(transcribed_text, language):
     """Use Gemini API to enhance transcribed text into professional listing"""
     try:
-        from utils.ai_utils import call_gemini_api
+        from utils.ai_utils import call_gemini_json, PRIORITY_LISTING
         
         prompt = f"""
         Convert this voice description into a professional rural homestay listing:
@@ -145,15 +110,12 @@ def enhance_listing_with_gemini(transcribed_text, language):
         Respond with valid JSON only.
         """
         
-        response = call_gemini_api(prompt)
-        
-        # Extract JSON from response
-        import re
-        json_match = re.search(r'\{.*\}', response, re.DOTALL)
-        if json_match:
-            return json.loads(json_match.group())
-        else:
-            raise Exception("Invalid JSON response from Gemini")
+        return call_gemini_json(
+            prompt,
+            expect='object',
+            generation_config={"maxOutputTokens": 2048},
+            priority=PRIORITY_LISTING
+        )
             
     except Exception as e:
         raise Exception(f"Gemini enhancement failed: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,135 @@
+# villagestay-backend/utils/llm_cache.py
+#
+# Content-addressed cache for Gemini responses. A response is keyed by the
+# model, the whitespace-normalized prompt and the generation config, so two
+# requests that would send Gemini the same thing share one answer. Entries live
+# in the `llm_response_cache` collection (expired by a TTL index) and the hot
+# ones are also kept in a small in-process LRU in front of Mongo.
+
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pymongo import ASCENDING
+from config import Config
+from database import mongo
+
+CACHE_COLLECTION = "llm_response_cache"
+
+# How long a cached answer stays valid, per endpoint (seconds)
+ENDPOINT_TTLS = {
+    "cultural_insights": 7 * 24 * 3600,
+    "sustainability_suggestions": 7 * 24 * 3600,
+    "experience_content": 24 * 3600,
+    "pricing_suggestion": 6 * 3600,
+}
+DEFAULT_TTL = 3600
+
+def normalize_prompt(prompt):
+    """Collapse the indentation and blank-line noise of f-string prompts"""
+    return re.sub(r'\s+', ' ', prompt or '').strip()
+
+def llm_cache_key(model, prompt, generation_config=None):
+    """sha256 over (model, normalized prompt, generation config)"""
+    payload = json.dumps(
+        {"model": model, "prompt": normalize_prompt(prompt), "config": generation_config or {}},
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class _LRUCache:
+    """Bounded, thread-safe key -> (response, expires_at) map"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            response, expires_at = entry
+            if expires_at <= datetime.utcnow():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return response
+
+    def put(self, key, response, expires_at):
+        with self.lock:
+            self.entries[key] = (response, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+_memory_cache = _LRUCache(Config.LLM_CACHE_MEMORY_ENTRIES)
+
+_index_ready = False
+_index_lock = threading.Lock()
+
+def _ensure_ttl_index():
+    """Create the TTL index once per process; Mongo then drops expired entries itself"""
+    global _index_ready
+    if _index_ready:
+        return
+    with _index_lock:
+        if not _index_ready:
+            mongo.db[CACHE_COLLECTION].create_index(
+                [("expires_at", ASCENDING)],
+                name="expires_at_ttl",
+                expireAfterSeconds=0
+            )
+            _index_ready = True
+
+def get_cached_response(key):
+    """Cached response text for a key, or None on a miss or expired entry"""
+    response = _memory_cache.get(key)
+    if response is not None:
+        return response
+
+    try:
+        # The TTL monitor only runs once a minute, so check expiry here too
+        entry = mongo.db[CACHE_COLLECTION].find_one(
+            {"_id": key, "expires_at": {"$gt": datetime.utcnow()}},
+            {"response": 1, "expires_at": 1}
+        )
+    except Exception as e:
+        print(f"⚠️ LLM cache read failed: {e}")
+        return None
+
+    if not entry:
+        return None
+
+    _memory_cache.put(key, entry['response'], entry['expires_at'])
+    return entry['response']
+
+def store_cached_response(key, response, endpoint, model):
+    """Save a response under its key for the endpoint's TTL"""
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=ENDPOINT_TTLS.get(endpoint, DEFAULT_TTL))
+    _memory_cache.put(key, response, expires_at)
+
+    try:
+        _ensure_ttl_index()
+        mongo.db[CACHE_COLLECTION].update_one(
+            {"_id": key},
+            {
+                "$set": {
+                    "response": response,
+                    "endpoint": endpoint,
+                    "model": model,
+                    "created_at": now,
+                    "expires_at": expires_at
+                },
+                "$inc": {"generations": 1}
+            },
+            upsert=True
+        )
+    except Exception as e:
+        # A cache that can't be written is just a cache miss next time
+        print(f"⚠️ LLM cache write failed: {e}")
@@ -0,0 +1,24 @@
+import re
+import unicodedata
+
+def normalize_location(location):
+    """Clean up a free-text location for display (trim, collapse whitespace)"""
+    if not location:
+        return location
+    
+    parts = [re.sub(r'\s+', ' ', part).strip() for part in str(location).split(',')]
+    return ', '.join(part for part in parts if part)
+
+def canonical_location_key(location):
+    """Build a canonical key used to group and index bookings by location
+    
+    "  Munnar ,Kerala. " and "munnar, kerala" both map to "munnar, kerala".
+    """
+    if not location:
+        return None
+    
+    text = unicodedata.normalize('NFKD', str(location))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    text = re.sub(r'[^\w\s,]', ' ', text)
+    
+    return normalize_location(text) or None
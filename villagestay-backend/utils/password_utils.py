@@ -0,0 +1,145 @@
+# villagestay-backend/utils/password_utils.py
+#
+# Password hashing off the request thread. Hashing is deliberately slow and
+# CPU-bound, so a login storm used to tie up every web worker and starve the
+# other endpoints. Hashes are now computed by a small dedicated pool; when
+# the pool and its queue are full, callers get PasswordHashBusyError (the
+# routes answer 503) instead of piling up behind it.
+#
+# The scheme is read from the hash prefix, so exactly one verifier runs:
+# werkzeug for "scrypt:"/"pbkdf2:" hashes, bcrypt for "$2a$"/"$2b$"/"$2y$"
+# hashes created by the WhatsApp bot. Hashes that don't match the configured
+# method and cost are upgraded in the background after a successful login.
+
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from werkzeug.security import generate_password_hash, check_password_hash
+from config import Config
+from database import mongo
+
+BCRYPT_PREFIXES = ("$2a$", "$2b$", "$2y$")
+WERKZEUG_PREFIXES = ("scrypt:", "pbkdf2:")
+
+class PasswordHashBusyError(Exception):
+    """Raised when the hashing pool is saturated and the queue wait times out"""
+
+_hash_executor = ThreadPoolExecutor(
+    max_workers=Config.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash"
+)
+
+# Slots for running plus queued hashes; beyond this, callers are turned away
+_hash_slots = threading.BoundedSemaphore(Config.PASSWORD_HASH_WORKERS + Config.PASSWORD_HASH_QUEUE)
+
+def _run_bounded(fn, *args, wait=True):
+    if wait:
+        acquired = _hash_slots.acquire(timeout=Config.PASSWORD_HASH_QUEUE_TIMEOUT)
+    else:
+        acquired = _hash_slots.acquire(blocking=False)
+    if not acquired:
+        raise PasswordHashBusyError("Password hashing is at capacity")
+
+    try:
+        future = _hash_executor.submit(fn, *args)
+    except Exception:
+        _hash_slots.release()
+        raise
+
+    future.add_done_callback(lambda _: _hash_slots.release())
+    return future
+
+def detect_scheme(password_hash):
+    """'werkzeug', 'bcrypt' or None for a stored password hash"""
+    if not isinstance(password_hash, str):
+        return None
+    if password_hash.startswith(WERKZEUG_PREFIXES):
+        return "werkzeug"
+    if password_hash.startswith(BCRYPT_PREFIXES):
+        return "bcrypt"
+    return None
+
+def hash_method(password_hash):
+    """Method and cost a hash was made with, e.g. 'scrypt:32768:8:1' or 'bcrypt'"""
+    if detect_scheme(password_hash) == "bcrypt":
+        return "bcrypt"
+    return password_hash.split('$', 1)[0]
+
+def _check(password, password_hash, scheme):
+    if scheme == "werkzeug":
+        return check_password_hash(password_hash, password)
+
+    import bcrypt
+    # $2y$ (PHP) and $2b$ hashes are the same algorithm
+    if password_hash.startswith("$2y$"):
+        password_hash = "$2b$" + password_hash[4:]
+    return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+
+def verify_password(password, password_hash):
+    """Check a password on the hashing pool; returns (is_valid, scheme)"""
+    scheme = detect_scheme(password_hash)
+    if not scheme or not password:
+        return False, scheme
+
+    try:
+        return _run_bounded(_check, password, password_hash, scheme).result(), scheme
+    except PasswordHashBusyError:
+        raise
+    except Exception as e:
+        print(f"❌ {scheme} password verification error: {e}")
+        return False, scheme
+
+def hash_password(password):
+    """Hash a password with the configured method and cost on the hashing pool"""
+    return _run_bounded(generate_password_hash, password, Config.PASSWORD_HASH_METHOD).result()
+
+@lru_cache(maxsize=1)
+def configured_hash_method():
+    """PASSWORD_HASH_METHOD in werkzeug's fully expanded form
+
+    'scrypt' or 'pbkdf2:sha256' are stored as e.g. 'scrypt:32768:8:1' and
+    'pbkdf2:sha256:600000', so the short spelling would never match a stored
+    hash. Werkzeug fills in its own defaults, so the expanded form is read
+    from a real hash (once, on first use).
+    """
+    return hash_method(generate_password_hash("", Config.PASSWORD_HASH_METHOD))
+
+def needs_rehash(password_hash):
+    """True when a hash doesn't use the configured method and cost parameters"""
+    return hash_method(password_hash) != configured_hash_method()
+
+def _rehash(user_id, password, old_hash):
+    new_hash = generate_password_hash(password, Config.PASSWORD_HASH_METHOD)
+    now = datetime.utcnow()
+
+    # Only replace the hash we verified against, never a newer password
+    result = mongo.db.users.update_one(
+        {"_id": user_id, "password": old_hash},
+        {
+            "$set": {
+                "password": new_hash,
+                "updated_at": now,
+                "password_migrated_from": hash_method(old_hash),
+                "password_migrated_at": now
+            }
+        }
+    )
+    if result.modified_count:
+        from utils.auth_utils import invalidate_user_cache
+        invalidate_user_cache(user_id)
+        print(f"🔄 Rehashed password for user {user_id} with {configured_hash_method()}")
+
+def schedule_rehash(user_id, password, old_hash):
+    """Upgrade a verified hash in the background; skipped when the pool is busy"""
+    try:
+        future = _run_bounded(_rehash, user_id, password, old_hash, wait=False)
+    except PasswordHashBusyError:
+        return False
+
+    def report(done):
+        if done.exception():
+            print(f"❌ Password rehash failed for user {user_id}: {done.exception()}")
+
+    future.add_done_callback(report)
+    return True
@@ -0,0 +1,31 @@
+import re
+from config import Config
+
+def normalize_phone_e164(phone, default_country_code=None):
+    """Canonicalize a phone number to E.164 ("+919876543210"), or None if invalid
+    
+    Numbers without a country code are assumed to be local to
+    DEFAULT_PHONE_COUNTRY_CODE: "98765 43210", "098765-43210",
+    "919876543210" and "+91 98765 43210" all map to "+919876543210".
+    """
+    if not phone:
+        return None
+    
+    country_code = default_country_code or Config.DEFAULT_PHONE_COUNTRY_CODE
+    text = str(phone).strip()
+    digits = re.sub(r'\D', '', text)
+    
+    if text.startswith('+'):
+        pass
+    elif digits.startswith('00'):
+        digits = digits[2:]
+    elif len(digits) == 11 and digits.startswith('0'):
+        digits = country_code + digits[1:]
+    elif len(digits) == 10:
+        digits = country_code + digits
+    
+    # E.164 allows at most 15 digits; shorter than 8 can't be a full number
+    if not 8 <= len(digits) <= 15 or digits.startswith('0'):
+        return None
+    
+    return f"+{digits}"
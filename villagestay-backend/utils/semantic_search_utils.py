@@ -1,10 +1,50 @@
 # villagestay-backend/utils/semantic_search_utils.py
 import re
 import json
-from utils.ai_utils import call_gemini_api
+from utils.ai_utils import call_gemini_json
 from database import mongo
 from bson import ObjectId
 
+_STRING_LIST = {"type": "ARRAY", "items": {"type": "STRING"}}
+
+SEARCH_ANALYSIS_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "search_intent": {
+            "type": "OBJECT",
+            "properties": {
+                "primary_mood": {"type": "STRING"},
+                "location_type": {"type": "STRING"},
+                "activities": _STRING_LIST,
+                "property_features": _STRING_LIST,
+                "experience_type": {"type": "STRING"}
+            }
+        },
+        "search_keywords": _STRING_LIST,
+        "semantic_categories": _STRING_LIST
+    },
+    "required": ["search_intent", "search_keywords"]
+}
+
+VISUAL_ANALYSIS_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "visual_features": {
+            "type": "OBJECT",
+            "properties": {
+                "architecture": {"type": "STRING"},
+                "setting": {"type": "STRING"},
+                "atmosphere": {"type": "STRING"},
+                "key_elements": _STRING_LIST
+            }
+        },
+        "suggested_property_types": _STRING_LIST,
+        "matching_keywords": _STRING_LIST,
+        "ideal_amenities": _STRING_LIST
+    },
+    "required": ["visual_features", "matching_keywords"]
+}
+
 def semantic_search_listings(query, filters=None):
     """Perform semantic search on listings using AI understanding"""
     
@@ -63,11 +103,8 @@ def semantic_search_listings(query, filters=None):
         """
         
         # Get AI analysis of search intent
-        from utils.ai_utils import call_gemini_api
-        ai_analysis = call_gemini_api(semantic_prompt)
-        
         try:
-            search_analysis = json.loads(extract_json_from_response(ai_analysis))
+            search_analysis = call_gemini_json(semantic_prompt, schema=SEARCH_ANALYSIS_SCHEMA, expect='object')
         except:
             # Fallback to keyword matching if AI analysis fails
             return keyword_based_search(query, all_listings)
@@ -184,8 +221,6 @@ def image_based_search(image_description, filters=None):
     try:
         from database import mongo
         from bson import ObjectId
-        from utils.ai_utils import call_gemini_api
-        
         # Use Gemini to understand what the user is looking for based on image
         image_analysis_prompt = f"""
         The user has provided this description of an image: "{image_description}"
@@ -213,10 +248,8 @@ def image_based_search(image_description, filters=None):
         }}
         """
         
-        ai_analysis = call_gemini_api(image_analysis_prompt)
-        
         try:
-            visual_analysis = json.loads(extract_json_from_response(ai_analysis))
+            visual_analysis = call_gemini_json(image_analysis_prompt, schema=VISUAL_ANALYSIS_SCHEMA, expect='object')
         except:
             return []
         
@@ -555,13 +588,3 @@ def get_visual_reasons(listing, visual_analysis):
         reasons.append(f"Located in {visual_features['setting']} environment")
     
     return reasons
-
-def extract_json_from_response(response):
-    """Extract JSON from AI response"""
-    
-    import re
-    json_match = re.search(r'\{.*\}', response, re.DOTALL)
-    if json_match:
-        return json_match.group()
-    return '{}'
-
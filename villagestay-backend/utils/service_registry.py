@@ -0,0 +1,94 @@
+# villagestay-backend/utils/service_registry.py
+#
+# Lazily constructed SDK clients. Importing a blueprint no longer builds (or
+# even imports) the Azure OpenAI, Google Maps, Google Speech or google-genai
+# SDKs; each client is created on first use, once per process, and a missing
+# key only fails the request that needs it instead of crashing startup.
+
+import os
+import threading
+from config import Config
+
+class ServiceUnavailableError(Exception):
+    """Raised when an SDK client is not configured or fails to initialize"""
+
+def _create_azure_openai():
+    from openai import AzureOpenAI
+
+    if not Config.AZURE_GPT_API_KEY:
+        raise ServiceUnavailableError("AZURE_GPT_API_KEY is not configured")
+
+    return AzureOpenAI(
+        api_key=Config.AZURE_GPT_API_KEY,
+        api_version=Config.AZURE_GPT_API_VERSION,
+        azure_endpoint=Config.AZURE_GPT_ENDPOINT
+    )
+
+def _create_google_maps():
+    import googlemaps
+
+    if not Config.GOOGLE_PLACES_API_KEY:
+        raise ServiceUnavailableError("GOOGLE_PLACES_API_KEY is not configured")
+
+    return googlemaps.Client(key=Config.GOOGLE_PLACES_API_KEY)
+
+def _create_google_speech():
+    from google.cloud import speech
+
+    if not (Config.GOOGLE_APPLICATION_CREDENTIALS and Config.GOOGLE_CLOUD_PROJECT_ID):
+        raise ServiceUnavailableError("Google Cloud credentials not configured")
+
+    os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = Config.GOOGLE_APPLICATION_CREDENTIALS
+    return speech.SpeechClient()
+
+def _create_genai():
+    from google import genai
+
+    if not Config.GOOGLE_AI_API_KEY:
+        raise ServiceUnavailableError("GOOGLE_AI_API_KEY is not configured")
+
+    return genai.Client(api_key=Config.GOOGLE_AI_API_KEY)
+
+SERVICE_FACTORIES = {
+    "azure_openai": _create_azure_openai,
+    "google_maps": _create_google_maps,
+    "google_speech": _create_google_speech,
+    "genai": _create_genai,
+}
+
+_instances = {}
+_locks = {name: threading.Lock() for name in SERVICE_FACTORIES}
+
+def get_service(name):
+    """Return the shared client for a service, creating it on first use"""
+    client = _instances.get(name)
+    if client is not None:
+        return client
+
+    if name not in SERVICE_FACTORIES:
+        raise KeyError(f"Unknown service: {name}")
+
+    # One lock per service so a slow client doesn't hold up the others
+    with _locks[name]:
+        client = _instances.get(name)
+        if client is None:
+            try:
+                client = SERVICE_FACTORIES[name]()
+            except ServiceUnavailableError:
+                raise
+            except Exception as e:
+                raise ServiceUnavailableError(f"Failed to initialize {name} client: {e}")
+
+            _instances[name] = client
+            print(f"✅ {name} client initialized")
+
+    return client
+
+def is_service_available(name):
+    """Check whether a client can be created, without raising"""
+    try:
+        get_service(name)
+        return True
+    except ServiceUnavailableError as e:
+        print(f"❌ {e}")
+        return False
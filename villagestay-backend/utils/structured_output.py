@@ -0,0 +1,179 @@
+# villagestay-backend/utils/structured_output.py
+#
+# JSON out of Gemini. Requests ask for responseMimeType application/json (and
+# a responseSchema where the shape is known), so the reply is normally bare
+# JSON and parses on the first try. For everything else - code fences, prose
+# around the object, trailing commas, or a reply cut off at maxOutputTokens -
+# extract_json scans once from the first bracket, stops at the matching close
+# (not the last brace in the text, as a greedy regex would) and, if the text
+# ends first, closes what is open instead of throwing the whole answer away.
+# A repaired value has lost its tail, so callers that store or cache results
+# pass allow_repair=False and get TruncatedOutputError instead.
+
+import json
+import re
+
+class StructuredOutputError(ValueError):
+    """Raised when no JSON value can be recovered from a model response"""
+
+class TruncatedOutputError(StructuredOutputError):
+    """Raised instead of returning a repaired value when allow_repair is False
+
+    value holds what the repair recovered, for callers that can use it
+    without keeping it.
+    """
+
+    def __init__(self, message, value=None):
+        super().__init__(message)
+        self.value = value
+
+_FENCE = re.compile(r'^\s*```(?:json)?\s*|\s*```\s*$', re.IGNORECASE)
+_TRAILING_STRING = re.compile(r'"(?:[^"\\]|\\.)*"$')
+_TRAILING_SCALAR = re.compile(r'[A-Za-z0-9.+\-]+$')
+_NUMBER = re.compile(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?$')
+
+_CLOSERS = {'{': '}', '[': ']'}
+
+def json_generation_config(schema=None, **overrides):
+    """generationConfig asking Gemini for JSON, optionally schema-constrained"""
+    config = {"responseMimeType": "application/json"}
+    if schema:
+        config["responseSchema"] = schema
+    config.update(overrides)
+    return config
+
+def _last_significant(out):
+    for ch in reversed(out):
+        if not ch.isspace():
+            return ch
+    return ''
+
+def _strip_trailing_comma(out):
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ',':
+        out.pop()
+
+def _scan(text, start):
+    """Copy one JSON value starting at text[start]
+
+    Returns (json_text, complete). Trailing commas are dropped on the way; if
+    the text ends before the value does, the partial copy is repaired.
+    """
+    out = []
+    stack = []
+    in_string = escape = False
+    string_start, string_is_key = 0, False
+
+    for ch in text[start:]:
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+
+        if ch == '"':
+            string_is_key = bool(stack) and stack[-1] == '{' and _last_significant(out) in '{,'
+            string_start = len(out)
+            in_string = True
+            out.append(ch)
+        elif ch in '{[':
+            stack.append(ch)
+            out.append(ch)
+        elif ch in '}]':
+            _strip_trailing_comma(out)
+            if stack:
+                out.append(_CLOSERS[stack.pop()])
+            if not stack:
+                return ''.join(out), True
+        else:
+            out.append(ch)
+
+    # Truncated: finish or drop the open string, then any dangling member
+    if in_string:
+        if escape:
+            out.pop()
+        if string_is_key:
+            del out[string_start:]
+        else:
+            out.append('"')
+
+    repaired = ''.join(out).rstrip()
+    while True:
+        if repaired.endswith(','):
+            repaired = repaired[:-1].rstrip()
+            continue
+        if repaired.endswith(':'):
+            repaired = _TRAILING_STRING.sub('', repaired[:-1].rstrip()).rstrip()
+            continue
+
+        scalar = _TRAILING_SCALAR.search(repaired)
+        if scalar and scalar.group() not in ('true', 'false', 'null') and not _NUMBER.match(scalar.group()):
+            repaired = repaired[:scalar.start()].rstrip()
+            continue
+
+        # A complete key with no value yet: {"a": 1, "b"
+        key = _TRAILING_STRING.search(repaired)
+        if key and stack and stack[-1] == '{' and _last_significant(repaired[:key.start()]) in '{,':
+            repaired = repaired[:key.start()].rstrip()
+            continue
+        break
+
+    return repaired + ''.join(_CLOSERS[opener] for opener in reversed(stack)), False
+
+def extract_json(text, expect=None, allow_repair=True):
+    """Parse the JSON value in a model response
+
+    expect='object' or 'array' picks the first value of that kind (useful
+    when prose before the JSON contains brackets). Raises
+    StructuredOutputError when nothing can be recovered, and
+    TruncatedOutputError when the reply was cut off and allow_repair is False.
+    """
+    if isinstance(text, (dict, list)):
+        return text
+    if not text or not text.strip():
+        raise StructuredOutputError("Empty model response")
+
+    # Fast path: responseMimeType replies are already bare JSON
+    try:
+        value = json.loads(text, strict=False)
+        if expect is None or isinstance(value, dict if expect == 'object' else list):
+            return value
+    except ValueError:
+        pass
+
+    body = _FENCE.sub('', text)
+    start = next((i for i, ch in enumerate(body) if ch in '{['), -1)
+    if start == -1:
+        raise StructuredOutputError("No JSON found in model response")
+
+    opener = {'object': '{', 'array': '['}.get(expect)
+    if opener and body[start] != opener:
+        # A reply that is itself the other kind of container and was cut off
+        # would otherwise yield its first element, hiding everything lost after it
+        if not body[:start].strip() and not _scan(body, start)[1]:
+            raise StructuredOutputError(f"Truncated JSON response where an {expect} was expected")
+        start = body.find(opener)
+        if start == -1:
+            raise StructuredOutputError(f"No JSON {expect} found in model response")
+
+    candidate, complete = _scan(body, start)
+    try:
+        # strict=False accepts the raw newlines models leave inside strings
+        value = json.loads(candidate, strict=False)
+    except ValueError as e:
+        raise StructuredOutputError(f"Unparseable JSON in model response: {e}")
+
+    if not complete:
+        if not allow_repair:
+            raise TruncatedOutputError(f"Truncated JSON response ({len(body) - start} chars)", value)
+        print(f"🩹 Repaired truncated JSON response ({len(body) - start} chars)")
+    return value
+
+def extract_complete_json(text, expect=None):
+    """extract_json for results that get stored: repaired replies raise TruncatedOutputError"""
+    return extract_json(text, expect, allow_repair=False)
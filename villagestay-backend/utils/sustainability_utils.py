@@ -0,0 +1,116 @@
+from database import mongo
+from bson import ObjectId
+from pymongo import ReturnDocument
+from datetime import datetime
+import re
+
+# Review keywords that count as a sustainability mention for the host
+SUSTAINABILITY_REVIEW_KEYWORDS = ('eco', 'green')
+
+_mention_pattern = '|'.join(re.escape(keyword) for keyword in SUSTAINABILITY_REVIEW_KEYWORDS)
+
+def review_mentions_sustainability(comment):
+    """Check whether a review comment mentions sustainability"""
+    if not comment:
+        return False
+    
+    comment = comment.lower()
+    return any(keyword in comment for keyword in SUSTAINABILITY_REVIEW_KEYWORDS)
+
+def record_review_mentions(reviewee_id, comment):
+    """Maintain the reviewee's sustainability mention counter at review write time"""
+    if not review_mentions_sustainability(comment):
+        return False
+    
+    # Always increment; reviews written before counters existed (those
+    # without `mentions_counted`) are added once when the counter is seeded
+    mongo.db.users.update_one(
+        {"_id": ObjectId(reviewee_id)},
+        {"$inc": {"review_mentions.sustainability": 1}}
+    )
+    
+    invalidate_host_sustainability_cache(reviewee_id)
+    return True
+
+def get_sustainability_mentions(host_id):
+    """Get the number of reviews about a host that mention sustainability"""
+    host = mongo.db.users.find_one(
+        {"_id": ObjectId(host_id)},
+        {"review_mentions": 1}
+    )
+    
+    review_mentions = (host or {}).get('review_mentions', {})
+    if review_mentions.get('sustainability_seeded'):
+        return review_mentions.get('sustainability', 0)
+    
+    # Seed the counter once with the reviews written before counters
+    # existed. Newer reviews are never in this count, so adding it in one
+    # update can't lose or double an increment made in the meantime.
+    legacy_mentions = mongo.db.reviews.count_documents({
+        "reviewee_id": ObjectId(host_id),
+        "mentions_counted": {"$exists": False},
+        "comment": {"$regex": _mention_pattern, "$options": "i"}
+    })
+    
+    if not host:
+        return legacy_mentions
+    
+    host = mongo.db.users.find_one_and_update(
+        {"_id": ObjectId(host_id), "review_mentions.sustainability_seeded": {"$exists": False}},
+        {
+            "$inc": {"review_mentions.sustainability": legacy_mentions},
+            "$set": {"review_mentions.sustainability_seeded": True}
+        },
+        projection={"review_mentions": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    
+    if host is None:
+        # Another request seeded it first
+        host = mongo.db.users.find_one({"_id": ObjectId(host_id)}, {"review_mentions": 1}) or {}
+    
+    return host.get('review_mentions', {}).get('sustainability', 0)
+
+# A listing's `sustainability_version` is bumped by every write that changes
+# an input of its score (features, host review mentions), and a computed
+# score is only cached if the version is still the one it was computed
+# from. A reader that loaded the old inputs can't cache a stale score after
+# the invalidation.
+
+def get_cached_sustainability_score(listing):
+    """Get the cached sustainability score stored on a listing, if any"""
+    return listing.get('sustainability_score_cache')
+
+def store_sustainability_score(listing, score_data):
+    """Cache a score computed from `listing`, unless its inputs changed since it was read"""
+    mongo.db.listings.update_one(
+        {
+            "_id": listing['_id'],
+            # None also matches listings that were never invalidated
+            "sustainability_version": listing.get('sustainability_version')
+        },
+        {"$set": {
+            "sustainability_score_cache": {
+                **score_data,
+                "computed_at": datetime.utcnow()
+            }
+        }}
+    )
+
+def sustainability_cache_invalidation():
+    """Update operators that drop the cached score and bump its version
+
+    Merge them into the same update as the inputs they invalidate.
+    """
+    return {
+        "$unset": {"sustainability_score_cache": ""},
+        "$inc": {"sustainability_version": 1}
+    }
+
+def invalidate_host_sustainability_cache(host_id):
+    """Drop the cached sustainability scores of every listing owned by a host"""
+    # Unconditional: a listing with no cache yet may have a score being computed
+    mongo.db.listings.update_many(
+        {"host_id": ObjectId(host_id)},
+        sustainability_cache_invalidation()
+    )
@@ -2,18 +2,22 @@
 import time
 import os
 import uuid
-from google import genai
 from config import Config
 from datetime import datetime
 from database import mongo
 from bson import ObjectId
+from utils.service_registry import get_service
 
 class VideoGenerationService:
     def __init__(self):
-        self.client = genai.Client(api_key=Config.GOOGLE_AI_API_KEY)
         self.video_folder = Config.VIDEO_FOLDER
         os.makedirs(self.video_folder, exist_ok=True)
     
+    @property
+    def client(self):
+        """google-genai client, created on first video request"""
+        return get_service("genai")
+    
     def generate_village_story_prompt(self, listing, host_info, user_images=None):
         """Generate a compelling prompt for village story video"""
         
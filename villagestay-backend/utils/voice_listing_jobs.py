@@ -0,0 +1,226 @@
+# villagestay-backend/utils/voice_listing_jobs.py
+#
+# Background pipeline for voice-to-listing. The request only stores a job in
+# `voice_generations` and returns its processing_id; a bounded worker pool runs
+# transcription -> Gemini enhancement -> pricing -> translation and records
+# per-stage progress on the same document for polling/SSE clients.
+#
+# The pool's queue holds audio in memory, so it is bounded: when it is full
+# the route answers 503. Jobs lost with their worker (a restart) would stay
+# queued forever; status reads fail any job with no progress for
+# VOICE_LISTING_JOB_TIMEOUT seconds.
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from bson import ObjectId
+from config import Config
+from database import mongo
+
+# (stage name, progress % once the stage finishes)
+VOICE_LISTING_STAGES = [
+    ("transcription", 25),
+    ("enhancement", 55),
+    ("pricing", 75),
+    ("translation", 100),
+]
+
+TERMINAL_STATUSES = ("completed", "error")
+
+class VoiceListingBusyError(Exception):
+    """Raised when every worker is busy and the job queue is full"""
+
+_executor = ThreadPoolExecutor(
+    max_workers=Config.VOICE_LISTING_WORKERS,
+    thread_name_prefix="voice-listing"
+)
+
+# Slots for running plus queued jobs
+_job_slots = threading.BoundedSemaphore(Config.VOICE_LISTING_WORKERS + Config.VOICE_LISTING_QUEUE)
+
+def enqueue_voice_listing_job(host_id, audio_bytes, language):
+    """Create a voice_generations job and hand it to the worker pool
+
+    Raises VoiceListingBusyError when the pool and its queue are full.
+    """
+    if not _job_slots.acquire(blocking=False):
+        raise VoiceListingBusyError("Voice processing is at capacity")
+
+    try:
+        return _enqueue(host_id, audio_bytes, language)
+    except Exception:
+        _job_slots.release()
+        raise
+
+def _enqueue(host_id, audio_bytes, language):
+    voice_record = {
+        "host_id": ObjectId(host_id),
+        "original_language": language,
+        "processing_type": "voice_to_listing",
+        "status": "queued",
+        "current_stage": None,
+        "progress": 0,
+        "stages": {name: {"status": "pending"} for name, _ in VOICE_LISTING_STAGES},
+        "audio_size": len(audio_bytes),
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
+    }
+
+    result = mongo.db.voice_generations.insert_one(voice_record)
+    processing_id = str(result.inserted_id)
+
+    future = _executor.submit(run_voice_listing_job, processing_id, audio_bytes, language)
+    future.add_done_callback(lambda _: _job_slots.release())
+
+    return processing_id
+
+def _update_job(processing_id, fields):
+    mongo.db.voice_generations.update_one(
+        {"_id": ObjectId(processing_id)},
+        {"$set": {**fields, "updated_at": datetime.utcnow()}}
+    )
+
+def _start_stage(processing_id, stage):
+    _update_job(processing_id, {
+        "status": "processing",
+        "current_stage": stage,
+        f"stages.{stage}.status": "processing",
+        f"stages.{stage}.started_at": datetime.utcnow()
+    })
+
+def _finish_stage(processing_id, stage, progress):
+    _update_job(processing_id, {
+        "progress": progress,
+        f"stages.{stage}.status": "completed",
+        f"stages.{stage}.completed_at": datetime.utcnow()
+    })
+
+def run_voice_listing_job(processing_id, audio_bytes, language):
+    """Run every voice-to-listing stage, publishing progress as it goes"""
+    from utils.google_speech_utils import transcribe_audio_google_speech, enhance_listing_with_gemini
+    from utils.ai_utils import generate_smart_pricing, create_multilingual_listing
+
+    stage = None
+    progress = dict(VOICE_LISTING_STAGES)
+
+    try:
+        print(f"🎤 Starting voice-to-listing job {processing_id} ({len(audio_bytes)} bytes, {language})")
+
+        # Step 1: Transcribe audio (raw bytes, no base64 round-trip)
+        stage = "transcription"
+        _start_stage(processing_id, stage)
+        transcription_result = transcribe_audio_google_speech(audio_bytes, language)
+        transcribed_text = transcription_result["text"]
+        confidence = transcription_result["confidence"]
+        _update_job(processing_id, {"transcribed_text": transcribed_text})
+        _finish_stage(processing_id, stage, progress[stage])
+
+        # Step 2: Enhance with Gemini
+        stage = "enhancement"
+        _start_stage(processing_id, stage)
+        listing_data = enhance_listing_with_gemini(transcribed_text, language)
+        _finish_stage(processing_id, stage, progress[stage])
+
+        # Step 3: Generate pricing
+        stage = "pricing"
+        _start_stage(processing_id, stage)
+        pricing_intel = generate_smart_pricing(listing_data, language)
+        _finish_stage(processing_id, stage, progress[stage])
+
+        # Step 4: Create translations (a failure here keeps the original language)
+        stage = "translation"
+        _start_stage(processing_id, stage)
+        try:
+            translations = create_multilingual_listing(listing_data, language)
+        except Exception as translation_error:
+            print(f"❌ Translation failed: {translation_error}")
+            translations = {language: listing_data}
+        _finish_stage(processing_id, stage, progress[stage])
+
+        processing_result = {
+            "original_audio_language": language,
+            "transcribed_text": transcribed_text,
+            "enhanced_listing": listing_data,
+            "pricing_intelligence": pricing_intel,
+            "translations": translations,
+            "processing_status": "completed",
+            "confidence_score": confidence,
+            "transcription_source": "google_speech_to_text",
+            "processing_id": processing_id
+        }
+
+        _update_job(processing_id, {
+            "status": "completed",
+            "current_stage": None,
+            "processing_result": processing_result,
+            "completed_at": datetime.utcnow()
+        })
+
+        print(f"✅ Voice-to-listing job {processing_id} completed")
+
+    except Exception as e:
+        print(f"❌ Voice-to-listing job {processing_id} failed at {stage}: {e}")
+        failure = {
+            "status": "error",
+            "error": f"Voice processing failed: {str(e)}",
+            "completed_at": datetime.utcnow()
+        }
+        if stage:
+            failure[f"stages.{stage}.status"] = "error"
+        _update_job(processing_id, failure)
+
+def fail_if_stale(voice_record):
+    """Mark a queued/processing job failed once it has made no progress for too long"""
+    status = voice_record.get('status')
+    if status not in ("queued", "processing"):
+        return voice_record
+
+    cutoff = datetime.utcnow() - timedelta(seconds=Config.VOICE_LISTING_JOB_TIMEOUT)
+    if voice_record.get('updated_at', voice_record['created_at']) > cutoff:
+        return voice_record
+
+    failure = {
+        "status": "error",
+        "error": "Voice processing did not finish, please try again",
+        "completed_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
+    }
+    if voice_record.get('current_stage'):
+        failure[f"stages.{voice_record['current_stage']}.status"] = "error"
+
+    # Conditional, so a job that just moved on is left alone
+    result = mongo.db.voice_generations.update_one(
+        {"_id": voice_record['_id'], "status": status, "updated_at": voice_record.get('updated_at')},
+        {"$set": failure}
+    )
+    if result.modified_count:
+        print(f"⌛ Voice-to-listing job {voice_record['_id']} failed: no progress since {voice_record.get('updated_at')}")
+    return mongo.db.voice_generations.find_one({"_id": voice_record['_id']}) or voice_record
+
+def format_voice_job_status(voice_record):
+    """Format a voice_generations record for status polling and SSE"""
+    # Records created before background processing only have a result
+    status = voice_record.get('status') or ('completed' if voice_record.get('processing_result') else 'processing')
+
+    status_data = {
+        "processing_id": str(voice_record['_id']),
+        "status": status,
+        "current_stage": voice_record.get('current_stage'),
+        "progress": 100 if status == 'completed' else voice_record.get('progress', 0),
+        "stages": {
+            name: {"status": stage.get('status', 'pending')}
+            for name, stage in voice_record.get('stages', {}).items()
+        },
+        "created_at": voice_record['created_at'].isoformat()
+    }
+
+    if voice_record.get('transcribed_text'):
+        status_data["transcribed_text"] = voice_record['transcribed_text']
+
+    if status == 'completed':
+        status_data["result"] = voice_record.get('processing_result')
+
+    if voice_record.get('error'):
+        status_data["error"] = voice_record['error']
+
+    return status_data
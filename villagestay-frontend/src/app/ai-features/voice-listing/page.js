@@ -37,6 +37,10 @@ import { aiAPI, listingsAPI } from '@/lib/api';
 import { useAuth } from '@/contexts/AuthContext';
 import toast from 'react-hot-toast';
 
+// Stop polling a voice-to-listing job after this long (the backend fails
+// jobs stuck past VOICE_LISTING_JOB_TIMEOUT, 10 minutes by default)
+const VOICE_JOB_TIMEOUT_MS = 11 * 60 * 1000;
+
 const VoiceListingPage = () => {
   const router = useRouter();
   const { user, isHost, isAuthenticated, loading } = useAuth();
@@ -410,16 +414,42 @@ const VoiceListingPage = () => {
         throw new Error(errorData.error || `Server error: ${response.status}`);
       }
 
-      const result = await response.json();
-      console.log('Voice processing response:', result);
+      const job = await response.json();
+      console.log('Voice processing started:', job);
+      
+      // Processing runs in the background; poll until every stage is done,
+      // giving up if the job never finishes
+      const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:5000';
+      const pollDeadline = Date.now() + VOICE_JOB_TIMEOUT_MS;
+      let status;
+      do {
+        if (Date.now() > pollDeadline) {
+          throw new Error('Voice processing is taking too long. Please try again.');
+        }
+        await new Promise(resolve => setTimeout(resolve, 1500));
+        
+        const statusResponse = await fetch(`${apiUrl}/api/ai-features/voice-to-listing/${job.processing_id}/status`, {
+          headers: {
+            ...(token && { 'Authorization': `Bearer ${token}` })
+          }
+        });
+        
+        if (!statusResponse.ok) {
+          const errorData = await statusResponse.json().catch(() => ({ error: 'Unknown server error' }));
+          throw new Error(errorData.error || `Server error: ${statusResponse.status}`);
+        }
+        
+        status = await statusResponse.json();
+        console.log(`Voice processing: ${status.current_stage || status.status} (${status.progress}%)`);
+      } while (status.status !== 'completed' && status.status !== 'error');
       
-      if (result.result?.processing_status === 'failed') {
-        throw new Error(result.result.error || 'Voice processing failed');
+      if (status.status === 'error') {
+        throw new Error(status.error || 'Voice processing failed');
       }
       
       const resultWithId = {
-        ...result.result,
-        processing_id: result.processing_id || result.result.processing_id
+        ...status.result,
+        processing_id: job.processing_id
       };
       
       setTranscription(resultWithId.transcribed_text);
@@ -561,6 +561,7 @@ export const aiAPI = {
   
   // Voice to Listing - use the file upload instance
   voiceToListing: (data) => apiWithFiles.post('/api/ai-features/voice-to-listing', data),
+  getVoiceToListingStatus: (processingId) => api.get(`/api/ai-features/voice-to-listing/${processingId}/status`),
   createListingFromVoice: (data) => api.post('/api/ai-features/create-listing-from-voice', data),
   demoVoiceTranscription: (data) => api.post('/api/ai-features/demo/voice-transcription', data),
 